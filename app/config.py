@@ -11,5 +11,157 @@ class Settings:
     FAISS_INDEX_PATH = "data/faiss_index/index.bin"
     EMBEDDING_DIM = 512  # CLIP base dimension
 
+    # Rebuilds publish versioned snapshots under data/faiss_index/snapshots;
+    # this many are kept on disk (see app/infrastructure/vector_store/snapshots.py)
+    INDEX_SNAPSHOT_RETAIN = int(os.getenv("INDEX_SNAPSHOT_RETAIN", 3))
+    # Check a new snapshot's sha256 checksums before serving it
+    INDEX_VERIFY_CHECKSUMS = os.getenv("INDEX_VERIFY_CHECKSUMS", "true").lower() == "true"
+
+    # Per-storefront catalogs, each an index under CATALOGS_DIR/<name>/ with
+    # its own snapshots (see app/services/catalog_index_manager.py). They are
+    # loaded on first query; the least recently used are dropped once the
+    # resident ones exceed CATALOG_MEMORY_BUDGET_MB.
+    CATALOGS_DIR = os.getenv("CATALOGS_DIR", "data/catalogs")
+    CATALOG_MEMORY_BUDGET_MB = float(os.getenv("CATALOG_MEMORY_BUDGET_MB", 2048))
+
+    # Preprocessing (see app/infrastructure/preprocessing/factory.py).
+    # BG_REMOVAL_MODE: "always" runs rembg on every image; "adaptive" uses a
+    # cheap colour-threshold mask on flat-background studio shots and rembg
+    # only on the rest.
+    USE_BG_REMOVAL = os.getenv("USE_BG_REMOVAL", "true").lower() == "true"
+    BG_REMOVAL_MODE = os.getenv("BG_REMOVAL_MODE", "always")
+    PREPROCESS_SIZE = tuple(int(v) for v in os.getenv("PREPROCESS_SIZE", "224,224").split(","))
+    PREPROCESS_PADDING = float(os.getenv("PREPROCESS_PADDING", 0.1))
+    PREPROCESS_BG_COLOR = tuple(int(v) for v in os.getenv("PREPROCESS_BG_COLOR", "255,255,255").split(","))
+
+    # Vector store backend: "faiss" (FaissVectorStore, below) or "numpy"
+    # (NumpyVectorStore: brute force without faiss, best for catalogs up to
+    # ~100k products; NUMPY_STORE_DTYPE float16 halves its memory).
+    # Changing it requires a rebuild.
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "faiss")
+    NUMPY_STORE_DTYPE = os.getenv("NUMPY_STORE_DTYPE", "float32")
+
+    # Vector index compression: "flat" (exact, full float32 in RAM),
+    # "sq8" (8-bit scalar quantisation) or "pq" (product quantisation).
+    # Compressed modes keep full-precision vectors in a memory-mapped file
+    # and re-rank the top FAISS_RERANK_K candidates exactly.
+    FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+    FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", 64))  # PQ sub-quantizers = bytes per vector
+    FAISS_RERANK_K = int(os.getenv("FAISS_RERANK_K", 200))
+
+    # Cosine similarity above which products are collapsed into one
+    # duplicate cluster at rebuild time (e.g. 0.97). 0 disables collapsing.
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0))
+
+    # Per-stage latency spans (see `stats` in serve). METRICS_PORT > 0 also
+    # serves them in Prometheus text format at http://<host>:<port>/metrics,
+    # bound to METRICS_HOST (set 0.0.0.0 to let a remote scraper in)
+    TIMINGS_ENABLED = os.getenv("TIMINGS_ENABLED", "true").lower() == "true"
+    TIMINGS_WINDOW = int(os.getenv("TIMINGS_WINDOW", 1024))  # samples kept per stage
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+    # serve-prefork: JSON-lines TCP server with forked workers
+    SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+    SERVE_PORT = int(os.getenv("SERVE_PORT", 8500))
+    SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", os.cpu_count() or 1))
+    # 0 = derive from the thread profile (cores split between the workers)
+    SERVE_THREADS_PER_WORKER = int(os.getenv("SERVE_THREADS_PER_WORKER", 0))
+
+    # Scatter-gather search over index shards served by `serve-shard`.
+    # SHARD_ADDRESSES lists them as "host:port,host:port,..."; when set,
+    # queries are embedded locally and searched on every shard in parallel.
+    # A shard that hasn't answered within SHARD_TIMEOUT_MS is left out and
+    # the query returns what the others found.
+    SHARD_ADDRESSES = os.getenv("SHARD_ADDRESSES", "")
+    SHARD_TIMEOUT_MS = float(os.getenv("SHARD_TIMEOUT_MS", 250))
+
+    # Load shedding in serve-prefork (see app/services/load_shedder.py).
+    # Requests may carry "budget_ms"; those without one get
+    # SHED_DEFAULT_BUDGET_MS (0 = never degraded). Under pressure, shallow
+    # search re-ranks SHED_RERANK_K candidates instead of FAISS_RERANK_K.
+    SHED_DEFAULT_BUDGET_MS = float(os.getenv("SHED_DEFAULT_BUDGET_MS", 0))
+    SHED_RERANK_K = int(os.getenv("SHED_RERANK_K", 20))
+    SHED_WINDOW_SECONDS = float(os.getenv("SHED_WINDOW_SECONDS", 30))
+
+    # Native thread budgets for torch, ONNX Runtime (rembg) and FAISS (see
+    # app/infrastructure/runtime/thread_topology.py). THREAD_PROFILE is
+    # "latency" (each request gets all of its process's cores) or
+    # "throughput" (THREAD_CONCURRENCY requests share them). THREAD_CORES
+    # caps the cores used; 0 means every core this process may run on.
+    THREAD_PROFILE = os.getenv("THREAD_PROFILE", "latency")
+    THREAD_CORES = int(os.getenv("THREAD_CORES", 0))
+    THREAD_CONCURRENCY = int(os.getenv("THREAD_CONCURRENCY", 1))
+
+    # Startup warmup: preload the most accessed models/label banks recorded
+    # in the manifest (up to the memory budget) and run a throwaway CLIP
+    # forward per batch size, in the background while serve accepts input.
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_MANIFEST_PATH = os.getenv("WARMUP_MANIFEST_PATH", "data/warmup_manifest.json")
+    WARMUP_MEMORY_BUDGET_MB = int(os.getenv("WARMUP_MEMORY_BUDGET_MB", 1024))
+    WARMUP_BATCH_SIZES = [int(b) for b in os.getenv("WARMUP_BATCH_SIZES", "1,8").split(",") if b.strip()]
+
+    # Classify results are keyed by the trained heads on disk. Publishes in
+    # this process (train, distill, feedback) are seen at once; heads
+    # written by other processes within MODELS_VERSION_CHECK_SECONDS.
+    MODELS_VERSION_CHECK_SECONDS = float(os.getenv("MODELS_VERSION_CHECK_SECONDS", 5))
+
+    # Persistent store of preprocessed (background-removed, cropped,
+    # resized) catalog images used by rebuild and train, so re-embedding
+    # with a new model skips the preprocessor. Empty disables it.
+    PREPROCESSED_STORE_DIR = os.getenv("PREPROCESSED_STORE_DIR", "")
+    PREPROCESSED_SHARD_SIZE = int(os.getenv("PREPROCESSED_SHARD_SIZE", 1024))
+
+    # Cascade classification (`classify --cascade`): trained heads first,
+    # zero-shot only for attributes without a head or below the head's
+    # confidence threshold. Thresholds are calibrated at training time on a
+    # CALIBRATION_VAL_FRACTION hold-out to reach CASCADE_TARGET_ACCURACY;
+    # heads trained before calibration existed use the default.
+    CASCADE_DEFAULT_THRESHOLD = float(os.getenv("CASCADE_DEFAULT_THRESHOLD", 0.7))
+    CASCADE_TARGET_ACCURACY = float(os.getenv("CASCADE_TARGET_ACCURACY", 0.9))
+    CALIBRATION_VAL_FRACTION = float(os.getenv("CALIBRATION_VAL_FRACTION", 0.2))
+
+    # Online head updates from label corrections (see FeedbackService).
+    # Corrections are applied in the background FEEDBACK_UPDATE_INTERVAL
+    # seconds after they arrive, with FEEDBACK_STEPS optimizer steps over
+    # the new corrections plus a replay reservoir of up to
+    # FEEDBACK_REPLAY_SIZE earlier ones. FEEDBACK_ANCHOR pulls the weights
+    # towards the head being updated so few corrections can't drag it far.
+    FEEDBACK_DIR = os.getenv("FEEDBACK_DIR", "data/feedback")
+    FEEDBACK_UPDATE_INTERVAL = float(os.getenv("FEEDBACK_UPDATE_INTERVAL", 60))
+    FEEDBACK_REPLAY_SIZE = int(os.getenv("FEEDBACK_REPLAY_SIZE", 512))
+    FEEDBACK_STEPS = int(os.getenv("FEEDBACK_STEPS", 50))
+    FEEDBACK_LR = float(os.getenv("FEEDBACK_LR", 1e-2))
+    FEEDBACK_ANCHOR = float(os.getenv("FEEDBACK_ANCHOR", 1e-3))
+
+    # `distill`: zero-shot predictions over the catalog become pseudo-labels
+    # for trained heads. Only predictions (and category assignments) at or
+    # above DISTILL_MIN_CONFIDENCE are kept, and classes with fewer than
+    # DISTILL_MIN_CLASS_SAMPLES kept images are left out of the head.
+    DISTILL_MIN_CONFIDENCE = float(os.getenv("DISTILL_MIN_CONFIDENCE", 0.6))
+    DISTILL_MIN_CLASS_SAMPLES = int(os.getenv("DISTILL_MIN_CLASS_SAMPLES", 10))
+    DISTILL_EPOCHS = int(os.getenv("DISTILL_EPOCHS", 30))
+    DISTILL_LR = float(os.getenv("DISTILL_LR", 1e-2))
+
+    # `watch`: continuous ingestion of products_dir into the served index.
+    # A new or changed image is embedded once its size and mtime have held
+    # for WATCH_DEBOUNCE_SECONDS, in micro-batches of up to WATCH_BATCH_SIZE.
+    # The directory is rescanned every WATCH_POLL_SECONDS (sooner on an
+    # inotify event). Live products are published as a snapshot every
+    # WATCH_FOLD_SECONDS or once WATCH_FOLD_ROWS have accumulated. The
+    # standalone `watch` command publishes every WATCH_PUBLISH_SECONDS
+    # instead: other processes only see published products, but every
+    # publish rewrites (and checksums) the whole index.
+    WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", 2.0))
+    WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", 1.0))
+    WATCH_BATCH_SIZE = int(os.getenv("WATCH_BATCH_SIZE", 32))
+    WATCH_FOLD_SECONDS = float(os.getenv("WATCH_FOLD_SECONDS", 300))
+    WATCH_FOLD_ROWS = int(os.getenv("WATCH_FOLD_ROWS", 1000))
+    WATCH_PUBLISH_SECONDS = float(os.getenv("WATCH_PUBLISH_SECONDS", 30))
+
+    # classify-bulk: images per batched forward and per SQLite transaction
+    BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 32))
+    CLASSIFY_DB_PATH = os.getenv("CLASSIFY_DB_PATH", "data/classifications.db")
+
 
 settings = Settings()
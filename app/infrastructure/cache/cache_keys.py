@@ -9,6 +9,14 @@ class CacheKeys:
         return f"attribute_model:{category}:{attribute}"
     
 
+    @staticmethod
+    def attribute_threshold(category: str, attribute: str) -> str:
+        if not category or not attribute:
+            raise ValueError("Invalid cache key arguments")
+        
+        return f"attribute_threshold:{category}:{attribute}"
+    
+
     @staticmethod
     def category_models(category: str) -> str:
         if not category:
@@ -35,5 +43,50 @@ class CacheKeys:
         return f"faiss_index:{category}"
     
 
+    @staticmethod
+    def label_embeddings(fingerprint: str, labels: list[str]) -> str:
+        if not fingerprint or not labels:
+            raise ValueError("Invalid cache key arguments")
+
+        return f"label_embeddings:{CacheKeys._hash_text(fingerprint)}:{CacheKeys._hash_text(chr(10).join(labels))}"
+    
+
+    @staticmethod
+    def query_result(content_hash: str, fingerprint: str, top_k: int, index_version: str) -> str:
+        if not content_hash or not fingerprint or not index_version:
+            raise ValueError("Invalid cache key arguments")
+
+        return f"query_result:{content_hash}:{CacheKeys._hash_text(fingerprint)}:{top_k}:{index_version}"
+    
+
+    @staticmethod
+    def classify_result(
+        content_hash: str, fingerprint: str, use_trained: bool, models_version: str, cascade: bool = False
+    ) -> str:
+        if not content_hash or not fingerprint or not models_version:
+            raise ValueError("Invalid cache key arguments")
+
+        mode = "cascade" if cascade else "trained" if use_trained else "zeroshot"
+
+        return f"classify_result:{content_hash}:{CacheKeys._hash_text(fingerprint)}:{mode}:{models_version}"
+    
+
+    @staticmethod
+    def content_hash(img_path: str) -> str:
+        """
+        Hash of the image file's bytes, so renamed or re-uploaded copies
+        of the same image share cache entries.
+        """
+        if not img_path:
+            raise ValueError("Invalid cache key argument")
+
+        with open(img_path, "rb") as f:
+            return hashlib.md5(f.read()).hexdigest()
+    
+
+    def _hash_text(text: str) -> str:
+        return hashlib.md5(text.encode()).hexdigest()[:12]
+
+
     def _hash_img_path(path: str) -> str:
         return hashlib.md5(path.encode()).hexdigest()
\ No newline at end of file
@@ -1,10 +1,16 @@
 from app.interfaces.cache import I_Cache
 from app.infrastructure.cache.providers.memory_cache import MemoryCache
+from app.infrastructure.cache.single_flight import SingleFlight
+from app.infrastructure.cache.warmup_manifest import WarmupManifest
+from app.infrastructure.metrics.memory import estimate_bytes
 
 
 class Cache(I_Cache):
-    def __init__(self):
+    def __init__(self, manifest: WarmupManifest | None = None):
         self._provider: I_Cache = MemoryCache()
+        self._flight = SingleFlight()
+        # Records get_or_load/get_many accesses so the hottest keys can be preloaded
+        self.manifest = manifest
 
     def get(self, key: str):
         return self._provider.get(key=key)
@@ -25,5 +31,63 @@ class Cache(I_Cache):
     def delete(self, key: str):
         self._provider.delete(key)
 
+
+    def get_many(self, keys: list[str]) -> dict:
+        found = self._provider.get_many(keys)
+        # Hits count towards warmup, as in get_or_load
+        if self.manifest:
+            for key in found:
+                self.manifest.record(key)
+        return found
+
+
+    def set_many(self, items: dict):
+        self._provider.set_many(items)
+
+
+    def delete_prefix(self, prefix: str) -> int:
+        return self._provider.delete_prefix(prefix)
+
+
+    def contains(self, key: str) -> bool:
+        return self._provider.contains(key)
+
+
+    def count(self, prefix: str = "") -> int:
+        return self._provider.count(prefix)
+
+
+    def get_or_load(self, key: str, loader):
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+
+        Concurrent misses for the same key share a single `loader()` call;
+        the others wait for it instead of loading the same thing again.
+        None results are returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            if self.manifest:
+                self.manifest.record(key)
+            return value
+
+        def load_and_set():
+            # The previous flight may have filled the key just before this one started
+            value = self.get(key)
+            if value is None:
+                value = loader()
+                if value is not None:
+                    self.set(key, value)
+                    if self.manifest:
+                        self.manifest.record(key, estimate_bytes(value))
+            return value
+
+        return self._flight.do(key, load_and_set)
+
+
     def info(self):
-        return self._provider.info()
\ No newline at end of file
+        return self._provider.info()
+
+
+    def memory_usage(self) -> dict[str, int]:
+        return self._provider.memory_usage()
\ No newline at end of file
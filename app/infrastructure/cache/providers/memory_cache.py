@@ -1,44 +1,98 @@
+import threading
+
 from app.interfaces.cache import I_Cache
-from sys import getsizeof
+from app.infrastructure.metrics.memory import estimate_bytes
 
 
 class MemoryCache(I_Cache):
     """
     Simple in-memory cache implementing I_Cache interface.
+
+    Safe for concurrent use: every operation holds a lock, and anything
+    that iterates works on a snapshot taken under it.
     """
     
     def __init__(self):
         self._store = {}
+        self._lock = threading.RLock()
 
 
     def get(self, key: str):
-        return self._store.get(key)
+        with self._lock:
+            return self._store.get(key)
     
 
     def set(self, key: str, value):
-        self._store[key] = value
+        with self._lock:
+            self._store[key] = value
 
 
     def clear(self):
-        self._store.clear()
+        with self._lock:
+            self._store.clear()
 
     
     def keys(self) -> list[str]:
-        return list(self._store.keys())
+        with self._lock:
+            return list(self._store.keys())
     
 
     def delete(self, key: str):
-        if key in self._store:
-            del self._store[key]
+        with self._lock:
+            self._store.pop(key, None)
+
+
+    def get_many(self, keys: list[str]) -> dict:
+        with self._lock:
+            return {key: self._store[key] for key in keys if key in self._store}
+
+
+    def set_many(self, items: dict):
+        with self._lock:
+            self._store.update(items)
+
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._store if k.startswith(prefix)]
+            for key in keys:
+                del self._store[key]
+        return len(keys)
+
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._store
+
+
+    def count(self, prefix: str = "") -> int:
+        with self._lock:
+            if not prefix:
+                return len(self._store)
+            return sum(1 for k in self._store if k.startswith(prefix))
+
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Estimated bytes per key type (the prefix before the first ':'),
+        counting tensor/array payloads rather than just object headers.
+        """
+        with self._lock:
+            items = list(self._store.items())
+
+        usage = {}
+        for k, v in items:
+            group = f"cache.{k.split(':', 1)[0]}"
+            usage[group] = usage.get(group, 0) + estimate_bytes(k) + estimate_bytes(v)
+
+        return usage
 
 
     def info(self):
-        keys = self.keys()
-        size = getsizeof(self._store)
-        for k, v in self._store.items():
-            size += getsizeof(k) + getsizeof(v)
+        usage = self.memory_usage()
+        size = sum(usage.values())
         
         return {
-            "num_entries": len(keys),
+            "num_entries": self.count(),
             "size": f"{round(size / (1024 * 1024), 4)} Mb"
         }
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Warmup manifest: how often each lazily loaded cache key is accessed, and
+how big its value was, persisted as JSON so the next process can preload
+the hottest entries at startup (see WarmupService).
+
+    {"attribute_model:shoe:color": {"count": 412, "bytes": 1050624}, ...}
+"""
+
+import os
+import json
+import threading
+
+
+class WarmupManifest:
+    """
+    Args:
+        path:        JSON file the counts are persisted to.
+        flush_every: Save after this many new accesses (0 = only on save()).
+
+    Counts recorded since the last save are added to what is on disk at
+    save time, so several processes (e.g. prefork workers) can share one
+    manifest without overwriting each other's counts.
+    """
+
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending: dict[str, int] = {}
+        self._sizes: dict[str, int] = {}
+        self._entries = self._read()
+
+
+    def record(self, key: str, nbytes: int | None = None):
+        """Count one access to `key`; `nbytes` is its value's size, if known."""
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            if nbytes is not None:
+                self._sizes[key] = nbytes
+            due = self.flush_every and sum(self._pending.values()) >= self.flush_every
+
+        if due:
+            self.save()
+
+
+    def entries(self) -> list[tuple[str, int, int | None]]:
+        """(key, count, bytes) for every known key, most accessed first."""
+        with self._lock:
+            merged = self._merge(self._entries)
+
+        rows = [(k, v["count"], v.get("bytes")) for k, v in merged.items()]
+        return sorted(rows, key=lambda r: r[1], reverse=True)
+
+
+    def plan(self, budget_bytes: int) -> list[str]:
+        """
+        Most accessed keys whose combined size fits in `budget_bytes`.
+        Keys of unknown size are assumed to be free.
+        """
+        keys, used = [], 0
+        for key, _, nbytes in self.entries():
+            if used + (nbytes or 0) > budget_bytes:
+                continue
+            keys.append(key)
+            used += nbytes or 0
+
+        return keys
+
+
+    def save(self):
+        with self._lock:
+            # Re-read so counts flushed by other processes are kept
+            self._entries = self._merge(self._read())
+            self._pending.clear()
+            self._sizes.clear()
+            entries = dict(self._entries)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+    def _merge(self, base: dict) -> dict:
+        merged = {k: dict(v) for k, v in base.items()}
+        for key in self._pending.keys() | self._sizes.keys():
+            entry = merged.setdefault(key, {"count": 0})
+            entry["count"] += self._pending.get(key, 0)
+            if key in self._sizes:
+                entry["bytes"] = self._sizes[key]
+
+        return merged
+
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A corrupt manifest only costs a cold start
+            return {}
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from app.interfaces.repository import I_ClassificationRepository
+
+
+class SqliteClassificationRepository(I_ClassificationRepository):
+    """
+    Classification results in a single SQLite file.
+
+    One row per (content_hash, mode); re-classifying an image with a new
+    model or new heads replaces its row. WAL journaling lets readers query
+    the table while a bulk run is writing to it.
+
+    Args:
+        path: Database file; parent directories are created.
+    """
+
+    # SQLite caps bound parameters per statement (999 on older builds)
+    _MAX_PARAMS = 900
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS classifications (
+                content_hash        TEXT NOT NULL,
+                mode                TEXT NOT NULL,
+                path                TEXT NOT NULL,
+                category            TEXT NOT NULL,
+                category_confidence REAL NOT NULL,
+                attributes          TEXT NOT NULL,
+                fingerprint         TEXT NOT NULL,
+                models_version      TEXT NOT NULL,
+                classified_at       REAL NOT NULL,
+                PRIMARY KEY (content_hash, mode)
+            )
+            """
+        )
+        self._conn.commit()
+
+
+    def classified(self, content_hashes: list[str], mode: str, fingerprint: str, models_version: str) -> set[str]:
+        found = set()
+
+        with self._lock:
+            for start in range(0, len(content_hashes), self._MAX_PARAMS):
+                chunk = content_hashes[start:start + self._MAX_PARAMS]
+                rows = self._conn.execute(
+                    f"""
+                    SELECT content_hash FROM classifications
+                    WHERE mode = ? AND fingerprint = ? AND models_version = ?
+                      AND content_hash IN ({",".join("?" * len(chunk))})
+                    """,
+                    [mode, fingerprint, models_version, *chunk],
+                )
+                found.update(row[0] for row in rows)
+
+        return found
+
+
+    def save_many(self, rows: list[dict]):
+        now = time.time()
+        values = [
+            (
+                row["content_hash"],
+                row["mode"],
+                row["path"],
+                row["category"],
+                row["category_confidence"],
+                json.dumps(row["attributes"]),
+                row["fingerprint"],
+                row["models_version"],
+                now,
+            )
+            for row in rows
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values
+            )
+
+
+    def get(self, content_hash: str, mode: str) -> dict | None:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM classifications WHERE content_hash = ? AND mode = ?", (content_hash, mode)
+            )
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+
+        if row is None:
+            return None
+
+        result = dict(zip(columns, row))
+        result["attributes"] = json.loads(result["attributes"])
+        return result
+
+
+    def count(self, mode: str | None = None) -> int:
+        with self._lock:
+            if mode is None:
+                return self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM classifications WHERE mode = ?", (mode,)
+            ).fetchone()[0]
+
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,26 +5,54 @@ from PIL import Image
 from transformers import CLIPProcessor, CLIPModel
 import torch.nn.functional as F
 
+from app.interfaces.cache import I_Cache
 from app.interfaces.embedding import I_EmbeddingModel
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.cache.chache import Cache
+from app.infrastructure.metrics.memory import torch_module_bytes
+from app.infrastructure.metrics.timing import span
 from app.config import settings
 
 
 class ClipEmbeddingModel(I_EmbeddingModel):
-    def __init__(self, preprocessor=None):
+    def __init__(self, preprocessor=None, cache: I_Cache | None = None):
         self.device = settings.DEVICE
         self.model = CLIPModel.from_pretrained(settings.EMBEDDING_MODEL).to(self.device)
         self.processor = CLIPProcessor.from_pretrained(settings.EMBEDDING_MODEL)
         self.preprocessor = preprocessor
+        # Holds the label embedding banks used by zero-shot classification
+        self.cache = cache if cache is not None else Cache()
+
+    def fingerprint(self) -> str:
+        preprocessor = self.preprocessor.fingerprint() if self.preprocessor else "none"
+        return f"{settings.EMBEDDING_MODEL}|{preprocessor}"
+
+    def memory_usage(self) -> dict[str, int]:
+        """Parameter + buffer bytes of each CLIP tower."""
+        vision = torch_module_bytes(self.model.vision_model) + torch_module_bytes(self.model.visual_projection)
+        text = torch_module_bytes(self.model.text_model) + torch_module_bytes(self.model.text_projection)
+
+        return {
+            "clip.vision_tower": vision,
+            "clip.text_tower": text,
+            "clip.other": torch_module_bytes(self.model) - vision - text,
+        }
 
     def encode_image(
-        self, image_path: str, save_preprocessed: bool = False, save_dir: str = "data/preprocessed"
+        self,
+        image_path: str,
+        save_preprocessed: bool = False,
+        save_dir: str = "data/preprocessed",
+        preprocessed_store=None,
     ) -> np.ndarray:
-        image = Image.open(image_path).convert("RGB")
+        """
+        With `preprocessed_store` (a PreprocessedStore), the preprocessed
+        image is read from / written to it instead of re-running the
+        preprocessor.
+        """
+        image = self._load_image(image_path, preprocessed_store)
 
-        # Preprocess if preprocessor is available
         if self.preprocessor:
-            image = self.preprocessor.preprocess(image)
-
             # Save preprocessed image if requested
             if save_preprocessed:
                 os.makedirs(save_dir, exist_ok=True)
@@ -32,11 +60,57 @@ class ClipEmbeddingModel(I_EmbeddingModel):
                 preprocessed_path = os.path.join(save_dir, f"pre_{filename}")
                 image.save(preprocessed_path)
 
-        inputs = self.processor(images=image, return_tensors="pt")
+        return self._image_features([image])[0]
+
+    def encode_images(self, image_paths: list[str], preprocessed_store=None) -> np.ndarray:
+        """
+        Encode a batch of images with a single CLIP forward pass.
+        Returns an (n, dim) float32 array of L2-normalised embeddings.
+        """
+        if self.preprocessor and preprocessed_store is not None:
+            images = [preprocessed_store.load(path, self.preprocessor) for path in image_paths]
+            return self._image_features(images)
+
+        with span("image.decode"):
+            images = [Image.open(path).convert("RGB") for path in image_paths]
+
+        if self.preprocessor:
+            with span("preprocess"):
+                images = self.preprocessor.preprocess_batch(images)
+
+        return self._image_features(images)
+
+    def _load_image(self, image_path: str, preprocessed_store=None) -> Image.Image:
+        if self.preprocessor and preprocessed_store is not None:
+            return preprocessed_store.load(image_path, self.preprocessor)
+
+        with span("image.decode"):
+            image = Image.open(image_path).convert("RGB")
+
+        # Preprocess if preprocessor is available
+        if self.preprocessor:
+            with span("preprocess"):
+                image = self.preprocessor.preprocess(image)
+
+        return image
+
+    def warmup(self, batch_sizes: list[int]) -> None:
+        blank = Image.new("RGB", (224, 224), (255, 255, 255))
+
+        # Creates the background-removal session, if any
+        if self.preprocessor:
+            self.preprocessor.preprocess(blank)
+
+        for batch_size in batch_sizes:
+            self._image_features([blank] * batch_size)
+
+    def _image_features(self, images: list[Image.Image]) -> np.ndarray:
+        with span("clip.processor"):
+            inputs = self.processor(images=images, return_tensors="pt")
 
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
-        with torch.no_grad():
+        with span("clip.forward"), torch.no_grad():
             outputs = self.model.get_image_features(**inputs)
 
         # Ensure tensor extraction
@@ -45,28 +119,73 @@ class ClipEmbeddingModel(I_EmbeddingModel):
         else:
             features = outputs
 
-        features = features.detach().cpu().numpy()[0]
-        features = features / np.linalg.norm(features)
+        features = features.detach().cpu().numpy()
+        features = features / np.linalg.norm(features, axis=1, keepdims=True)
 
         return features.astype("float32")
     
     
+    def text_embeddings(self, labels: list[str]) -> torch.Tensor:
+        """
+        L2-normalised text embeddings of `labels`, shape (len(labels), dim).
+
+        Each label list is encoded once and kept in the cache; concurrent
+        first calls for the same list share one text-tower forward.
+        """
+        key = CacheKeys.label_embeddings(self.fingerprint(), labels)
+
+        return self.cache.get_or_load(key, lambda: self._encode_text(labels))
+
+    def _encode_text(self, labels: list[str]) -> torch.Tensor:
+        with span("clip.processor"):
+            inputs = self.processor(text=labels, return_tensors="pt", padding=True)
+
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        with span("clip.forward_text"), torch.no_grad():
+            features = self.model.get_text_features(**inputs)
+
+        if hasattr(features, "pooler_output"):
+            features = features.pooler_output
+
+        return F.normalize(features, dim=-1)
+
+    def zeroshot_image_features(self, image_paths: list[str]) -> np.ndarray:
+        # Zero-shot scores the raw image, not the preprocessed one
+        with span("image.decode"):
+            images = [Image.open(path).convert("RGB") for path in image_paths]
+
+        return self._image_features(images)
+
+    def zeroshot_probs(self, image_features: np.ndarray, labels: list[str]) -> np.ndarray:
+        text_features = self.text_embeddings(labels)
+
+        with span("clip.zeroshot_scores"), torch.no_grad():
+            image_features = torch.from_numpy(image_features).to(self.device)
+            logits = self.model.logit_scale.exp() * image_features @ text_features.T
+            probs = F.softmax(logits, dim=1)
+
+        return probs.cpu().numpy()
+
     def classify_img_zeroshot(self, img_path: str, labels: list[str]):
-        img = Image.open(img_path).convert("RGB")
+        with span("image.decode"):
+            img = Image.open(img_path).convert("RGB")
 
-        inputs = self.processor(
-            text=labels,
-            images=img,
-            return_tensors="pt",
-            padding=True
-        )
+        text_features = self.text_embeddings(labels)
+
+        with span("clip.processor"):
+            inputs = self.processor(images=img, return_tensors="pt")
 
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
-        with torch.no_grad():
-            outputs = self.model(**inputs)
+        # Same logits as CLIPModel.forward: scaled cosine similarity
+        with span("clip.forward_zeroshot"), torch.no_grad():
+            image_features = self.model.get_image_features(**inputs)
+            if hasattr(image_features, "pooler_output"):
+                image_features = image_features.pooler_output
+            image_features = F.normalize(image_features, dim=-1)
 
-            logits_per_img = outputs.logits_per_image
+            logits_per_img = self.model.logit_scale.exp() * image_features @ text_features.T
             probs = F.softmax(logits_per_img, dim=1)
 
         probs = probs.cpu().numpy()[0]
@@ -0,0 +1,112 @@
+"""
+app/infrastructure/embedding/dummy_model.py
+--------------------------------------------
+Deterministic stand-in for ClipEmbeddingModel — no torch, no weights.
+
+Use this when:
+  - running tests or benchmarks offline
+  - measuring everything around the model (preprocessing, search, services)
+    without the CLIP forward dominating
+
+An image is embedded by projecting a small thumbnail of it with a fixed
+random matrix, so identical images always map to identical vectors and
+similar-looking images land close together. Zero-shot labels get a fixed
+pseudo-random text vector derived from a hash of the label.
+"""
+
+import os
+import hashlib
+import numpy as np
+from PIL import Image
+
+from app.interfaces.embedding import I_EmbeddingModel
+from app.config import settings
+
+
+class DummyEmbeddingModel(I_EmbeddingModel):
+    """
+    Args:
+        preprocessor: Optional I_ImagePreprocessor applied before embedding,
+                      exactly as ClipEmbeddingModel does.
+        dimension:    Embedding size (default settings.EMBEDDING_DIM).
+        seed:         Seed of the projection matrix; same seed → same vectors.
+    """
+
+    THUMBNAIL_SIZE = (16, 16)
+
+    def __init__(self, preprocessor=None, dimension: int = settings.EMBEDDING_DIM, seed: int = 0):
+        self.preprocessor = preprocessor
+        self.dimension = dimension
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        num_pixels = self.THUMBNAIL_SIZE[0] * self.THUMBNAIL_SIZE[1] * 3
+        self.projection = rng.standard_normal((num_pixels, dimension)).astype("float32")
+
+    def fingerprint(self) -> str:
+        preprocessor = self.preprocessor.fingerprint() if self.preprocessor else "none"
+        return f"dummy-{self.dimension}-{self.seed}|{preprocessor}"
+
+    def encode_image(
+        self,
+        image_path: str,
+        save_preprocessed: bool = False,
+        save_dir: str = "data/preprocessed",
+        preprocessed_store=None,
+    ) -> np.ndarray:
+        image = self._load(image_path, preprocessed_store)
+
+        if self.preprocessor and save_preprocessed:
+            os.makedirs(save_dir, exist_ok=True)
+            image.save(os.path.join(save_dir, f"pre_{os.path.basename(image_path)}"))
+
+        return self._embed([image])[0]
+
+    def encode_images(self, image_paths: list[str], preprocessed_store=None) -> np.ndarray:
+        return self._embed([self._load(path, preprocessed_store) for path in image_paths])
+
+    def warmup(self, batch_sizes: list[int]) -> None:
+        blank = Image.new("RGB", (224, 224), (255, 255, 255))
+        for batch_size in batch_sizes:
+            self._embed([blank] * batch_size)
+
+    def classify_img_zeroshot(self, img_path: str, labels: list[str]):
+        probs = self.zeroshot_probs(self.zeroshot_image_features([img_path]), labels)[0]
+        return sorted(zip(labels, probs.tolist()), key=lambda x: x[1], reverse=True)
+
+    def zeroshot_image_features(self, image_paths: list[str]) -> np.ndarray:
+        return self.encode_images(image_paths)
+
+    def zeroshot_probs(self, image_features: np.ndarray, labels: list[str]) -> np.ndarray:
+        text_vectors = np.stack([self._text_vector(label) for label in labels])
+
+        # Same temperature as CLIP's logit scale
+        logits = 100.0 * (image_features @ text_vectors.T)
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def _load(self, image_path: str, preprocessed_store=None) -> Image.Image:
+        if self.preprocessor and preprocessed_store is not None:
+            return preprocessed_store.load(image_path, self.preprocessor)
+
+        image = Image.open(image_path).convert("RGB")
+        if self.preprocessor:
+            image = self.preprocessor.preprocess(image)
+        return image
+
+    def _embed(self, images: list[Image.Image]) -> np.ndarray:
+        thumbnails = np.stack([
+            np.asarray(img.resize(self.THUMBNAIL_SIZE, Image.BILINEAR), dtype="float32").ravel()
+            for img in images
+        ])
+        # Centre pixel values so plain white/black images don't all align
+        features = (thumbnails / 255.0 - 0.5) @ self.projection
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        features = features / np.maximum(norms, 1e-12)
+
+        return features.astype("float32")
+
+    def _text_vector(self, label: str) -> np.ndarray:
+        label_seed = int(hashlib.md5(f"{self.seed}:{label}".encode()).hexdigest()[:8], 16)
+        vector = np.random.default_rng(label_seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).astype("float32")
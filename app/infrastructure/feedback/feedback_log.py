@@ -0,0 +1,125 @@
+"""
+app/infrastructure/feedback/feedback_log.py
+--------------------------------------------
+Compact append-only store of label corrections.
+
+Layout:
+
+    <root>/<category>/<attribute>/
+        records.bin     fixed-size records: float16 embedding + uint32 label id
+        labels.json     label id → label (append-only list)
+
+A record is 1 KB at 512 dims. Records are appended with a single write
+to a file opened with O_APPEND and never rewritten, so readers (memory-
+mapping the file) only ever see whole records followed, at worst, by a
+partial one that they ignore. labels.json is replaced atomically before
+a record with a new label is appended. One writer process at a time.
+"""
+
+import os
+import json
+import threading
+import numpy as np
+
+from app.config import settings
+from app.interfaces.feedback import I_FeedbackStore
+
+
+class FeedbackLog(I_FeedbackStore):
+    """
+    Args:
+        root:      Base directory.
+        dimension: Embedding size.
+    """
+
+    def __init__(self, root: str = settings.FEEDBACK_DIR, dimension: int = settings.EMBEDDING_DIM):
+        self.root = root
+        self.dimension = dimension
+        self.record_dtype = np.dtype([("embedding", "<f2", (dimension,)), ("label", "<u4")])
+
+        self._lock = threading.Lock()
+        self._labels: dict[tuple[str, str], list[str]] = {}
+
+
+    def append(self, category: str, attribute: str, embedding: np.ndarray, label: str) -> int:
+        record = np.zeros(1, dtype=self.record_dtype)
+        record["embedding"] = np.asarray(embedding, dtype="float32").reshape(self.dimension)
+
+        with self._lock:
+            path = self._path(category, attribute)
+            os.makedirs(path, exist_ok=True)
+
+            labels = self._read_labels(category, attribute)
+            if label not in labels:
+                labels.append(label)
+                tmp_path = os.path.join(path, "labels.json.tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(labels, f)
+                os.replace(tmp_path, os.path.join(path, "labels.json"))
+            record["label"] = labels.index(label)
+
+            fd = os.open(os.path.join(path, "records.bin"), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, record.tobytes())
+            finally:
+                os.close(fd)
+
+            return self.count(category, attribute)
+
+
+    def read(self, category: str, attribute: str, start: int = 0, stop: int | None = None) -> tuple[np.ndarray, list[str]]:
+        count = self.count(category, attribute)
+        stop = count if stop is None else min(stop, count)
+        if start >= stop:
+            return np.zeros((0, self.dimension), dtype="float32"), []
+
+        records = np.memmap(
+            os.path.join(self._path(category, attribute), "records.bin"),
+            dtype=self.record_dtype,
+            mode="r",
+            shape=(count,),
+        )[start:stop]
+
+        with self._lock:
+            labels = self._read_labels(category, attribute, min_size=int(records["label"].max()) + 1)
+
+        return records["embedding"].astype("float32"), [labels[i] for i in records["label"]]
+
+
+    def count(self, category: str, attribute: str) -> int:
+        try:
+            size = os.path.getsize(os.path.join(self._path(category, attribute), "records.bin"))
+        except FileNotFoundError:
+            return 0
+        # A trailing partial record is an append in progress
+        return size // self.record_dtype.itemsize
+
+
+    def attributes(self) -> list[tuple[str, str]]:
+        if not os.path.isdir(self.root):
+            return []
+
+        return sorted(
+            (category, attribute)
+            for category in os.listdir(self.root)
+            for attribute in os.listdir(os.path.join(self.root, category))
+            if self.count(category, attribute) > 0
+        )
+
+
+    def _path(self, category: str, attribute: str) -> str:
+        return os.path.join(self.root, category, attribute)
+
+    def _read_labels(self, category: str, attribute: str, min_size: int = 0) -> list[str]:
+        """Label list, re-read from disk if it's shorter than `min_size` (another process added labels)."""
+        key = (category, attribute)
+        labels_path = os.path.join(self._path(category, attribute), "labels.json")
+
+        if key not in self._labels or len(self._labels[key]) < max(min_size, 1):
+            try:
+                with open(labels_path, "r") as f:
+                    self._labels[key] = json.load(f)
+            except FileNotFoundError:
+                self._labels[key] = []
+
+        return self._labels[key]
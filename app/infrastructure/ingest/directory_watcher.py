@@ -0,0 +1,161 @@
+"""
+app/infrastructure/ingest/directory_watcher.py
+--------------------------------------------
+Change detection for a directory of product images.
+
+Every scan stats the directory's image files and compares (mtime, size)
+with the stat each file had when it was last acknowledged. A new or
+changed file is reported once its stat has stayed the same for
+`debounce` seconds, so files still being copied and bursts of writes to
+the same file are picked up once, complete. Files acknowledged earlier
+and now gone are reported as removed.
+
+On Linux, an inotify descriptor (via libc, no extra dependency) wakes
+wait() as soon as anything in the directory changes; elsewhere, or if
+inotify is unavailable (e.g. some network filesystems), wait() simply
+sleeps and the scan polls. Either way the scan is what decides what
+changed, so a missed or coalesced event costs latency, never a file.
+"""
+
+import os
+import sys
+import time
+import select
+import ctypes
+import ctypes.util
+
+from app.config import settings
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_INOTIFY_MASK = 0x002 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+
+class DirectoryWatcher:
+    """
+    Args:
+        directory: Directory to watch (not recursive, like rebuild).
+        debounce:  Seconds a file's stat must stay unchanged before it is reported.
+        inotify:   Use inotify wake-ups where available.
+    """
+
+    def __init__(self, directory: str, debounce: float = settings.WATCH_DEBOUNCE_SECONDS, inotify: bool = True):
+        self.directory = directory
+        self.debounce = debounce
+
+        self._acknowledged: dict[str, tuple[int, int]] = {}
+        # filename → (stat, monotonic time it was first seen with that stat)
+        self._pending: dict[str, tuple[tuple[int, int], float]] = {}
+        self._fd = _inotify_watch(directory) if inotify else None
+
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+
+    def seed(self, stats: dict[str, tuple[int, int]]):
+        """Treat `stats` (filename → (mtime_ns, size)) as already acknowledged."""
+        self._acknowledged.update(stats)
+
+
+    def stat_all(self) -> dict[str, tuple[int, int]]:
+        """(mtime_ns, size) of every image file in the directory."""
+        stats = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        stats[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    # Removed between listing and stat
+                    continue
+        return stats
+
+
+    def scan(self) -> tuple[list[str], list[str]]:
+        """(settled new or changed filenames, removed filenames), both sorted."""
+        now = time.monotonic()
+        current = self.stat_all()
+        ready = []
+
+        for filename, stat in current.items():
+            if self._acknowledged.get(filename) == stat:
+                self._pending.pop(filename, None)
+                continue
+
+            seen = self._pending.get(filename)
+            if seen is None or seen[0] != stat:
+                self._pending[filename] = (stat, now)
+            elif now - seen[1] >= self.debounce:
+                ready.append(filename)
+
+        for filename in [f for f in self._pending if f not in current]:
+            del self._pending[filename]
+        removed = [f for f in self._acknowledged if f not in current]
+
+        return sorted(ready), sorted(removed)
+
+
+    def pending(self) -> int:
+        """Files changed but not yet settled."""
+        return len(self._pending)
+
+
+    def acknowledge(self, filenames: list[str] = (), removed: list[str] = ()):
+        """Mark reported files as handled at the stat they were reported with."""
+        for filename in filenames:
+            seen = self._pending.pop(filename, None)
+            if seen is not None:
+                self._acknowledged[filename] = seen[0]
+        for filename in removed:
+            self._acknowledged.pop(filename, None)
+
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to `timeout` seconds, waking early on an inotify event. True if woken by one."""
+        if self._fd is None:
+            time.sleep(timeout)
+            return False
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+
+        # Drain: the scan works out what changed, the events only wake it
+        try:
+            while os.read(self._fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _inotify_watch(directory: str) -> int | None:
+    """A non-blocking inotify descriptor watching `directory`, or None if unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _INOTIFY_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
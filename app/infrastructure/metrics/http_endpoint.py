@@ -0,0 +1,44 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.infrastructure.metrics.timing import StageTimings, timings as default_timings
+
+
+def start_metrics_server(
+    port: int, host: str = "127.0.0.1", timings: StageTimings = default_timings, warmup=None
+) -> ThreadingHTTPServer:
+    """
+    Serve `timings.render_text()` at GET /metrics on a daemon thread,
+    listening on `host` (loopback unless told otherwise).
+
+    With `warmup` (a WarmupService), GET /ready answers 200 once warmup has
+    finished and 503 before, with its status as JSON.
+
+    Returns the server so callers can shut it down.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.rstrip("/")
+            if path == "/metrics":
+                self._send(200, timings.render_text().encode(), "text/plain; version=0.0.4")
+            elif path == "/ready" and warmup is not None:
+                body = json.dumps(warmup.status()).encode()
+                self._send(200 if warmup.ready else 503, body, "application/json")
+            else:
+                self.send_error(404)
+
+        def _send(self, code: int, body: bytes, content_type: str):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # keep the interactive shell quiet
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
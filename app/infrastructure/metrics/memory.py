@@ -0,0 +1,146 @@
+"""
+Memory accounting helpers.
+
+    process_memory()        → RSS / USS of this process (from /proc on Linux)
+    estimate_bytes(obj)     → resident size of a tensor module, FAISS index,
+                              array or plain Python container
+    memory_tracker.track()  → RSS/USS snapshot before and after a component loads
+
+Components that hold large objects expose `memory_usage() -> dict[str, int]`
+(part name → bytes), built from `estimate_bytes`; see MemoryReportService.
+"""
+
+import sys
+import time
+import resource
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def process_memory() -> dict:
+    """
+    {"rss": bytes, "uss": bytes | None}.
+
+    USS (pages private to this process) is what a process really costs when
+    it shares model/index pages with others; it needs /proc/self/smaps_rollup.
+    Without /proc, RSS falls back to the peak from getrusage.
+    """
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+
+        return {
+            "rss": fields.get("Rss", 0),
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        }
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return {"rss": peak if sys.platform == "darwin" else peak * 1024, "uss": None}
+
+
+def torch_module_bytes(module) -> int:
+    """Parameter + buffer bytes of a torch nn.Module."""
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def faiss_index_bytes(index) -> int:
+    """Code bytes held by a FAISS index (sa_code_size × ntotal)."""
+    try:
+        return index.sa_code_size() * index.ntotal
+    except RuntimeError:
+        # Index types without a standalone codec; assume flat float32
+        return index.d * 4 * index.ntotal
+
+
+def estimate_bytes(obj, _seen: set | None = None) -> int:
+    """
+    Best-effort resident size of `obj`.
+
+    Memory-mapped arrays count as 0: their pages live in the page cache and
+    are only resident while touched. Objects exposing memory_usage() report
+    themselves.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if hasattr(obj, "memory_usage") and callable(obj.memory_usage):
+        return sum(obj.memory_usage().values())
+    if isinstance(obj, np.memmap):
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, "sa_code_size") and hasattr(obj, "ntotal"):
+        return faiss_index_bytes(obj)
+    if hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+        return torch_module_bytes(obj)
+    if hasattr(obj, "numel") and hasattr(obj, "element_size"):
+        return obj.numel() * obj.element_size()
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            estimate_bytes(k, seen) + estimate_bytes(v, seen) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(estimate_bytes(v, seen) for v in obj)
+
+    return sys.getsizeof(obj)
+
+
+class MemoryTracker:
+    """
+    Records process memory before and after each component loads:
+
+        with memory_tracker.track("embedding"):
+            embedding = ClipEmbeddingModel(...)
+
+    RSS deltas capture what estimate_bytes can't see (ONNX Runtime
+    sessions, allocator arenas, imported modules).
+    """
+
+    def __init__(self):
+        self.loads: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, name: str):
+        before = process_memory()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            after = process_memory()
+            snapshot = {
+                "rss_before": before["rss"],
+                "rss_after": after["rss"],
+                "rss_delta": after["rss"] - before["rss"],
+                "uss_delta": (
+                    after["uss"] - before["uss"]
+                    if before["uss"] is not None and after["uss"] is not None
+                    else None
+                ),
+                "seconds": time.perf_counter() - started,
+            }
+            with self._lock:
+                self.loads[name] = snapshot
+
+
+memory_tracker = MemoryTracker()
+
+
+def format_bytes(num: int | None) -> str:
+    if num is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num) < 1024:
+            return f"{num:.1f} {unit}" if unit != "B" else f"{num} B"
+        num /= 1024
+    return f"{num:.1f} TB"
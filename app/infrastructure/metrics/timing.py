@@ -0,0 +1,119 @@
+"""
+Lightweight per-stage latency instrumentation.
+
+    from app.infrastructure.metrics.timing import span
+
+    with span("clip.forward"):
+        outputs = model(**inputs)
+
+Each stage keeps a rolling window of its most recent durations (plus a
+lifetime count), from which p50/p95/p99 are computed on demand. When
+timing is disabled `span()` returns a shared no-op context manager, so an
+instrumented call costs one attribute check.
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+from app.config import settings
+
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("_timings", "_name", "_start")
+
+    def __init__(self, timings: "StageTimings", name: str):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timings.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class StageTimings:
+    """
+    Registry of rolling latency histograms, one per stage name.
+
+    Args:
+        window:  Number of most recent samples kept per stage.
+        enabled: When False, spans are no-ops and nothing is recorded.
+    """
+
+    def __init__(self, window: int = 1024, enabled: bool = True):
+        self.window = window
+        self.enabled = enabled
+        self._samples: dict[str, deque] = {}
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            samples.append(seconds)
+            self._counts[name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        Per-stage {"count", "p50_ms", "p95_ms", "p99_ms"}, sorted by stage name.
+        Percentiles cover the rolling window; count is lifetime.
+        """
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        stats = {}
+        for name in sorted(samples):
+            p50, p95, p99 = np.percentile(np.array(samples[name]) * 1000, [50, 95, 99])
+            stats[name] = {
+                "count": counts[name],
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+            }
+        return stats
+
+    def render_text(self) -> str:
+        """Prometheus text exposition format."""
+        lines = [
+            "# HELP stage_latency_seconds Latency of pipeline stages over a rolling window.",
+            "# TYPE stage_latency_seconds summary",
+        ]
+        for name, s in self.snapshot().items():
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(
+                    f'stage_latency_seconds{{stage="{name}",quantile="{quantile}"}} {s[key] / 1000:.6f}'
+                )
+            lines.append(f'stage_latency_seconds_count{{stage="{name}"}} {s["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+timings = StageTimings(window=settings.TIMINGS_WINDOW, enabled=settings.TIMINGS_ENABLED)
+
+
+def span(name: str):
+    """Time the enclosed block under `name` in the process-wide registry."""
+    return timings.span(name)
@@ -0,0 +1,169 @@
+"""
+app/infrastructure/preprocessing/adaptive_preprocessor.py
+-----------------------------------------------------------
+Per-image choice between a cheap colour-threshold mask and full rembg.
+
+Studio shots (product on a flat, uniform background) don't need U2Net: the
+background colour can be read off the image border and the product is
+everything that differs from it. Only images whose border isn't uniform
+(scenes, gradients, textures, products touching the edge) go through rembg.
+
+Decision, on a downscaled copy of the image:
+    1. Take a strip of pixels along all four borders.
+    2. Quantise them and find the dominant background colour from a
+       colour histogram.
+    3. The image is "clean" when at least `border_uniformity` of the
+       border pixels lie within `bg_tolerance` of that colour, and the
+       resulting foreground covers a sane fraction of the image.
+
+Crop, square pad and resize are shared with RembgPreprocessor, so both
+paths produce the same output geometry.
+"""
+
+import threading
+import numpy as np
+from PIL import Image, ImageChops
+
+from app.infrastructure.metrics.timing import span
+from app.infrastructure.preprocessing.rembg_preprocessor import RembgPreprocessor
+
+
+class AdaptivePreprocessor(RembgPreprocessor):
+    """
+    RembgPreprocessor that skips background removal on clean studio shots.
+
+    Args (in addition to RembgPreprocessor's):
+        border_fraction:   Width of the border strip, as a fraction of the
+                           shorter side.
+        border_uniformity: Fraction of border pixels that must match the
+                           dominant border colour for the cheap path.
+        bg_tolerance:      Max per-channel distance (0–255) from the
+                           background colour still counted as background.
+        foreground_range:  (min, max) fraction of the image the cheap mask
+                           may cover; outside it, rembg is used instead.
+        analysis_size:     Longest side of the copy the check runs on.
+
+    `path_counts()` reports how many images took each path.
+    """
+
+    THRESHOLD = "threshold"
+    REMBG = "rembg"
+
+    def __init__(
+        self,
+        target_size: tuple[int, int] = (224, 224),
+        padding_fraction: float = 0.1,
+        bg_color: tuple[int, int, int] = (255, 255, 255),
+        model_name: str = "u2net",
+        border_fraction: float = 0.04,
+        border_uniformity: float = 0.97,
+        bg_tolerance: int = 24,
+        foreground_range: tuple[float, float] = (0.01, 0.9),
+        analysis_size: int = 256,
+    ):
+        super().__init__(
+            target_size=target_size,
+            padding_fraction=padding_fraction,
+            bg_color=bg_color,
+            model_name=model_name,
+        )
+        self.border_fraction = border_fraction
+        self.border_uniformity = border_uniformity
+        self.bg_tolerance = bg_tolerance
+        self.foreground_range = foreground_range
+        self.analysis_size = analysis_size
+
+        self._counts = {self.THRESHOLD: 0, self.REMBG: 0}
+        self._counts_lock = threading.Lock()
+
+    def fingerprint(self) -> str:
+        return (
+            f"AdaptivePreprocessor(model={self.model_name},size={self.target_size},"
+            f"padding={self.padding_fraction},bg={self.bg_color},"
+            f"border={self.border_fraction},uniformity={self.border_uniformity},"
+            f"tolerance={self.bg_tolerance},foreground={self.foreground_range})"
+        )
+
+    def path_counts(self) -> dict[str, int]:
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def background_color(self, image: Image.Image) -> tuple[int, int, int] | None:
+        """
+        The flat background colour of `image`, or None when its border
+        isn't uniform enough for the cheap path.
+        """
+        # Integer box reduction: far cheaper than thumbnail() and plenty for a colour check
+        factor = max(1, max(image.size) // self.analysis_size)
+        small = image.convert("RGB").reduce(factor)
+        pixels = np.asarray(small, dtype=np.int16)
+
+        h, w, _ = pixels.shape
+        k = max(1, int(min(h, w) * self.border_fraction))
+        border = np.concatenate([
+            pixels[:k].reshape(-1, 3),
+            pixels[-k:].reshape(-1, 3),
+            pixels[k:-k, :k].reshape(-1, 3),
+            pixels[k:-k, -k:].reshape(-1, 3),
+        ])
+
+        # Dominant colour: most populated bin of a 16-level-per-channel histogram
+        bins = (border // 16) @ np.array([256, 16, 1])
+        top_bin = np.bincount(bins, minlength=4096).argmax()
+        color = border[bins == top_bin].mean(axis=0)
+
+        matches = np.abs(border - color).max(axis=1) <= self.bg_tolerance
+        if matches.mean() < self.border_uniformity:
+            return None
+
+        coverage = self._foreground_mask(small, tuple(int(c) for c in color.round())).mean()
+        low, high = self.foreground_range
+        if not low <= coverage <= high:
+            return None
+
+        return tuple(int(c) for c in color.round())
+
+    def _remove_bg(self, img_rgba: Image.Image) -> Image.Image:
+        with span("preprocess.bg_check"):
+            color = self.background_color(img_rgba)
+
+        if color is None:
+            self._count(self.REMBG)
+            with span("preprocess.bg_rembg"):
+                return super()._remove_bg(img_rgba)
+
+        self._count(self.THRESHOLD)
+        with span("preprocess.bg_threshold"):
+            alpha = self._foreground_mask(img_rgba.convert("RGB"), color).astype(np.uint8) * 255
+
+            result = img_rgba.copy()
+            result.putalpha(Image.fromarray(alpha))
+
+        return result
+
+    def _foreground_mask(self, image: Image.Image, color: tuple[int, int, int]) -> np.ndarray:
+        """
+        Pixels of the RGB `image` that differ from `color`, with holes
+        filled: a pixel is foreground if foreground pixels surround it both
+        horizontally and vertically, so light details inside the product
+        (e.g. a white logo on a white background) aren't cut out.
+        """
+        # Per-pixel max channel distance, computed in PIL (much faster than numpy int16 maths)
+        diff = ImageChops.difference(image, Image.new("RGB", image.size, color))
+        r, g, b = diff.split()
+        distance = ImageChops.lighter(ImageChops.lighter(r, g), b)
+        differs = np.asarray(distance) > self.bg_tolerance
+
+        def spans(mask):
+            # Fill each row between its first and last foreground pixel
+            first = mask.argmax(axis=1)
+            last = mask.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)
+            cols = np.arange(mask.shape[1])
+            filled = (cols >= first[:, None]) & (cols <= last[:, None])
+            return filled & mask.any(axis=1)[:, None]
+
+        return spans(differs) & spans(differs.T).T
+
+    def _count(self, path: str):
+        with self._counts_lock:
+            self._counts[path] += 1
@@ -8,6 +8,8 @@ def make_preprocessor(config=settings) -> I_ImagePreprocessor:
 
     Reads:
         config.USE_BG_REMOVAL    (bool)  → RembgPreprocessor or Passthrough
+        config.BG_REMOVAL_MODE   (str)   → "always" (rembg on every image) or
+                                           "adaptive" (AdaptivePreprocessor)
         config.PREPROCESS_SIZE   (tuple) → target output size, e.g. (224, 224)
         config.PREPROCESS_PADDING (float) → padding fraction, e.g. 0.1
         config.PREPROCESS_BG_COLOR (tuple) → canvas fill, e.g. (255, 255, 255)
@@ -20,6 +22,7 @@ def make_preprocessor(config=settings) -> I_ImagePreprocessor:
     """
     # Import here to avoid circular imports and to keep rembg optional
     from app.infrastructure.preprocessing.rembg_preprocessor import RembgPreprocessor
+    from app.infrastructure.preprocessing.adaptive_preprocessor import AdaptivePreprocessor
     from app.infrastructure.preprocessing.passthrough_preprocessor import (
         PassthroughPreprocessor,
     )
@@ -31,7 +34,12 @@ def make_preprocessor(config=settings) -> I_ImagePreprocessor:
     }
 
     if getattr(config, "USE_BG_REMOVAL", True):
-        return RembgPreprocessor(
+        mode = getattr(config, "BG_REMOVAL_MODE", "always")
+        if mode not in ("always", "adaptive"):
+            raise ValueError(f"Unknown BG_REMOVAL_MODE: {mode}")
+
+        preprocessor_cls = AdaptivePreprocessor if mode == "adaptive" else RembgPreprocessor
+        return preprocessor_cls(
             **shared_kwargs,
             padding_fraction=getattr(config, "PREPROCESS_PADDING", 0.1),
         )
@@ -16,6 +16,7 @@ valid input, and still applies square-pad to preserve aspect ratio.
 from PIL import Image
 
 from app.interfaces.preprocessor import I_ImagePreprocessor
+from app.infrastructure.metrics.timing import span
 
 
 class PassthroughPreprocessor(I_ImagePreprocessor):
@@ -51,9 +52,10 @@ class PassthroughPreprocessor(I_ImagePreprocessor):
         Returns:
             RGB PIL Image at self.target_size
         """
-        image = image.convert("RGB")
-        image = self._pad_to_square(image)
-        image = image.resize(self.target_size, Image.LANCZOS)
+        with span("preprocess.pad_resize"):
+            image = image.convert("RGB")
+            image = self._pad_to_square(image)
+            image = image.resize(self.target_size, Image.LANCZOS)
         return image
 
     def _pad_to_square(self, image: Image.Image) -> Image.Image:
@@ -0,0 +1,214 @@
+"""
+app/infrastructure/preprocessing/preprocessed_store.py
+--------------------------------------------------------
+Persistent store of preprocessor outputs, so background removal runs once
+per catalog image rather than once per re-embedding.
+
+Layout (one directory per preprocessor configuration):
+
+    <root>/<fingerprint hash>/
+        .lock               held by a writer while it flushes
+        meta.json           preprocessor fingerprint
+        index.json          content hash → [shard, row]
+        shard_00000.npy     uint8 (rows, height, width, 3), memory-mapped on read
+        shard_00001.npy
+        ...
+
+Entries are keyed by the image file's content hash, so renamed copies hit
+the same entry, and the directory by the preprocessor fingerprint (size,
+padding, background colour, segmentation model), so changing any of them
+starts a fresh store while changing only the embedding model reuses it.
+
+Shards are immutable once written. New entries are buffered and written
+as a new shard every `shard_size` entries and on flush(). Several
+processes may write at once (e.g. `watch` next to a `rebuild`, or rebuild
+shards): a flush holds an exclusive lock on `.lock`, re-reads index.json,
+numbers its shard after every shard on disk and writes the merged index,
+so no writer overwrites another's shard or entries. Other processes see
+the new entries on their next miss, which re-reads a changed index.json.
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.metrics.timing import span
+from app.interfaces.preprocessor import I_ImagePreprocessor
+
+
+class PreprocessedStore:
+    """
+    Args:
+        root:        Base directory; one subdirectory per preprocessor config.
+        fingerprint: preprocessor.fingerprint() of the outputs stored here.
+        shard_size:  Entries per shard file.
+    """
+
+    def __init__(self, root: str, fingerprint: str, shard_size: int = 1024):
+        self.fingerprint = fingerprint
+        self.shard_size = shard_size
+        self.path = os.path.join(root, hashlib.md5(fingerprint.encode()).hexdigest()[:16])
+
+        self._lock = threading.Lock()
+        self._shards: dict[int, np.ndarray] = {}
+        self._pending: list[np.ndarray] = []
+        self._pending_keys: dict[str, int] = {}
+        self._index: dict[str, list[int]] = {}
+        # (mtime_ns, size) of the index.json self._index was last merged from
+        self._index_stat = None
+        self._reload_index()
+
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index) + len(self._pending_keys)
+
+
+    def __contains__(self, content_hash: str) -> bool:
+        with self._lock:
+            return content_hash in self._index or content_hash in self._pending_keys
+
+
+    def get(self, content_hash: str) -> Image.Image | None:
+        with self._lock:
+            if content_hash in self._pending_keys:
+                pixels = self._pending[self._pending_keys[content_hash]]
+            else:
+                if content_hash not in self._index:
+                    # Another process may have flushed it since
+                    self._reload_index()
+                    if content_hash not in self._index:
+                        return None
+                shard, row = self._index[content_hash]
+                pixels = self._shard(shard)[row]
+
+        return Image.fromarray(np.asarray(pixels))
+
+
+    def put(self, content_hash: str, image: Image.Image):
+        pixels = np.asarray(image.convert("RGB"), dtype=np.uint8)
+
+        with self._lock:
+            if content_hash in self._index or content_hash in self._pending_keys:
+                return
+            if self._pending and pixels.shape != self._pending[0].shape:
+                raise ValueError(
+                    f"Preprocessed image shape {pixels.shape} differs from {self._pending[0].shape}"
+                )
+
+            self._pending_keys[content_hash] = len(self._pending)
+            self._pending.append(pixels)
+            full = len(self._pending) >= self.shard_size
+
+        if full:
+            self.flush()
+
+
+    def load(self, image_path: str, preprocessor: I_ImagePreprocessor) -> Image.Image:
+        """
+        Preprocessed image for `image_path`: from the store when present,
+        otherwise decoded, run through `preprocessor` and stored.
+        """
+        content_hash = CacheKeys.content_hash(image_path)
+
+        with span("preprocess.store_get"):
+            image = self.get(content_hash)
+        if image is not None:
+            return image
+
+        with span("image.decode"):
+            image = Image.open(image_path).convert("RGB")
+        with span("preprocess"):
+            image = preprocessor.preprocess(image)
+
+        self.put(content_hash, image)
+        return image
+
+
+    def flush(self):
+        """Write buffered entries as a new shard and persist the index."""
+        with self._lock:
+            if not self._pending:
+                return
+
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, ".lock"), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._flush_locked()
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+            self._pending = []
+            self._pending_keys = {}
+
+
+    def _flush_locked(self):
+        """flush() under the writer lock: merge with what other writers flushed, then append."""
+        self._write_json("meta.json", {"fingerprint": self.fingerprint})
+        self._reload_index()
+
+        on_disk = [
+            int(name[len("shard_"):-len(".npy")])
+            for name in os.listdir(self.path)
+            if name.startswith("shard_") and name.endswith(".npy")
+        ]
+        shard = 1 + max(on_disk + [s for s, _ in self._index.values()], default=-1)
+
+        shard_path = os.path.join(self.path, f"shard_{shard:05d}.npy")
+        tmp_path = shard_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.stack(self._pending))
+        os.replace(tmp_path, shard_path)
+
+        for key, row in self._pending_keys.items():
+            # Flushed by another writer meanwhile: keep theirs, it's the same image
+            self._index.setdefault(key, [shard, row])
+        # Index last, so it never points at a shard that isn't on disk
+        self._write_json("index.json", self._index)
+        self._index_stat = self._stat("index.json")
+
+
+    def _reload_index(self):
+        """Merge index.json into self._index if it changed since last read. Caller holds self._lock."""
+        stat = self._stat("index.json")
+        if stat is None or stat == self._index_stat:
+            return
+        self._index.update(self._read_json("index.json", {}))
+        self._index_stat = stat
+
+
+    def _stat(self, name: str) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(os.path.join(self.path, name))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+    def _shard(self, shard: int) -> np.ndarray:
+        if shard not in self._shards:
+            self._shards[shard] = np.load(
+                os.path.join(self.path, f"shard_{shard:05d}.npy"), mmap_mode="r"
+            )
+        return self._shards[shard]
+
+
+    def _read_json(self, name: str, default):
+        path = os.path.join(self.path, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, "r") as f:
+            return json.load(f)
+
+
+    def _write_json(self, name: str, data):
+        path = os.path.join(self.path, name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
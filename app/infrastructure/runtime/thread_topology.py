@@ -0,0 +1,153 @@
+"""
+Native thread budgets for the three pools a serving process hosts:
+
+    torch           intra-op (OpenMP) and inter-op threads, used by CLIP
+    ONNX Runtime    intra-op and inter-op threads of the rembg session
+    FAISS           its own OpenMP pool, used by search and training
+
+Left alone, each sizes itself to every core of the machine, so a process
+(or N pre-forked workers) runs several times more busy threads than there
+are cores, and latency under concurrent load becomes erratic. rembg makes
+it worse: with OMP_NUM_THREADS set it uses that value for both ONNX
+Runtime pools.
+
+plan_threads() splits the cores available to this process between
+workers, then between the requests a worker runs at once, and gives every
+library that share:
+
+    latency     a worker serves one request at a time, and each stage
+                (rembg → CLIP → FAISS) runs alone, so each library gets
+                the worker's whole share; ONNX Runtime threads spin
+                between runs to pick up the next one sooner
+    throughput  THREAD_CONCURRENCY requests run at once in a worker and
+                split its share; spinning is off so idle pools yield the
+                cores to busy ones
+
+Inter-op parallelism is 1 in both: the pipeline has no independent
+branches, and every extra pool only adds threads competing for the same
+cores. thread_topology.apply() pins the pools of the current process; the
+Container applies the process-wide plan, and serve-prefork workers apply
+their per-worker plan right after fork.
+"""
+
+import os
+import sys
+import threading
+from collections import namedtuple
+
+from app.config import settings
+
+
+PROFILES = ("latency", "throughput")
+
+ThreadBudget = namedtuple("ThreadBudget", ["torch", "torch_interop", "onnx", "onnx_inter", "faiss", "spin"])
+
+
+def available_cores() -> int:
+    """Cores this process may run on (its CPU affinity, not the machine's count)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan_threads(
+    profile: str = settings.THREAD_PROFILE,
+    cores: int | None = None,
+    workers: int = 1,
+    concurrency: int = settings.THREAD_CONCURRENCY,
+) -> ThreadBudget:
+    """
+    Thread budget of one of `workers` processes sharing `cores` cores
+    (default: settings.THREAD_CORES, or every core this process may use).
+
+    Raises ValueError for an unknown profile.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown thread profile: {profile} (expected one of {PROFILES})")
+
+    cores = cores or settings.THREAD_CORES or available_cores()
+    share = max(1, cores // max(1, workers))
+
+    if profile == "latency":
+        return ThreadBudget(torch=share, torch_interop=1, onnx=share, onnx_inter=1, faiss=share, spin=True)
+
+    per_request = max(1, share // max(1, concurrency))
+    return ThreadBudget(
+        torch=per_request, torch_interop=1, onnx=per_request, onnx_inter=1, faiss=per_request, spin=False
+    )
+
+
+class ThreadTopology:
+    """
+    Holds the budget applied to this process.
+
+    ONNX Runtime reads its thread counts when a session is created, so a
+    session created before apply() keeps the pools it started with; rembg
+    sessions are created lazily, on first use, for that reason.
+    """
+
+    def __init__(self):
+        self.budget: ThreadBudget | None = None
+        self._lock = threading.Lock()
+
+
+    def apply(self, budget: ThreadBudget) -> ThreadBudget:
+        """Pin torch, FAISS and the BLAS/OpenMP environment to `budget`."""
+        with self._lock:
+            # Libraries that create their pools later read these
+            for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+                os.environ[var] = str(budget.torch)
+
+            if "torch" in sys.modules:
+                torch = sys.modules["torch"]
+                torch.set_num_threads(budget.torch)
+                try:
+                    torch.set_num_interop_threads(budget.torch_interop)
+                except RuntimeError:
+                    # Only settable once per process, before any inter-op work
+                    # (e.g. already set in the pre-fork master)
+                    pass
+
+            if "faiss" in sys.modules:
+                sys.modules["faiss"].omp_set_num_threads(budget.faiss)
+
+            self.budget = budget
+            return budget
+
+
+    def onnx_session_options(self):
+        """
+        ONNX Runtime SessionOptions for the applied budget, or None when no
+        budget was applied (or onnxruntime isn't installed).
+        """
+        budget = self.budget
+        if budget is None:
+            return None
+
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            return None
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = budget.onnx
+        options.inter_op_num_threads = budget.onnx_inter
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.add_session_config_entry("session.intra_op.allow_spinning", "1" if budget.spin else "0")
+        return options
+
+
+    def describe(self) -> str:
+        budget = self.budget
+        if budget is None:
+            return "library defaults"
+        return (
+            f"torch {budget.torch} (+{budget.torch_interop} inter-op), "
+            f"onnx {budget.onnx} (+{budget.onnx_inter} inter-op), faiss {budget.faiss}"
+            f"{'' if budget.spin else ', no spinning'}"
+        )
+
+
+# Process-wide: the pools it pins are process-wide too
+thread_topology = ThreadTopology()
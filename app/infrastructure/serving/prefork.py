@@ -0,0 +1,191 @@
+"""
+Pre-fork TCP server.
+
+The master process loads everything expensive (CLIP weights, rembg
+session, FAISS index, catalog) once, binds the listening socket, then
+forks worker processes. Workers inherit those pages copy-on-write, so N
+workers cost roughly one copy of the models plus their own working set.
+The master only supervises: it restarts any worker that exits and
+terminates all of them on SIGTERM/SIGINT.
+
+Protocol: one JSON object per line in, one JSON object per line out.
+"""
+
+import os
+import gc
+import json
+import time
+import signal
+import socket
+import struct
+import traceback
+
+from app.infrastructure.runtime.thread_topology import ThreadBudget, plan_threads, thread_topology
+
+
+class PreforkServer:
+    """
+    Args:
+        handler:            request dict → response dict (JSON-serialisable).
+                            Exceptions are returned as {"error": "..."}.
+        host, port:         Address to listen on (port 0 picks a free port).
+        workers:            Number of worker processes.
+        threads_per_worker: Native threads per worker for torch, ONNX Runtime and
+                            FAISS; 0 splits the cores between the workers as
+                            the thread profile says (see thread_budget()).
+        on_worker_start:    Optional callback(slot) run in each fresh worker.
+    """
+
+    # A worker dying sooner than this after spawn is treated as crash-looping
+    MIN_WORKER_LIFETIME = 1.0
+
+    def __init__(
+        self,
+        handler,
+        host: str = "127.0.0.1",
+        port: int = 8500,
+        workers: int = os.cpu_count() or 1,
+        threads_per_worker: int = 0,
+        on_worker_start=None,
+    ):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.on_worker_start = on_worker_start
+
+        self.sock = None
+        self.workers: dict[int, tuple[int, float]] = {}  # pid → (slot, started_at)
+        self.restarts = 0
+        self._stopping = False
+
+    def thread_budget(self) -> ThreadBudget:
+        # An explicit threads_per_worker is the share of cores each worker plans with
+        cores = self.threads_per_worker * self.num_workers if self.threads_per_worker else None
+        return plan_threads(cores=cores, workers=self.num_workers)
+
+    # ------------------------------------------
+    # Master
+    # ------------------------------------------
+    def bind(self) -> tuple[str, int]:
+        """Bind the listening socket; returns the bound (host, port)."""
+        self.sock = socket.create_server((self.host, self.port), backlog=128)
+        self.host, self.port = self.sock.getsockname()[:2]
+        return self.host, self.port
+
+    def backlog(self) -> int:
+        """
+        Connections waiting to be accepted by any worker. Read from the
+        listening socket's TCP_INFO (Linux), where tcpi_unacked holds the
+        accept queue length; 0 where that isn't available.
+        """
+        try:
+            info = self.sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 104)
+        except (AttributeError, OSError):
+            return 0
+        return struct.unpack_from("I", info, 24)[0]
+
+    def serve_forever(self):
+        if self.sock is None:
+            self.bind()
+
+        # Move everything allocated so far out of the GC's reach, so
+        # collections in workers don't write to (and un-share) those pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            slot, started_at = self.workers.pop(pid, (None, 0.0))
+            if slot is None or self._stopping:
+                continue
+
+            print(f"[prefork] worker {slot} (pid {pid}) exited with status {status}; restarting")
+            if time.monotonic() - started_at < self.MIN_WORKER_LIFETIME:
+                time.sleep(self.MIN_WORKER_LIFETIME)
+            self.restarts += 1
+            self._spawn(slot)
+
+        self.sock.close()
+
+    def stop(self):
+        self._stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self, slot: int):
+        if self._stopping:
+            return
+
+        # Hold stop signals until the child is registered, otherwise stop()
+        # could run in between and never learn about (or kill) this worker
+        previous_mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM, signal.SIGINT})
+        try:
+            pid = os.fork()
+            if pid == 0:
+                code = 0
+                try:
+                    self._worker_main(slot, previous_mask)
+                except BaseException:
+                    traceback.print_exc()
+                    code = 1
+                finally:
+                    os._exit(code)
+
+            self.workers[pid] = (slot, time.monotonic())
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, previous_mask)
+
+    # ------------------------------------------
+    # Worker
+    # ------------------------------------------
+    def _worker_main(self, slot: int, signal_mask):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # Ctrl-C reaches the whole process group; let the master coordinate
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.pthread_sigmask(signal.SIG_SETMASK, signal_mask)
+
+        # Before any inference, so no pool starts at the master's size
+        thread_topology.apply(self.thread_budget())
+        if self.on_worker_start:
+            self.on_worker_start(slot)
+
+        while True:
+            conn, _ = self.sock.accept()
+            with conn:
+                self._handle_connection(conn)
+
+    def _handle_connection(self, conn: socket.socket):
+        with conn.makefile("rb") as rfile, conn.makefile("wb") as wfile:
+            for line in rfile:
+                if not line.strip():
+                    continue
+                try:
+                    response = self.handler(json.loads(line))
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+
+                wfile.write(json.dumps(response).encode() + b"\n")
+                wfile.flush()
+
+
+def send_request(host: str, port: int, request: dict, timeout: float = 30.0) -> dict:
+    """Minimal client: send one request, return the decoded response."""
+    with socket.create_connection((host, port), timeout=timeout) as conn:
+        conn.sendall(json.dumps(request).encode() + b"\n")
+        with conn.makefile("rb") as rfile:
+            return json.loads(rfile.readline())
@@ -0,0 +1,175 @@
+"""
+Scatter-gather search over index shards.
+
+Each shard process (`serve-shard`) serves one partition of the index over
+the pre-fork JSON-lines protocol. The coordinator sends the query
+embedding to every shard at once, waits until all have answered or the
+timeout has passed, and merges the per-shard top-k by distance. Product
+ids are unique across shards (see fragments.py), so the merge is a plain
+sort by distance, and shards resolve their own hits to filenames.
+
+Shards are searched in parallel, so a query takes about as long as the
+slowest shard that answers in time rather than the sum of all of them.
+Every query thread has a pool of its own, one thread per shard, so
+concurrent queries never wait for each other's requests. A
+shard that is down, errors or misses the deadline is reported in
+`missing` and the query returns what the other shards found.
+
+Vectors travel as base64 float32 bytes: exact, and a fraction of the
+size of a JSON number list.
+"""
+
+import os
+import json
+import time
+import base64
+import socket
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from app.config import settings
+from app.infrastructure.metrics.timing import span
+
+
+# hits: [(id, filename, distance, duplicate members)] best first
+# missing: {"host:port": reason} of shards left out
+GatherResult = namedtuple("GatherResult", ["hits", "missing"])
+
+
+def encode_vector(vector) -> str:
+    return base64.b64encode(np.ascontiguousarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<f4").astype("float32")
+
+
+def parse_addresses(spec: str) -> list[tuple[str, int]]:
+    """"host:port,host:port" → [(host, port), ...]."""
+    addresses = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        host, _, port = part.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Invalid shard address {part!r} (expected host:port)")
+        addresses.append((host, int(port)))
+    return addresses
+
+
+class ScatterGather:
+    """
+    Args:
+        addresses: (host, port) of every shard server.
+        timeout:   Seconds to wait for the shards, per query.
+    """
+
+    def __init__(self, addresses: list[tuple[str, int]], timeout: float = settings.SHARD_TIMEOUT_MS / 1000):
+        if not addresses:
+            raise ValueError("ScatterGather needs at least one shard address")
+
+        self.addresses = list(addresses)
+        self.timeout = timeout
+        # Each query thread's pool, plus every (pid, pool) created for close()
+        self._local = threading.local()
+        self._pools: list[tuple[int, ThreadPoolExecutor]] = []
+        self._pools_lock = threading.Lock()
+
+
+    def search(self, vector, top_k: int, rerank_k: int | None = None) -> GatherResult:
+        """The `top_k` nearest products over all shards that answered within the timeout."""
+        deadline = time.monotonic() + self.timeout
+        request = {"command": "search", "vector": encode_vector(vector), "top_k": top_k}
+        if rerank_k is not None:
+            request["rerank_k"] = rerank_k
+
+        with span("shards.scatter_gather"):
+            pool = self._executor()
+            futures = {pool.submit(_ask, address, request, deadline): address for address in self.addresses}
+            wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+
+        hits, missing = [], {}
+        for future, address in futures.items():
+            name = f"{address[0]}:{address[1]}"
+            if not future.done():
+                future.cancel()
+                missing[name] = "timed out"
+            elif future.exception() is not None:
+                error = future.exception()
+                missing[name] = "timed out" if isinstance(error, TimeoutError) else f"{type(error).__name__}: {error}"
+            else:
+                hits.extend(
+                    (hit["id"], hit["filename"], hit["distance"], tuple(hit["duplicates"]))
+                    for hit in future.result()["hits"]
+                )
+
+        with span("shards.merge"):
+            best = sorted(hits, key=lambda hit: hit[2])[:top_k]
+        return GatherResult(best, missing)
+
+
+    def ping(self) -> dict[str, dict | None]:
+        """"host:port" → each shard's ping response, None for shards not answering."""
+        deadline = time.monotonic() + self.timeout
+        pool = self._executor()
+        futures = {
+            f"{host}:{port}": pool.submit(_ask, (host, port), {"command": "ping"}, deadline)
+            for host, port in self.addresses
+        }
+        wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
+        return {
+            name: future.result() if future.done() and future.exception() is None else None
+            for name, future in futures.items()
+        }
+
+
+    def close(self):
+        with self._pools_lock:
+            pools, self._pools = self._pools, []
+        for pid, pool in pools:
+            if pid == os.getpid():
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._local = threading.local()
+
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # The calling thread's pool, so queued requests of another query never eat into this deadline.
+        # A pool created before a fork has no threads in the child (serve-prefork workers).
+        pool, pid = getattr(self._local, "pool", None), getattr(self._local, "pid", None)
+        if pool is None or pid != os.getpid():
+            pool = ThreadPoolExecutor(max_workers=len(self.addresses), thread_name_prefix="scatter")
+            self._local.pool, self._local.pid = pool, os.getpid()
+            with self._pools_lock:
+                self._pools.append((os.getpid(), pool))
+        return pool
+
+
+def _ask(address: tuple[str, int], request: dict, deadline: float) -> dict:
+    """Send `request` to one shard; every socket operation is bounded by `deadline`."""
+    def remaining() -> float:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError("deadline passed")
+        return left
+
+    with socket.create_connection(address, timeout=remaining()) as conn:
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn.settimeout(remaining())
+        conn.sendall(json.dumps(request).encode() + b"\n")
+
+        buffer = b""
+        while not buffer.endswith(b"\n"):
+            conn.settimeout(remaining())
+            chunk = conn.recv(64 * 1024)
+            if not chunk:
+                raise ConnectionError("shard closed the connection")
+            buffer += chunk
+
+    response = json.loads(buffer)
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response
@@ -0,0 +1,47 @@
+import numpy as np
+
+
+class DuplicateIndex:
+    """
+    Working index of cluster representatives used while rebuilding.
+
+    Each incoming vector is compared against the representatives added so
+    far. If one lies within the cosine `threshold` the vector is a
+    near-duplicate of it; otherwise the vector becomes a new
+    representative. Vectors are expected to be L2-normalised, so inner
+    product equals cosine similarity.
+
+    Representatives are kept in a NumPy matrix that grows by doubling, so
+    a rebuild never loads faiss (VECTOR_STORE=numpy).
+    """
+
+    def __init__(self, dimension: int, threshold: float):
+        self.threshold = threshold
+        self.vectors = np.empty((1024, dimension), dtype="float32")
+        self.representative_ids = []
+
+    def find(self, vector: np.ndarray):
+        """
+        Return the id of the most similar representative within the
+        threshold, or None if the vector starts a new cluster.
+        """
+        count = len(self.representative_ids)
+        if count == 0:
+            return None
+
+        similarities = self.vectors[:count] @ np.asarray(vector, dtype="float32")
+        best = int(np.argmax(similarities))
+        if similarities[best] <= self.threshold:
+            return None
+
+        return self.representative_ids[best]
+
+    def add(self, id, vector: np.ndarray):
+        count = len(self.representative_ids)
+        if count == len(self.vectors):
+            grown = np.empty((2 * count, self.vectors.shape[1]), dtype="float32")
+            grown[:count] = self.vectors
+            self.vectors = grown
+
+        self.vectors[count] = vector
+        self.representative_ids.append(id)
@@ -0,0 +1,32 @@
+from app.config import settings
+from app.interfaces.vectore_store import I_VectorStore
+
+
+VECTOR_STORES = ("faiss", "numpy")
+
+
+def make_vector_store(config=settings) -> I_VectorStore:
+    """
+    Instantiate the vector store backend named by config.VECTOR_STORE.
+
+    Reads:
+        config.VECTOR_STORE       (str) → "faiss" (FaissVectorStore) or
+                                          "numpy" (NumpyVectorStore)
+        config.NUMPY_STORE_DTYPE  (str) → "float32" or "float16" (numpy only)
+
+    Raises:
+        ValueError: for an unknown backend
+    """
+    backend = getattr(config, "VECTOR_STORE", "faiss")
+    if backend not in VECTOR_STORES:
+        raise ValueError(f"Unknown VECTOR_STORE: {backend} (expected one of {VECTOR_STORES})")
+
+    # Import here so the numpy backend never loads faiss
+    if backend == "numpy":
+        from app.infrastructure.vector_store.in_memory_store import NumpyVectorStore
+
+        return NumpyVectorStore(dtype=getattr(config, "NUMPY_STORE_DTYPE", "float32"))
+
+    from app.infrastructure.vector_store.faiss_store import FaissVectorStore
+
+    return FaissVectorStore()
@@ -3,34 +3,251 @@ import faiss
 import numpy as np
 
 from app.interfaces.vectore_store import I_VectorStore
+from app.infrastructure.metrics.memory import estimate_bytes, faiss_index_bytes
+from app.infrastructure.metrics.timing import span
+from app.infrastructure.vector_store.snapshots import resolve_index_path
 from app.config import settings
 
 
+INDEX_TYPES = ("flat", "sq8", "pq")
+
+# PQ trains 2^8 centroids per sub-space, so it needs at least this many vectors
+PQ_MIN_TRAINING_VECTORS = 256
+
+
 class FaissVectorStore(I_VectorStore):
-    def __init__(self):
-        self.index_path = settings.FAISS_INDEX_PATH
+    """
+    FAISS-backed vector store.
+
+    index_type:
+        flat → exact IndexFlatL2, full float32 vectors held in RAM
+        sq8  → 8-bit scalar quantised codes in RAM (1 byte per dim)
+        pq   → product quantised codes in RAM (pq_m bytes per vector)
+
+    A compressed index is trained on the first add() batch. PQ can't be
+    trained on fewer than PQ_MIN_TRAINING_VECTORS vectors, so a smaller
+    first batch (a small catalog, a fold onto an empty index) builds an
+    sq8 index instead; the next rebuild with enough products gets PQ.
+
+    In the compressed modes the full-precision vectors are written next to
+    the index (`<index_path>_vectors.npy`) and memory-mapped on load. Search
+    pulls `rerank_k` candidates from the compressed index and re-ranks them
+    with exact L2 distances read from the mapped file, so only the pages of
+    the candidates are ever touched. Vectors added after a load go to an
+    in-RAM tail instead of the mapped file, and removals only drop their
+    rows from a position → row map, so the mapped file is never copied
+    into RAM; `save()` streams both parts to the new file.
+
+    `save()` writes to `index_path`; `load()` reads the current published
+    snapshot of it (see snapshots.py), or `index_path` itself in the
+    legacy flat layout.
+    """
+
+    # Full-precision rows copied per step when save() writes the vectors file
+    SAVE_BLOCK_ROWS = 65536
+
+    def __init__(
+        self,
+        index_type: str = settings.FAISS_INDEX_TYPE,
+        pq_m: int = settings.FAISS_PQ_M,
+        rerank_k: int = settings.FAISS_RERANK_K,
+        index_path: str = settings.FAISS_INDEX_PATH,
+    ):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type} (expected one of {INDEX_TYPES})")
+
+        self.index_path = index_path
         self.dimension = settings.EMBEDDING_DIM
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index_type = index_type
+        self.pq_m = pq_m
+        self.rerank_k = rerank_k
+        self.index = self._new_index()
         self.id_map = []
+        self.vectors = np.empty((0, self.dimension), dtype="float32")
+        self._tail = np.empty((0, self.dimension), dtype="float32")
+        self._tail_size = 0
+        # Row of each index position in vectors + tail; None while they line up
+        self._rows = None
+
+    @property
+    def compressed(self) -> bool:
+        return self.index_type != "flat"
+
+    @property
+    def vectors_path(self) -> str:
+        return self.index_path + "_vectors.npy"
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Resident bytes per part. Memory-mapped full-precision vectors count
+        as 0 — they are paged in from disk only for re-ranked candidates.
+        """
+        return {
+            "faiss.index": faiss_index_bytes(self.index),
+            "faiss.id_map": estimate_bytes(self.id_map),
+            "faiss.vectors": estimate_bytes(self.vectors) + estimate_bytes(self._tail)
+            + (estimate_bytes(self._rows) if self._rows is not None else 0),
+        }
+
+    def clone_empty(self, index_path: str) -> "FaissVectorStore":
+        """An empty store with this one's configuration, saving to `index_path`."""
+        return FaissVectorStore(
+            index_type=self.index_type, pq_m=self.pq_m, rerank_k=self.rerank_k, index_path=index_path
+        )
+
+    def _new_index(self):
+        if self.index_type == "sq8":
+            return faiss.IndexScalarQuantizer(
+                self.dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2
+            )
+        if self.index_type == "pq":
+            return faiss.IndexPQ(self.dimension, self.pq_m, 8, faiss.METRIC_L2)
+        return faiss.IndexFlatL2(self.dimension)
+
+    @staticmethod
+    def _index_type_of(index) -> str:
+        if isinstance(index, faiss.IndexScalarQuantizer):
+            return "sq8"
+        if isinstance(index, faiss.IndexPQ):
+            return "pq"
+        return "flat"
 
     def add(self, ids, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+
+        if isinstance(self.id_map, np.ndarray):
+            self.id_map = self.id_map.tolist()
+
+        if self.compressed:
+            if not self.index.is_trained:
+                if self.index_type == "pq" and len(vectors) < PQ_MIN_TRAINING_VECTORS:
+                    self.index_type = "sq8"
+                    self.index = self._new_index()
+                self.index.train(vectors)
+            self._append_rows(vectors)
+
         self.index.add(vectors)
         self.id_map.extend(ids)
 
-    def search(self, vector, top_k):
-        vector = np.expand_dims(vector, axis=0)
-        distances, indices = self.index.search(vector, top_k)
-        result_ids = [self.id_map[i] for i in indices[0]]
-        scores = distances[0].tolist()
+    def remove(self, ids) -> int:
+        """Remove every vector stored under one of `ids`. Returns how many were removed."""
+        id_map = np.asarray(self.id_map)
+        positions = np.flatnonzero(np.isin(id_map, np.asarray(list(ids), dtype="int64")))
+        if len(positions) == 0:
+            return 0
+
+        # Later positions shift down in the index and id map; the stored rows stay put
+        self.index.remove_ids(faiss.IDSelectorBatch(positions.astype("int64")))
+        self.id_map = np.delete(id_map, positions).tolist()
+        if self.compressed:
+            rows = self._rows if self._rows is not None else np.arange(len(id_map), dtype="int64")
+            self._rows = np.delete(rows, positions)
+
+        return len(positions)
+
+    def search(self, vector, top_k, rerank_k=None):
+        vector = np.expand_dims(vector, axis=0).astype("float32")
+
+        if not self.compressed:
+            with span("faiss.search"):
+                distances, indices = self.index.search(vector, top_k)
+            # FAISS pads past ntotal with -1 labels, which must not index the id map
+            found = indices[0] >= 0
+            result_ids = self._lookup_ids(indices[0][found])
+            scores = distances[0][found].tolist()
+            return result_ids, scores
+
+        # Stage 1: approximate candidates from the compressed codes
+        with span("faiss.search"):
+            _, candidates = self.index.search(vector, max(top_k, rerank_k or self.rerank_k))
+        candidates = candidates[0]
+        candidates = candidates[candidates >= 0]
+
+        # Stage 2: exact L2 on the full-precision vectors (sorted reads keep mmap access sequential)
+        with span("faiss.rerank"):
+            candidates = np.sort(candidates)
+            exact = self._full_vectors(candidates) - vector
+            distances = np.einsum("ij,ij->i", exact, exact)
+
+        order = np.argsort(distances, kind="stable")[:top_k]
+        result_ids = self._lookup_ids(candidates[order])
+        scores = distances[order].tolist()
         return result_ids, scores
 
+    def _append_rows(self, vectors: np.ndarray):
+        """Append full-precision rows to the in-RAM tail, doubling its capacity."""
+        end = self._tail_size + len(vectors)
+        if end > len(self._tail):
+            grown = np.empty((max(end, 2 * len(self._tail), 1024), self.dimension), dtype="float32")
+            grown[:self._tail_size] = self._tail[:self._tail_size]
+            self._tail = grown
+
+        self._tail[self._tail_size:end] = vectors
+        if self._rows is not None:
+            start = len(self.vectors) + self._tail_size
+            self._rows = np.concatenate([self._rows, np.arange(start, start + len(vectors), dtype="int64")])
+        self._tail_size = end
+
+    def _full_vectors(self, positions: np.ndarray) -> np.ndarray:
+        """Full-precision vectors at index `positions`, from the mapped file or the tail."""
+        rows = self._rows[positions] if self._rows is not None else np.asarray(positions, dtype="int64")
+        mapped = len(self.vectors)
+        in_file = rows < mapped
+
+        out = np.empty((len(rows), self.dimension), dtype="float32")
+        out[in_file] = self.vectors[rows[in_file]]
+        out[~in_file] = self._tail[rows[~in_file] - mapped]
+        return out
+
+    def _lookup_ids(self, positions) -> list:
+        if isinstance(self.id_map, np.ndarray):
+            return self.id_map[positions].tolist()
+        return [self.id_map[i] for i in positions]
+
     def save(self):
         # Ensure directory exists
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
         faiss.write_index(self.index, self.index_path)
         np.save(self.index_path + "_ids.npy", np.array(self.id_map))
 
-    def load(self):
-        if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
-            self.id_map = np.load(self.index_path + "_ids.npy").tolist()
+        if self.compressed:
+            # self.vectors may be a memmap of vectors_path itself, so write aside and swap in;
+            # rows are copied a block at a time so the mapped file never lands in RAM whole
+            tmp_path = self.vectors_path + ".tmp.npy"
+            out = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype="float32", shape=(self.index.ntotal, self.dimension)
+            )
+            for start in range(0, len(out), self.SAVE_BLOCK_ROWS):
+                end = min(start + self.SAVE_BLOCK_ROWS, len(out))
+                out[start:end] = self._full_vectors(np.arange(start, end))
+            out.flush()
+            del out
+            os.replace(tmp_path, self.vectors_path)
+
+    def load(self, mmap: bool = False, path: str | None = None):
+        """
+        Load the index from disk: from `path` if given, otherwise from the
+        current snapshot of `index_path`.
+
+        With `mmap`, the index codes and id map are memory-mapped read-only
+        instead of copied into the heap: pages come from the OS page cache
+        and are shared by every process serving the same files. A
+        memory-mapped store must not be added to.
+        """
+        path = path or resolve_index_path(self.index_path)
+
+        if os.path.exists(path):
+            with span("faiss.load"):
+                if mmap:
+                    self.index = faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC)
+                    self.id_map = np.load(path + "_ids.npy", mmap_mode="r")
+                else:
+                    self.index = faiss.read_index(path)
+                    self.id_map = np.load(path + "_ids.npy").tolist()
+                self.index_type = self._index_type_of(self.index)
+
+                if self.compressed:
+                    self.vectors = np.load(path + "_vectors.npy", mmap_mode="r")
+                    self._tail = np.empty((0, self.dimension), dtype="float32")
+                    self._tail_size = 0
+                    self._rows = None
@@ -0,0 +1,154 @@
+"""
+Per-shard partial indexes written by `rebuild --shards N --shard-id i`
+and combined by `merge-index`.
+
+Layout, under <index directory>/fragments:
+
+    shard-00000-of-00004/
+        meta.json               shard, shards, listing hash, embedding fingerprint
+        vectors.npy             float32 (n, dim) representative vectors
+        ids.npy                 product id of each row
+        id_to_filename.json
+        duplicates.json         within-shard duplicate clusters
+    shard-00001-of-00004/
+    ...
+
+Products are assigned to shards by the hash of their content, so every
+shard process agrees on the partition without coordinating, and product
+ids are positions in the sorted listing of the products directory, so
+they are unique across shards. Each fragment is written to a temporary
+directory and renamed into place, so a crashed shard never leaves a
+half-written fragment behind.
+
+A shard built with `--publish-shard` is also published as an index of
+its own, for `serve-shard` to serve (see shard_index_path):
+
+    <index directory>/shards/shard-00001-of-00004/CURRENT, snapshots/...
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+
+def shard_of(content_hash: str, shards: int) -> int:
+    """Shard a product with this content hash belongs to."""
+    return int(content_hash[:16], 16) % shards
+
+
+def listing_hash(filenames: list[str]) -> str:
+    """Identifies a products directory listing; fragments from different listings don't merge."""
+    return hashlib.md5("\n".join(filenames).encode()).hexdigest()
+
+
+def shard_index_path(index_path: str, shard_id: int, shards: int) -> str:
+    """Logical index path of one shard's partition of the index at `index_path`."""
+    return os.path.join(
+        os.path.dirname(index_path), "shards", f"shard-{shard_id:05d}-of-{shards:05d}", os.path.basename(index_path)
+    )
+
+
+class IndexFragments:
+    """
+    Args:
+        root: Fragments directory.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+
+    def path(self, shard_id: int, shards: int) -> str:
+        return os.path.join(self.root, f"shard-{shard_id:05d}-of-{shards:05d}")
+
+
+    def write(
+        self,
+        shard_id: int,
+        shards: int,
+        ids: list[int],
+        vectors: np.ndarray,
+        id_to_filename: dict,
+        duplicates: dict,
+        meta: dict,
+    ) -> str:
+        """Atomically (re)place the fragment of `shard_id`. Returns its directory."""
+        final_path = self.path(shard_id, shards)
+        tmp_path = f"{final_path}.tmp-{os.getpid()}"
+        os.makedirs(tmp_path)
+
+        try:
+            np.save(os.path.join(tmp_path, "vectors.npy"), np.asarray(vectors, dtype="float32"))
+            np.save(os.path.join(tmp_path, "ids.npy"), np.asarray(ids, dtype="int64"))
+            self._write_json(tmp_path, "id_to_filename.json", id_to_filename)
+            self._write_json(tmp_path, "duplicates.json", duplicates)
+            self._write_json(tmp_path, "meta.json", {**meta, "shard": shard_id, "shards": shards, "count": len(ids)})
+
+            shutil.rmtree(final_path, ignore_errors=True)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        return final_path
+
+
+    def read_all(self) -> list[dict]:
+        """
+        All fragments of one sharded build, ordered by shard id. Each is a
+        dict with meta, ids, vectors (memory-mapped), id_to_filename and
+        duplicates.
+
+        Raises ValueError if shards are missing or the fragments come from
+        different builds (shard count, products listing or embedding model).
+        """
+        names = sorted(
+            name for name in (os.listdir(self.root) if os.path.isdir(self.root) else [])
+            if name.startswith("shard-") and ".tmp-" not in name
+        )
+        if not names:
+            raise ValueError(f"No index fragments in {self.root}")
+
+        fragments = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            fragments.append({
+                "meta": self._read_json(path, "meta.json"),
+                "ids": np.load(os.path.join(path, "ids.npy")),
+                "vectors": np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+                "id_to_filename": self._read_json(path, "id_to_filename.json"),
+                "duplicates": self._read_json(path, "duplicates.json"),
+            })
+
+        first = fragments[0]["meta"]
+        for fragment in fragments:
+            meta = fragment["meta"]
+            for field in ("shards", "listing", "fingerprint"):
+                if meta[field] != first[field]:
+                    raise ValueError(
+                        f"Fragments from different builds ({field}: {meta[field]!r} vs {first[field]!r}); "
+                        f"remove stale ones from {self.root}"
+                    )
+
+        missing = sorted(set(range(first["shards"])) - {f["meta"]["shard"] for f in fragments})
+        if missing:
+            raise ValueError(f"Missing fragments for shards {missing} of {first['shards']}")
+
+        return fragments
+
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+    @staticmethod
+    def _read_json(path: str, name: str):
+        with open(os.path.join(path, name), "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_json(path: str, name: str, data):
+        with open(os.path.join(path, name), "w") as f:
+            json.dump(data, f, indent=2)
@@ -0,0 +1,245 @@
+import os
+import numpy as np
+
+from app.interfaces.vectore_store import I_VectorStore
+from app.infrastructure.metrics.memory import estimate_bytes
+from app.infrastructure.metrics.timing import span
+from app.infrastructure.vector_store.snapshots import resolve_index_path
+from app.config import settings
+
+
+DTYPES = ("float32", "float16")
+
+
+class NumpyVectorStore(I_VectorStore):
+    """
+    Brute-force vector store on a contiguous NumPy matrix, without FAISS.
+
+    For catalogs up to ~100k vectors a flat scan is one BLAS matrix
+    product per block, over every query of a batch at once. That is on
+    par with FAISS flat search, without loading faiss into the process.
+    Distances are squared L2, like FaissVectorStore's flat index, and
+    results match it: candidates are ranked with the expansion
+    ‖x‖² − 2x·q + ‖q‖² (row norms are kept alongside the matrix), then the
+    best few are re-scored as exact squared differences.
+
+    dtype:
+        float32 → exact
+        float16 → half the memory; scanned in blocks converted to float32,
+                  so only the storage is rounded. The conversion makes the
+                  scan several times slower than float32: pick it when
+                  memory, not latency, is the constraint
+
+    Rows live in buffers that grow by doubling, so adding one product at a
+    time stays amortised O(1). `remove()` only marks tombstones; rows are
+    dropped by `compact()`, automatically once half the rows are dead, and
+    before every `save()`.
+
+    Files: `index_path` holds the matrix (.npy format), plus
+    `<index_path>_ids.npy` and `<index_path>_norms.npy`. `load(mmap=True)`
+    memory-maps all three read-only.
+    """
+
+    # Rows scanned per matrix product; a float16 block's float32 copy stays cache-sized
+    BLOCK_ROWS = 8192
+    # Candidates re-scored exactly beyond top_k, to absorb the expansion's rounding
+    EXACT_SLACK = 16
+
+    def __init__(self, dtype: str = settings.NUMPY_STORE_DTYPE, index_path: str = settings.FAISS_INDEX_PATH):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown NumPy store dtype: {dtype} (expected one of {DTYPES})")
+
+        self.index_path = index_path
+        self.dimension = settings.EMBEDDING_DIM
+        self.dtype = dtype
+        self.index_type = f"numpy_{dtype}"
+
+        self.size = 0
+        self.removed = 0
+        self._vectors = np.empty((0, self.dimension), dtype=dtype)
+        self._norms = np.empty(0, dtype="float32")
+        self._ids = np.empty(0, dtype="int64")
+        self._alive = np.empty(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return self.size - self.removed
+
+    @property
+    def ids_path(self) -> str:
+        return self.index_path + "_ids.npy"
+
+    @property
+    def norms_path(self) -> str:
+        return self.index_path + "_norms.npy"
+
+    def memory_usage(self) -> dict[str, int]:
+        """Resident bytes per part; memory-mapped buffers count as 0."""
+        return {
+            "numpy.vectors": estimate_bytes(self._vectors),
+            "numpy.norms": estimate_bytes(self._norms),
+            "numpy.ids": estimate_bytes(self._ids) + estimate_bytes(self._alive),
+        }
+
+    def clone_empty(self, index_path: str) -> "NumpyVectorStore":
+        """An empty store with this one's configuration, saving to `index_path`."""
+        return NumpyVectorStore(dtype=self.dtype, index_path=index_path)
+
+    def add(self, ids, vectors):
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        ids = np.asarray(ids, dtype="int64")
+
+        start, end = self.size, self.size + len(ids)
+        self._reserve(end)
+
+        self._vectors[start:end] = vectors
+        # Norms of the stored (possibly rounded) values, so both sides of the expansion agree
+        self._norms[start:end] = _squared_norms(self._vectors[start:end])
+        self._ids[start:end] = ids
+        self._alive[start:end] = True
+        self.size = end
+
+    def remove(self, ids) -> int:
+        """Tombstone every row holding one of `ids`. Returns how many were removed."""
+        hit = np.isin(self._ids[:self.size], np.asarray(ids, dtype="int64")) & self._alive[:self.size]
+        self._alive[:self.size][hit] = False
+        removed = int(hit.sum())
+        self.removed += removed
+
+        if self.removed * 2 > self.size:
+            self.compact()
+        return removed
+
+    def compact(self):
+        """Drop tombstoned rows, keeping the others in order."""
+        if not self.removed:
+            return
+
+        alive = self._alive[:self.size]
+        self._vectors = np.ascontiguousarray(self._vectors[:self.size][alive])
+        self._norms = self._norms[:self.size][alive]
+        self._ids = self._ids[:self.size][alive]
+        self.size = len(self._ids)
+        self._alive = np.ones(self.size, dtype=bool)
+        self.removed = 0
+
+    def search(self, vector, top_k, rerank_k=None):
+        """
+        (ids, distances) of the `top_k` nearest rows to a (dim,) query. An
+        (n, dim) query matrix is searched in one pass, returning a list of
+        ids and a list of distances per query row.
+        """
+        queries = np.asarray(vector, dtype="float32")
+        single = queries.ndim == 1
+        queries = queries.reshape(-1, self.dimension)
+
+        with span("numpy.search"):
+            k = min(top_k, len(self))
+            if k == 0:
+                return ([], []) if single else ([[] for _ in queries], [[] for _ in queries])
+
+            distances = self._scan(queries)
+            shortlist = min(k + self.EXACT_SLACK, self.size)
+            candidates = np.argpartition(distances, shortlist - 1, axis=1)[:, :shortlist]
+
+            # Exact squared differences, ties broken by row like FAISS
+            candidates = np.sort(candidates, axis=1)
+            exact = self._vectors[candidates].astype("float32") - queries[:, None, :]
+            exact = np.einsum("qij,qij->qi", exact, exact)
+            if self.removed:
+                exact[~self._alive[candidates]] = np.inf
+            order = np.argsort(exact, axis=1, kind="stable")[:, :k]
+
+            rows = candidates[np.arange(len(queries))[:, None], order]
+            exact = np.take_along_axis(exact, order, axis=1)
+
+        ids, scores = [], []
+        for row, row_exact in zip(rows, exact):
+            found = np.isfinite(row_exact)
+            ids.append(self._ids[row[found]].tolist())
+            scores.append(row_exact[found].tolist())
+        return (ids[0], scores[0]) if single else (ids, scores)
+
+    def _scan(self, queries: np.ndarray) -> np.ndarray:
+        """(n, rows) squared L2 distances (expansion) from each query to every row; +inf for removed rows."""
+        distances = np.empty((len(queries), self.size), dtype="float32")
+        converted = None if self._vectors.dtype == np.float32 else np.empty((self.BLOCK_ROWS, self.dimension), "float32")
+
+        for start in range(0, self.size, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, self.size)
+            block = self._vectors[start:end]
+            if converted is not None:
+                converted[:end - start] = block
+                block = converted[:end - start]
+            distances[:, start:end] = self._norms[start:end] - 2 * (queries @ block.T)
+
+        distances += _squared_norms(queries)[:, None]
+        if self.removed:
+            distances[:, ~self._alive[:self.size]] = np.inf
+        return distances
+
+    def _reserve(self, rows: int):
+        """Make the buffers writable and able to hold `rows` rows, doubling capacity."""
+        capacity = len(self._ids)
+        if rows <= capacity and self._vectors.flags.writeable and self._alive.flags.writeable:
+            return
+
+        capacity = max(rows, 2 * capacity, 1024) if rows > capacity else capacity
+        self._vectors = _grown(self._vectors, capacity, self.size)
+        self._norms = _grown(self._norms, capacity, self.size)
+        self._ids = _grown(self._ids, capacity, self.size)
+        self._alive = _grown(self._alive, capacity, self.size)
+
+    def save(self):
+        self.compact()
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+
+        # The buffers may be memory-mapped from these very files, so write aside and swap in
+        for path, array in (
+            (self.index_path, self._vectors[:self.size]),
+            (self.norms_path, self._norms[:self.size]),
+            (self.ids_path, self._ids[:self.size]),
+        ):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, path)
+
+    def load(self, mmap: bool = False, path: str | None = None):
+        """
+        Load from `path` if given, otherwise from the current snapshot of
+        `index_path`. With `mmap`, the matrix, norms and ids are
+        memory-mapped read-only; adding or removing copies them into RAM.
+        """
+        path = path or resolve_index_path(self.index_path)
+        if not os.path.exists(path):
+            return
+
+        mmap_mode = "r" if mmap else None
+        with span("numpy.load"):
+            try:
+                vectors = np.load(path, mmap_mode=mmap_mode)
+            except ValueError as e:
+                raise ValueError(
+                    f"{path} is not a NumPy vector store; rebuild the index after changing VECTOR_STORE"
+                ) from e
+
+            self._vectors = vectors
+            self._norms = np.load(path + "_norms.npy", mmap_mode=mmap_mode)
+            self._ids = np.load(path + "_ids.npy", mmap_mode=mmap_mode)
+
+        self.dtype = str(vectors.dtype)
+        self.index_type = f"numpy_{self.dtype}"
+        self.size = len(self._ids)
+        self.removed = 0
+        self._alive = np.ones(self.size, dtype=bool)
+
+
+def _squared_norms(vectors: np.ndarray) -> np.ndarray:
+    vectors = vectors.astype("float32", copy=False)
+    return np.einsum("ij,ij->i", vectors, vectors)
+
+
+def _grown(array: np.ndarray, capacity: int, used: int) -> np.ndarray:
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
@@ -0,0 +1,42 @@
+from app.interfaces.vectore_store import I_SearchableStore, I_VectorStore
+
+
+class LayeredVectorStore(I_SearchableStore):
+    """
+    Read-only view of a published index (`base`) with a small store of
+    live products (`delta`) on top, searched as one.
+
+    Base hits whose id is in `hidden` are dropped; those products were
+    replaced by a newer vector in the delta or removed. The two result
+    lists are merged by distance, which both stores report as squared L2.
+    Neither store is modified, so a view stays valid while the next one
+    is built. A view is search-only: products are ingested and published
+    through ServingIndex.
+    """
+
+    def __init__(self, base: I_VectorStore | None, delta: I_VectorStore, hidden: frozenset = frozenset()):
+        self.base = base
+        self.delta = delta
+        self.hidden = hidden
+        self.dimension = delta.dimension
+        self.index_type = base.index_type if base is not None else delta.index_type
+
+    def memory_usage(self) -> dict[str, int]:
+        usage = dict(self.base.memory_usage()) if self.base is not None else {}
+        usage.update({f"live.{part}": size for part, size in self.delta.memory_usage().items()})
+        return usage
+
+    def search(self, vector, top_k, rerank_k=None):
+        hits = []
+        if self.base is not None:
+            # Deep enough that top_k survive even if every hidden id ranks first
+            ids, distances = self.base.search(vector, top_k + len(self.hidden), rerank_k=rerank_k)
+            hits.extend((d, pid) for pid, d in zip(ids, distances) if pid not in self.hidden)
+        if len(self.delta):
+            ids, distances = self.delta.search(vector, top_k)
+            hits.extend(zip(distances, ids))
+
+        hits.sort(key=lambda hit: hit[0])
+        hits = hits[:top_k]
+
+        return [pid for _, pid in hits], [distance for distance, _ in hits]
@@ -0,0 +1,190 @@
+"""
+Versioned, checksummed index snapshots.
+
+Layout, under the index directory (dirname of FAISS_INDEX_PATH):
+
+    CURRENT                     name of the published snapshot
+    snapshots/
+        <version>/
+            MANIFEST.json       version, creation time, sha256 + size per file
+            index.bin           FAISS index
+            index.bin_ids.npy   position → product id
+            index.bin_vectors.npy   (compressed index types only)
+            id_to_filename.json
+            duplicates.json
+        .staging-<version>/     being written; never read
+
+A snapshot is built completely in its staging directory, checksummed,
+renamed into place and only then published by atomically replacing
+CURRENT. Readers resolve CURRENT once and read every file from that one
+directory, so they never see an index from one build and an id map from
+another. Old snapshots beyond the retention count are deleted after each
+publish (processes that still have one memory-mapped keep their pages).
+
+Directories without CURRENT are read in the legacy flat layout
+(index.bin directly in the index directory).
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+
+from app.config import settings
+
+
+CURRENT = "CURRENT"
+MANIFEST = "MANIFEST.json"
+INDEX_FILENAME = "index.bin"
+
+
+class IndexSnapshots:
+    """
+    Args:
+        root:   Index directory.
+        retain: Snapshots kept on disk, including the current one.
+    """
+
+    def __init__(self, root: str, retain: int = settings.INDEX_SNAPSHOT_RETAIN):
+        self.root = root
+        self.retain = max(1, retain)
+        self.snapshots_dir = os.path.join(root, "snapshots")
+
+
+    def current(self) -> str | None:
+        try:
+            with open(os.path.join(self.root, CURRENT), "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+
+    def path(self, version: str) -> str:
+        return os.path.join(self.snapshots_dir, version)
+
+
+    def index_dir(self) -> str:
+        """Directory holding the files to serve: the current snapshot, or root (legacy)."""
+        version = self.current()
+        return self.path(version) if version else self.root
+
+
+    def versions(self) -> list[str]:
+        """Published snapshots on disk, oldest first."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(v for v in os.listdir(self.snapshots_dir) if not v.startswith("."))
+
+
+    def staging(self) -> str:
+        """Create and return an empty directory to build the next snapshot in."""
+        version = f"{time.time_ns():020d}-{os.getpid()}"
+        path = os.path.join(self.snapshots_dir, f".staging-{version}")
+        os.makedirs(path)
+        return path
+
+
+    def publish(self, staging_dir: str) -> str:
+        """
+        Checksum the files in `staging_dir`, move it into place, point
+        CURRENT at it and prune old snapshots. Returns the new version.
+        """
+        version = os.path.basename(staging_dir).removeprefix(".staging-")
+
+        files = {
+            name: {"sha256": _sha256(os.path.join(staging_dir, name)), "size": os.path.getsize(os.path.join(staging_dir, name))}
+            for name in sorted(os.listdir(staging_dir))
+        }
+        _write_atomic(
+            os.path.join(staging_dir, MANIFEST),
+            json.dumps({"version": version, "created": time.time(), "files": files}, indent=2),
+        )
+
+        os.replace(staging_dir, self.path(version))
+        _write_atomic(os.path.join(self.root, CURRENT), version)
+
+        self.gc()
+        return version
+
+
+    def created(self, version: str) -> float | None:
+        """Publish time (Unix seconds) recorded in the snapshot's manifest."""
+        try:
+            with open(os.path.join(self.path(version), MANIFEST), "r") as f:
+                return json.load(f)["created"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+    def verify(self, version: str) -> bool:
+        """True if every file listed in the snapshot's manifest is intact."""
+        try:
+            with open(os.path.join(self.path(version), MANIFEST), "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        for name, expected in manifest["files"].items():
+            path = os.path.join(self.path(version), name)
+            if not os.path.exists(path) or os.path.getsize(path) != expected["size"]:
+                return False
+            if _sha256(path) != expected["sha256"]:
+                return False
+
+        return True
+
+
+    def gc(self) -> list[str]:
+        """Delete all but the newest `retain` snapshots (never the current one)."""
+        current = self.current()
+        removed = []
+
+        for version in self.versions()[:-self.retain]:
+            if version == current:
+                continue
+            shutil.rmtree(self.path(version), ignore_errors=True)
+            removed.append(version)
+
+        return removed
+
+
+def resolve_index_path(index_path: str = settings.FAISS_INDEX_PATH) -> str:
+    """The index file actually served for the logical `index_path`."""
+    root = os.path.dirname(index_path)
+    return os.path.join(IndexSnapshots(root).index_dir(), os.path.basename(index_path))
+
+
+def index_exists(index_path: str = settings.FAISS_INDEX_PATH) -> bool:
+    return os.path.exists(resolve_index_path(index_path))
+
+
+def read_catalog(index_dir: str) -> tuple[dict, dict]:
+    """(id → filename, representative id → duplicate filenames) stored in `index_dir`."""
+    with open(os.path.join(index_dir, "id_to_filename.json"), "r") as f:
+        id_to_filename = json.load(f)
+
+    duplicates = {}
+    duplicates_path = os.path.join(index_dir, "duplicates.json")
+    if os.path.exists(duplicates_path):
+        with open(duplicates_path, "r") as f:
+            duplicates = json.load(f)
+
+    return id_to_filename, duplicates
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, content: str):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -47,6 +47,65 @@ class I_Cache(ABC):
         """
         pass
 
+    def get_many(self, keys: list[str]) -> dict:
+        """
+        {key: value} for the `keys` that are cached; missing keys are left
+        out. Providers should answer in one round trip.
+        """
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+
+    def set_many(self, items: dict):
+        """
+        Set every key → value of `items`.
+        """
+        for key, value in items.items():
+            self.set(key, value)
+
+
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Delete every key starting with `prefix`. Returns how many were deleted.
+        """
+        keys = [k for k in self.keys() if k.startswith(prefix)]
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+
+    def contains(self, key: str) -> bool:
+        """
+        Whether `key` is cached, without fetching its value.
+        """
+        return self.get(key) is not None
+
+
+    def count(self, prefix: str = "") -> int:
+        """
+        Number of keys starting with `prefix` (all keys by default).
+        """
+        return sum(1 for k in self.keys() if k.startswith(prefix))
+
+
+    def get_or_load(self, key: str, loader):
+        """
+        Return the value for `key`, calling `loader()` and caching its
+        (non-None) result on a miss. Implementations should make concurrent
+        misses share one load.
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+
     @abstractmethod
     def info(self) -> I_CacheInfo:
         """
@@ -1,3 +1,4 @@
+import copy
 from abc import ABC, abstractmethod
 import numpy as np
 
@@ -7,6 +8,55 @@ class I_EmbeddingModel(ABC):
     def encode_image(self, image_path: str) -> np.ndarray:
         pass
 
+    def encode_images(self, image_paths: list[str]) -> np.ndarray:
+        """
+        Encode several images into an (n, dim) float32 array.
+
+        Default implementation calls encode_image() in a loop.
+        Subclasses should override it with a single batched forward.
+        """
+        return np.stack([self.encode_image(path) for path in image_paths])
+
     @abstractmethod
     def classify_img_zeroshot(self, img_path: str, labels: list[str]):
         pass
+
+    @abstractmethod
+    def zeroshot_image_features(self, image_paths: list[str]) -> np.ndarray:
+        """
+        Image features classify_img_zeroshot() scores labels against, for a
+        batch of images in one forward: (n, dim) float32. Pair with
+        zeroshot_probs() to score any number of label sets per forward.
+        """
+        pass
+
+    @abstractmethod
+    def zeroshot_probs(self, image_features: np.ndarray, labels: list[str]) -> np.ndarray:
+        """
+        (n, len(labels)) label probabilities for `image_features` from
+        zeroshot_image_features(), in `labels` order.
+        """
+        pass
+
+    def warmup(self, batch_sizes: list[int]) -> None:
+        """
+        Run a throwaway forward for each batch size so allocator arenas and
+        lazily created sessions are ready before the first real request.
+        Default implementation does nothing.
+        """
+
+    def with_preprocessor(self, preprocessor) -> "I_EmbeddingModel":
+        """
+        A view of this model that shares its weights but preprocesses
+        images with `preprocessor` (e.g. passthrough instead of rembg).
+        """
+        view = copy.copy(self)
+        view.preprocessor = preprocessor
+        return view
+
+    def fingerprint(self) -> str:
+        """
+        Identify the model (and preprocessing) that produced the embeddings.
+        Used in cache keys so cached results never outlive a model change.
+        """
+        return type(self).__name__
@@ -0,0 +1,32 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class I_FeedbackStore(ABC):
+    """
+    Append-only record of label corrections: (image embedding, corrected
+    label) per (category, attribute).
+    """
+
+    @abstractmethod
+    def append(self, category: str, attribute: str, embedding: np.ndarray, label: str) -> int:
+        """Record one correction. Returns the number of records for the attribute."""
+        pass
+
+
+    @abstractmethod
+    def read(self, category: str, attribute: str, start: int = 0, stop: int | None = None) -> tuple[np.ndarray, list[str]]:
+        """(embeddings (n, dim) float32, labels) of records [start, stop)."""
+        pass
+
+
+    @abstractmethod
+    def count(self, category: str, attribute: str) -> int:
+        pass
+
+
+    @abstractmethod
+    def attributes(self) -> list[tuple[str, str]]:
+        """(category, attribute) pairs with at least one record."""
+        pass
@@ -41,3 +41,14 @@ class I_ImagePreprocessor(ABC):
             List of preprocessed RGB PIL Images (same order, same length)
         """
         return [self.preprocess(img) for img in images]
+
+    def fingerprint(self) -> str:
+        """
+        Identify this preprocessor's configuration.
+
+        Two preprocessors with equal fingerprints must produce identical
+        outputs for the same input, so the string is safe to use in cache
+        keys for anything derived from preprocessed images.
+        """
+        config = ",".join(f"{k}={v}" for k, v in sorted(vars(self).items()))
+        return f"{type(self).__name__}({config})"
@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+
+
+class I_ClassificationRepository(ABC):
+    """Persistent classification results, keyed by image content hash and mode."""
+
+    @abstractmethod
+    def classified(self, content_hashes: list[str], mode: str, fingerprint: str, models_version: str) -> set[str]:
+        """
+        The subset of `content_hashes` already classified in `mode` by the
+        same model and trained heads.
+        """
+        pass
+
+
+    @abstractmethod
+    def save_many(self, rows: list[dict]):
+        """
+        Insert or replace results in one transaction. Each row has
+        content_hash, mode, path, category, category_confidence,
+        attributes (dict), fingerprint and models_version.
+        """
+        pass
+
+
+    @abstractmethod
+    def get(self, content_hash: str, mode: str) -> dict | None:
+        pass
+
+
+    @abstractmethod
+    def count(self, mode: str | None = None) -> int:
+        pass
@@ -3,13 +3,21 @@ import numpy as np
 from typing import List, Tuple
 
 
-class I_VectorStore(ABC):
+class I_SearchableStore(ABC):
+    """What a query needs: a searchable set of vectors, not necessarily writable."""
+
     @abstractmethod
-    def add(self, ids: List[int], vectors: np.ndarray):
+    def search(self, vector: np.ndarray, top_k: int, rerank_k: int | None = None) -> Tuple[List[int], List[float]]:
+        """
+        `rerank_k` overrides how many candidates a compressed index
+        re-ranks exactly (stores without a re-rank stage ignore it).
+        """
         pass
 
+
+class I_VectorStore(I_SearchableStore):
     @abstractmethod
-    def search(self, vector: np.ndarray, top_k: int) -> Tuple[List[int], List[float]]:
+    def add(self, ids: List[int], vectors: np.ndarray):
         pass
 
     @abstractmethod
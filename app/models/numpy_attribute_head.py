@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+
+# Written next to model.pt; ProductAttributeService serves it without torch
+EXPORT_NAME = "model.npz"
+
+
+class NumpyAttributeHead:
+    """
+    AttributeHead inference in NumPy: one (n, dim) × (dim, classes) matmul
+    plus bias, then a softmax and argmax, without importing torch.
+
+    Only the winning class's probability is needed, so the softmax is
+    reduced to 1 / Σ exp(logit − max logit): stable for any logit range,
+    and no (n, classes) exp matrix is normalised.
+    """
+
+    def __init__(self, weight: np.ndarray, bias: np.ndarray):
+        self.weight = np.ascontiguousarray(weight, dtype="float32")
+        self.bias = np.ascontiguousarray(bias, dtype="float32")
+        # Pre-transposed once, so every call is a plain row-major matmul
+        self._weight_t = np.ascontiguousarray(self.weight.T)
+
+    @property
+    def num_classes(self) -> int:
+        return self.weight.shape[0]
+
+    @classmethod
+    def from_module(cls, head) -> "NumpyAttributeHead":
+        """Copy the weights of a torch AttributeHead."""
+        weight, bias = head_weights(head)
+        return cls(weight, bias)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyAttributeHead":
+        with np.load(path) as data:
+            return cls(data["weight"], data["bias"])
+
+    def save(self, path: str):
+        """Write atomically: readers see the previous export or this one, never a partial file."""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, weight=self.weight, bias=self.bias)
+        os.replace(tmp_path, path)
+
+    def memory_usage(self) -> dict[str, int]:
+        return {"weights": self.weight.nbytes + self._weight_t.nbytes + self.bias.nbytes}
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        """Logits for an (n, dim) batch."""
+        return np.asarray(x, dtype="float32") @ self._weight_t + self.bias
+
+    def predict(self, x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(class index, softmax probability of it) for each row of `x`."""
+        logits = self(x)
+        predicted = logits.argmax(axis=1)
+        top = np.take_along_axis(logits, predicted[:, None], axis=1)
+        confidences = 1.0 / np.exp(logits - top).sum(axis=1)
+        return predicted, confidences
+
+
+def head_weights(head) -> tuple[np.ndarray, np.ndarray]:
+    """(weight, bias) of a torch AttributeHead or a NumpyAttributeHead, as float32 arrays."""
+    if isinstance(head, NumpyAttributeHead):
+        return head.weight, head.bias
+
+    classifier = head.classifier
+    return (
+        classifier.weight.detach().cpu().numpy().astype("float32"),
+        classifier.bias.detach().cpu().numpy().astype("float32"),
+    )
+
+
+def export_head(model_dir: str, head) -> str:
+    """Write `head`'s weights to <model_dir>/model.npz. Returns the path."""
+    path = os.path.join(model_dir, EXPORT_NAME)
+    NumpyAttributeHead.from_module(head).save(path)
+    return path
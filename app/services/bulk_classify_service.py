@@ -0,0 +1,210 @@
+import time
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+from app.interfaces.cache import I_Cache
+from app.interfaces.embedding import I_EmbeddingModel
+from app.interfaces.repository import I_ClassificationRepository
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.metrics.timing import span
+from app.services.cascade_attribute_service import CascadeAttributeService
+from app.services.category_classifier_service import CategoryClassifierService
+from app.services.product_attribute_service import ProductAttributeService
+from app.services.result_cache_service import ResultCacheService
+from app.services.zero_shot_attribute_service import ZeroShotAttributeService
+
+
+MODES = ("zeroshot", "trained", "cascade")
+
+
+class BulkClassifyService:
+    """
+    Classifies a stream of images in batches and stores the results in a
+    repository, skipping images already classified.
+
+    Per batch of `batch_size` images:
+        1. content hashes (the next batch is hashed on a background thread
+           while this one is classified); hashes already in the repository
+           for this mode, model and heads, and repeats within the run, are
+           skipped
+        2. one zero-shot image forward scores the category and every
+           zero-shot label set
+        3. "trained"/"cascade": one preprocessed image forward, then each
+           trained head runs once on all rows of its category
+        4. one transaction writes the batch's results
+
+    A batch that fails (e.g. an unreadable image) is retried image by
+    image so only the bad images are reported.
+
+    Args:
+        embedding_model:    Model providing the batched zero-shot methods.
+        cache:              Cache for trained heads and label banks.
+        repository:         Where results are stored.
+        mode:               "zeroshot", "trained" or "cascade", as in classify.
+        batch_size:         Images per forward / transaction.
+        preprocessed_store: Optional PreprocessedStore for the trained forward.
+    """
+
+    def __init__(
+        self,
+        embedding_model: I_EmbeddingModel,
+        cache: I_Cache,
+        repository: I_ClassificationRepository,
+        mode: str = "zeroshot",
+        batch_size: int = settings.BULK_BATCH_SIZE,
+        preprocessed_store=None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown classify mode: {mode} (expected one of {MODES})")
+
+        self.embedding_model = embedding_model
+        self.repository = repository
+        self.mode = mode
+        self.batch_size = batch_size
+        self.preprocessed_store = preprocessed_store
+
+        self.category = CategoryClassifierService(embedding_model=embedding_model)
+        self.zero_shot = ZeroShotAttributeService(embedding_model=embedding_model)
+        self.trained = ProductAttributeService(embedding_model=embedding_model, cache=cache)
+        self.cascade = CascadeAttributeService(embedding_model=embedding_model, cache=cache)
+
+        self.fingerprint = embedding_model.fingerprint()
+        # Zero-shot results don't depend on the trained heads
+        self.models_version = "none" if mode == "zeroshot" else ResultCacheService.models_version()
+
+
+    def run(self, image_paths, on_batch=None) -> dict:
+        """
+        Classify every path of the iterable `image_paths`.
+
+        `on_batch(stats)` is called after each batch is written. Returns
+        {"classified", "skipped", "failed": [(path, error)], "seconds"}.
+        """
+        stats = {"classified": 0, "skipped": 0, "failed": [], "seconds": 0.0}
+        started = time.perf_counter()
+        seen: set[str] = set()
+        batches = _batched(image_paths, self.batch_size)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-hash") as hasher:
+            pending = self._hash_next(hasher, batches)
+
+            while pending is not None:
+                hashed = pending.result()
+                pending = self._hash_next(hasher, batches)
+
+                batch = self._new_work(hashed, seen, stats)
+                if batch:
+                    rows = self._classify(batch, stats)
+                    with span("bulk.write"):
+                        self.repository.save_many(rows)
+                    stats["classified"] += len(rows)
+
+                stats["seconds"] = time.perf_counter() - started
+                if on_batch:
+                    on_batch(stats)
+
+        return stats
+
+
+    def _hash_next(self, hasher: ThreadPoolExecutor, batches):
+        paths = next(batches, None)
+        return hasher.submit(_content_hashes, paths) if paths is not None else None
+
+
+    def _new_work(self, hashed: list[tuple], seen: set, stats: dict) -> list[tuple[str, str]]:
+        """(path, content hash) pairs of the batch that still need classifying."""
+        work = []
+        for path, content_hash, error in hashed:
+            if error is not None:
+                stats["failed"].append((path, error))
+            elif content_hash in seen:
+                stats["skipped"] += 1
+            else:
+                seen.add(content_hash)
+                work.append((path, content_hash))
+
+        done = self.repository.classified(
+            [content_hash for _, content_hash in work], self.mode, self.fingerprint, self.models_version
+        )
+        stats["skipped"] += len(done)
+
+        return [(path, content_hash) for path, content_hash in work if content_hash not in done]
+
+
+    def _classify(self, batch: list[tuple[str, str]], stats: dict) -> list[dict]:
+        paths = [path for path, _ in batch]
+
+        try:
+            results = self.classify_batch(paths)
+        except Exception as e:
+            if len(batch) == 1:
+                stats["failed"].append((paths[0], f"{type(e).__name__}: {e}"))
+                return []
+            # Isolate the images that broke the batch
+            return [row for item in batch for row in self._classify([item], stats)]
+
+        return [
+            {
+                "content_hash": content_hash,
+                "mode": self.mode,
+                "path": path,
+                "category": category,
+                "category_confidence": confidence,
+                "attributes": attributes,
+                "fingerprint": self.fingerprint,
+                "models_version": self.models_version,
+            }
+            for (path, content_hash), (category, confidence, attributes) in zip(batch, results)
+        ]
+
+
+    def classify_batch(self, img_paths: list[str]) -> list[tuple[str, float, dict]]:
+        """(category, category confidence, attributes) per image, as classify would return."""
+        with span("bulk.zeroshot_forward"):
+            image_features = self.embedding_model.zeroshot_image_features(img_paths)
+        categories = self.category.classify_batch(image_features)
+
+        embedding_tensor = None
+        if self.mode != "zeroshot":
+            with span("bulk.embed_forward"):
+                embedding_tensor = self.trained.embed_batch(img_paths, preprocessed_store=self.preprocessed_store)
+
+        attributes: list[dict | None] = [None] * len(img_paths)
+        for category in sorted({category for category, _ in categories}):
+            rows = [i for i, (c, _) in enumerate(categories) if c == category]
+            predictions = self._attributes(
+                image_features[rows], None if embedding_tensor is None else embedding_tensor[rows], category
+            )
+            for i, prediction in zip(rows, predictions):
+                attributes[i] = prediction
+
+        return [(category, confidence, attrs) for (category, confidence), attrs in zip(categories, attributes)]
+
+
+    def _attributes(self, image_features, embedding_tensor, category: str) -> list[dict]:
+        if self.mode == "cascade":
+            return self.cascade.classify_batch(image_features, embedding_tensor, category)
+
+        # Categories without heads fall back to zero-shot, like classify --use-trained
+        if self.mode == "trained" and self.trained.trained_attributes(category):
+            return self.trained.classify_batch(embedding_tensor, category)
+
+        return self.zero_shot.classify_batch(image_features, category)
+
+
+def _batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _content_hashes(paths: list[str]) -> list[tuple]:
+    """(path, content hash, error) for each path; hashing reads the whole file."""
+    hashed = []
+    for path in paths:
+        try:
+            hashed.append((path, CacheKeys.content_hash(path), None))
+        except OSError as e:
+            hashed.append((path, None, f"{type(e).__name__}: {e}"))
+    return hashed
@@ -0,0 +1,100 @@
+from app.interfaces.cache import I_Cache
+from app.interfaces.embedding import I_EmbeddingModel
+from app.infrastructure.metrics.timing import span
+from app.services.product_attribute_service import ProductAttributeService
+from app.services.zero_shot_attribute_service import ZeroShotAttributeService
+
+
+class CascadeAttributeService:
+    """
+    Trained heads first, zero-shot only where they aren't good enough.
+
+    For each attribute of the category:
+        - with a trained head whose confidence reaches the head's calibrated
+          threshold → the head's prediction ("source": "trained")
+        - otherwise, if zero-shot prompts exist for it → zero-shot
+          ("source": "zero_shot")
+        - otherwise the head's prediction is kept even below threshold,
+          since there is nothing to fall back to
+
+    The image is embedded once for all heads; CLIP's text side (and a
+    second image forward) only runs for attributes that fall through.
+    """
+
+    def __init__(self, embedding_model: I_EmbeddingModel, cache: I_Cache):
+        self.trained = ProductAttributeService(embedding_model=embedding_model, cache=cache)
+        self.zero_shot = ZeroShotAttributeService(embedding_model=embedding_model)
+
+    def classify(self, img_path: str, category: str, zero_shot: bool = True):
+        """Without `zero_shot`, every head's prediction is kept and nothing falls through."""
+        zero_shot_labels = ZeroShotAttributeService.ATTRIBUTE_LABELS.get(category, {})
+        trained_attributes = self.trained.trained_attributes(category)
+
+        if not zero_shot_labels and not trained_attributes:
+            raise Exception(f"No trained models or zero-shot labels for category: {category}")
+
+        results = {}
+
+        if trained_attributes:
+            embedding_tensor = self.trained.embed(img_path)
+
+            for attribute in trained_attributes:
+                prediction = self.trained.predict(embedding_tensor, category, attribute)
+                if prediction is None:
+                    continue
+
+                threshold = self.trained.confidence_threshold(category, attribute)
+                trusted = threshold is not None and prediction["confidence"] >= threshold
+
+                if trusted or not zero_shot or attribute not in zero_shot_labels:
+                    results[attribute] = {**prediction, "source": "trained"}
+
+        for attribute, labels in zero_shot_labels.items():
+            if attribute in results or not zero_shot:
+                continue
+
+            with span("service.cascade_fallback"):
+                prediction = self.zero_shot.classify_attribute(img_path, labels)
+            results[attribute] = {**prediction, "source": "zero_shot"}
+
+        return results
+
+    def classify_batch(self, image_features, embedding_tensor, category: str) -> list[dict]:
+        """
+        classify() for a batch: `image_features` from
+        embedding_model.zeroshot_image_features() and `embedding_tensor`
+        from ProductAttributeService.embed_batch(), row-aligned. Each head
+        and each fallback label set is scored once for the whole batch.
+        """
+        zero_shot_labels = ZeroShotAttributeService.ATTRIBUTE_LABELS.get(category, {})
+        trained_attributes = self.trained.trained_attributes(category)
+
+        if not zero_shot_labels and not trained_attributes:
+            raise Exception(f"No trained models or zero-shot labels for category: {category}")
+
+        results = [{} for _ in range(len(image_features))]
+        heads = self.trained.heads(category, trained_attributes)
+        thresholds = self.trained.confidence_thresholds(category, trained_attributes)
+
+        for attribute in trained_attributes:
+            predictions = self.trained.predict_with_head(heads[attribute], embedding_tensor)
+            if predictions is None:
+                continue
+
+            threshold = thresholds[attribute]
+            for row, prediction in zip(results, predictions):
+                trusted = threshold is not None and prediction["confidence"] >= threshold
+                if trusted or attribute not in zero_shot_labels:
+                    row[attribute] = {**prediction, "source": "trained"}
+
+        for attribute, labels in zero_shot_labels.items():
+            pending = [i for i, row in enumerate(results) if attribute not in row]
+            if not pending:
+                continue
+
+            with span("service.cascade_fallback"):
+                predictions = self.zero_shot.classify_attribute_batch(image_features[pending], labels)
+            for i, prediction in zip(pending, predictions):
+                results[i][attribute] = {**prediction, "source": "zero_shot"}
+
+        return results
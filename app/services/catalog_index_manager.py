@@ -0,0 +1,228 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from app.config import settings
+from app.infrastructure.metrics.memory import estimate_bytes
+from app.infrastructure.vector_store.snapshots import index_exists
+from app.services.serving_index import LoadedIndex, ServingIndex
+
+
+CATALOG_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class CatalogIndexManager:
+    """
+    One index per catalog (e.g. per storefront), each served by its own
+    ServingIndex from <root>/<name>/, with its own snapshots.
+
+    A catalog is loaded on its first use. The resident catalogs are kept in
+    least-recently-used order; once their memory (store plus id map, as
+    estimate_bytes counts it) exceeds `memory_budget`, the coldest ones are
+    dropped until it fits again. The catalog just used is never dropped,
+    so one bigger than the budget is served alone. Queries holding an
+    evicted catalog's LoadedIndex finish on it; the next use loads it
+    again. Eviction only drops memory: a catalog holding live products
+    (add() not yet publish()ed) is never evicted for the budget, so no
+    query waits on another catalog's snapshot being written, and no live
+    product is lost.
+
+    Args:
+        make_store:    Callable(index_path) returning an empty store saving
+                       to `index_path`, e.g. a configured store's clone_empty.
+        root:          Directory holding one subdirectory per catalog.
+        memory_budget: Bytes the resident catalogs may use together.
+        mmap:          Memory-map loaded snapshots (see ServingIndex).
+        verify:        Check a snapshot's checksums before serving it.
+    """
+
+    def __init__(
+        self,
+        make_store,
+        root: str = settings.CATALOGS_DIR,
+        memory_budget: int = int(settings.CATALOG_MEMORY_BUDGET_MB * 2**20),
+        mmap: bool = False,
+        verify: bool = settings.INDEX_VERIFY_CHECKSUMS,
+    ):
+        self.make_store = make_store
+        self.root = root
+        self.memory_budget = memory_budget
+        self.mmap = mmap
+        self.verify = verify
+
+        # name → ServingIndex, least recently used first
+        self._indexes: OrderedDict[str, ServingIndex] = OrderedDict()
+        # name → (version, resident bytes) of what it serves
+        self._sizes: dict[str, tuple[str, int]] = {}
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+
+    def index_path(self, name: str) -> str:
+        if not CATALOG_NAME.match(name):
+            raise ValueError(f"Invalid catalog name: {name!r} (letters, digits, '.', '_' and '-')")
+        return os.path.join(self.root, name, os.path.basename(settings.FAISS_INDEX_PATH))
+
+
+    def catalogs(self) -> list[str]:
+        """Names of the catalogs with an index on disk."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if CATALOG_NAME.match(name) and index_exists(self.index_path(name))
+        )
+
+
+    def index(self, name: str, create: bool = False) -> ServingIndex:
+        """
+        The ServingIndex of catalog `name`, loaded if it isn't resident
+        (or a newer snapshot was published) and marked most recently used.
+        Raises KeyError for a catalog without an index, unless `create`.
+        """
+        index_path = self.index_path(name)
+        with self._lock:
+            serving_index = self._indexes.get(name)
+            if serving_index is None:
+                if not create and not index_exists(index_path):
+                    raise KeyError(f"No index for catalog {name!r} in {self.root}")
+                serving_index = ServingIndex(
+                    lambda: self.make_store(index_path), index_path, mmap=self.mmap, verify=self.verify
+                )
+                self._indexes[name] = serving_index
+            self._indexes.move_to_end(name)
+
+        # Loads outside the manager lock; a newer snapshot of a resident catalog loads in the background
+        serving_index.refresh(wait=False)
+        self._account(name, serving_index.current())
+        self._evict_over_budget(keep=name)
+        return serving_index
+
+
+    def current(self, name: str) -> LoadedIndex:
+        """The LoadedIndex catalog `name` is served from (see index())."""
+        return self.index(name).current()
+
+
+    def search(self, name: str, vector, top_k: int = settings.TOP_K, rerank_k: int | None = None) -> list[tuple]:
+        """Top-k (id, filename, distance, duplicate members) in catalog `name`."""
+        loaded = self.current(name)
+        ids, scores = loaded.store.search(vector, top_k, rerank_k=rerank_k)
+        id_to_filename, duplicates = loaded.catalog
+
+        return [
+            (pid, id_to_filename.get(str(pid), "unknown"), score, tuple(duplicates.get(str(pid), [])))
+            for pid, score in zip(ids, scores)
+        ]
+
+
+    def add(self, name: str, added: dict, removed=()) -> LoadedIndex:
+        """
+        Serve `added` (filename → embedding) and drop the `removed`
+        filenames in catalog `name` right away (see ServingIndex.ingest),
+        creating the catalog if needed. publish() writes them to disk.
+        """
+        while True:
+            serving_index = self.index(name, create=True)
+            loaded = serving_index.ingest(added, removed)
+            with self._lock:
+                # Evicted between index() and ingest(): ingest into the catalog now resident
+                if self._indexes.get(name) is serving_index:
+                    break
+
+        self._account(name, loaded)
+        self._evict_over_budget(keep=name)
+        return loaded
+
+
+    def publish(self, name: str) -> str | None:
+        """Publish catalog `name`'s live products as a snapshot (see ServingIndex.fold)."""
+        with self._lock:
+            serving_index = self._indexes.get(name)
+        if serving_index is None:
+            return None
+
+        version = serving_index.fold()
+        self._account(name, serving_index.current())
+        return version
+
+
+    def rebuild(self, name: str, build) -> str:
+        """
+        Rebuild catalog `name`: `build(vector_store)` (e.g. run_rebuild)
+        publishes a new snapshot through a store configured for the
+        catalog. A resident catalog swaps to it; returns its version.
+        """
+        version = build(self.make_store(self.index_path(name)))
+
+        with self._lock:
+            serving_index = self._indexes.get(name)
+        if serving_index is not None and serving_index.refresh():
+            self._account(name, serving_index.current())
+            self._evict_over_budget(keep=name)
+        return version
+
+
+    def evict(self, name: str) -> bool:
+        """
+        Drop catalog `name` from memory, publishing its live products first.
+        True if it was dropped; False if it wasn't resident, or products
+        were added while publishing.
+        """
+        with self._lock:
+            serving_index = self._indexes.get(name)
+        if serving_index is None:
+            return False
+
+        serving_index.fold()
+        return self._drop(name, serving_index)
+
+
+    def resident(self) -> dict[str, int]:
+        """Resident catalog → bytes, least recently used first."""
+        with self._lock:
+            return {name: self._sizes.get(name, (None, 0))[1] for name in self._indexes}
+
+
+    def memory_usage(self) -> dict[str, int]:
+        return {f"catalog.{name}": size for name, size in self.resident().items()}
+
+
+    def _account(self, name: str, loaded: LoadedIndex | None):
+        """Record what catalog `name` holds in memory; measured once per version."""
+        if loaded is None:
+            return
+        with self._lock:
+            if self._sizes.get(name, (None,))[0] == loaded.version or name not in self._indexes:
+                return
+
+        size = estimate_bytes(loaded.store) + estimate_bytes(loaded.catalog)
+        with self._lock:
+            if name in self._indexes:
+                self._sizes[name] = (loaded.version, size)
+
+
+    def _drop(self, name: str, serving_index: ServingIndex) -> bool:
+        """Forget `serving_index` unless it was replaced or holds live products (checked under the lock add() checks)."""
+        with self._lock:
+            if self._indexes.get(name) is not serving_index or serving_index.live_count():
+                return False
+            del self._indexes[name]
+            self._sizes.pop(name, None)
+            self.evictions += 1
+        return True
+
+
+    def _evict_over_budget(self, keep: str):
+        # Coldest first, skipping catalogs with live products: publishing them is not a query's job
+        while True:
+            with self._lock:
+                total = sum(size for _, size in self._sizes.values())
+                coldest = [
+                    (name, serving_index) for name, serving_index in self._indexes.items()
+                    if name != keep and not serving_index.live_count()
+                ]
+            if total <= self.memory_budget or not coldest:
+                return
+            self._drop(*coldest[0])
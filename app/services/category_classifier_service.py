@@ -1,4 +1,5 @@
 from app.interfaces.embedding import I_EmbeddingModel
+from app.infrastructure.metrics.timing import span
 
 
 class CategoryClassifierService:
@@ -12,10 +13,23 @@ class CategoryClassifierService:
 
     
     def classify(self, img_path: str):
-        results = self.embedding_model.classify_img_zeroshot(img_path=img_path, labels=self.labels)
+        with span("service.category"):
+            results = self.embedding_model.classify_img_zeroshot(img_path=img_path, labels=self.labels)
         best_label, confidence = results[0]
 
         # Clean up label text
         category = best_label.replace("a photo of a ", "")
 
-        return category, confidence
\ No newline at end of file
+        return category, confidence
+
+
+    def classify_batch(self, image_features) -> list[tuple[str, float]]:
+        """(category, confidence) per row of embedding_model.zeroshot_image_features()."""
+        with span("service.category"):
+            probs = self.embedding_model.zeroshot_probs(image_features, self.labels)
+        best = probs.argmax(axis=1)
+
+        return [
+            (self.labels[i].replace("a photo of a ", ""), float(row[i]))
+            for i, row in zip(best, probs)
+        ]
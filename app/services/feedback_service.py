@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import threading
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from app.config import settings
+from app.interfaces.cache import I_Cache
+from app.interfaces.embedding import I_EmbeddingModel
+from app.interfaces.feedback import I_FeedbackStore
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.metrics.timing import span
+from app.models.attribute_head import AttributeHead
+from app.models.numpy_attribute_head import EXPORT_NAME, NumpyAttributeHead, head_weights
+from app.services.product_attribute_service import ProductAttributeService
+from app.services.result_cache_service import ResultCacheService
+
+
+class FeedbackService:
+    """
+    Applies label corrections to the trained attribute heads online,
+    without re-embedding the training set.
+
+    record() embeds the image once and appends (embedding, label) to the
+    feedback store. A background thread collects corrections for
+    `update_interval` seconds, then updates each affected head:
+
+        1. start from the head currently served (a head is created if the
+           attribute has none; unseen labels add output classes)
+        2. run `steps` Adam steps over mini-batches of the new corrections
+           plus a replay reservoir of earlier ones, with an L2 pull
+           (`anchor`) towards the starting weights so the head doesn't
+           drift from what full training learned
+        3. publish: classes.json, then model.pt and its model.npz export,
+           each replaced atomically, and the new head swapped into the
+           cache in one assignment
+
+    Requests in flight keep the head they already hold. How many records
+    each head has absorbed is kept in models/<category>/<attribute>/
+    feedback.json; a full `train` removes it, so the retrained head gets
+    every correction replayed on the next update.
+
+    The calibrated cascade threshold is left as is; retrain to recalibrate.
+
+    Args:
+        embedding_model: Model whose embeddings the heads consume.
+        cache:           Cache the heads are served from.
+        store:           Feedback store (see FeedbackLog).
+    """
+
+    def __init__(
+        self,
+        embedding_model: I_EmbeddingModel,
+        cache: I_Cache,
+        store: I_FeedbackStore,
+        update_interval: float = settings.FEEDBACK_UPDATE_INTERVAL,
+        replay_size: int = settings.FEEDBACK_REPLAY_SIZE,
+        steps: int = settings.FEEDBACK_STEPS,
+        lr: float = settings.FEEDBACK_LR,
+        anchor: float = settings.FEEDBACK_ANCHOR,
+        batch_size: int = 64,
+    ):
+        self.embedding_model = embedding_model
+        self.cache = cache
+        self.store = store
+        self.attributes = ProductAttributeService(embedding_model=embedding_model, cache=cache)
+
+        self.update_interval = update_interval
+        self.replay_size = replay_size
+        self.steps = steps
+        self.lr = lr
+        self.anchor = anchor
+        self.batch_size = batch_size
+
+        self._pending: set[tuple[str, str]] = set()
+        self._reservoirs: dict[tuple[str, str], Reservoir] = {}
+        self._updates: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+
+    def record(self, img_path: str, category: str, attribute: str, label: str) -> int:
+        """Record that `img_path`'s `attribute` is `label`. Returns the attribute's record count."""
+        embedding = self.embedding_model.encode_image(img_path)
+        return self.record_embedding(embedding, category, attribute, label)
+
+
+    def record_embedding(self, embedding: np.ndarray, category: str, attribute: str, label: str) -> int:
+        count = self.store.append(category, attribute, embedding, label)
+
+        with self._lock:
+            self._pending.add((category, attribute))
+        self._wake.set()
+
+        return count
+
+
+    def start(self):
+        """Start the background updater (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="feedback", daemon=True)
+            self._thread.start()
+
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"pending": sorted(f"{c}/{a}" for c, a in self._pending), "updates": dict(self._updates)}
+
+
+    def update_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+
+        for category, attribute in sorted(pending):
+            try:
+                self.update(category, attribute)
+            except Exception as e:
+                # Corrections stay in the store; the next update retries them
+                with self._lock:
+                    self._updates[f"{category}/{attribute}"] = {"error": f"{type(e).__name__}: {e}"}
+
+
+    def update(self, category: str, attribute: str) -> dict | None:
+        """Apply the attribute's unapplied corrections now. None if there were none."""
+        with self._update_lock:
+            model_dir = f"models/{category}/{attribute}"
+            applied = self._applied(model_dir)
+            total = self.store.count(category, attribute)
+            if total <= applied:
+                return None
+
+            started = time.perf_counter()
+            new_x, new_labels = self.store.read(category, attribute, applied, total)
+            reservoir = self._reservoir(category, attribute, applied, new_x.shape[1])
+
+            with span("feedback.update"):
+                head, classes = self._train(
+                    self.attributes.head(category, attribute),
+                    np.concatenate([new_x, reservoir.vectors]),
+                    new_labels + reservoir.labels,
+                    num_new=len(new_labels),
+                )
+            self._publish(category, attribute, model_dir, head, classes, total)
+            reservoir.add(new_x, new_labels)
+
+            result = {
+                "applied": total - applied,
+                "replayed": len(reservoir.labels),
+                "classes": len(classes),
+                "seconds": time.perf_counter() - started,
+                "at": time.time(),
+            }
+            with self._lock:
+                self._updates[f"{category}/{attribute}"] = result
+
+            return result
+
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let corrections arriving close together share one update
+            time.sleep(self.update_interval)
+            self._wake.clear()
+            self.update_pending()
+
+
+    def _train(self, current, x: np.ndarray, labels: list[str], num_new: int) -> tuple[AttributeHead, dict]:
+        classes = dict(current[1]) if current else {}
+        name_to_idx = {name: idx for idx, name in classes.items()}
+        for label in labels:
+            if label not in name_to_idx:
+                name_to_idx[label] = len(classes)
+                classes[len(classes)] = label
+
+        head = AttributeHead(embedding_dim=x.shape[1], num_classes=len(classes))
+        with torch.no_grad():
+            head.classifier.weight.zero_()
+            head.classifier.bias.zero_()
+            if current:
+                # The served head may be a torch AttributeHead or a NumpyAttributeHead
+                old_weight, old_bias = (torch.from_numpy(np.array(w)) for w in head_weights(current[0]))
+                known = old_weight.shape[0]
+                head.classifier.weight[:known] = old_weight
+                head.classifier.bias[:known] = old_bias
+                # New classes start as likely as an average existing one
+                head.classifier.bias[known:] = old_bias.mean()
+
+        start = [p.detach().clone() for p in head.parameters()]
+        x = torch.from_numpy(np.ascontiguousarray(x, dtype="float32"))
+        y = torch.tensor([name_to_idx[label] for label in labels], dtype=torch.long)
+
+        optimizer = torch.optim.Adam(head.parameters(), lr=self.lr)
+        criterion = nn.CrossEntropyLoss()
+        generator = torch.Generator().manual_seed(len(labels))
+
+        head.train()
+        for _ in range(self.steps):
+            # Every batch holds the new corrections (up to half of it) plus replayed ones
+            new = torch.randperm(num_new, generator=generator)[: max(1, self.batch_size // 2)]
+            replay = num_new + torch.randperm(len(labels) - num_new, generator=generator)[: self.batch_size - len(new)]
+            batch = torch.cat([new, replay])
+
+            loss = criterion(head(x[batch]), y[batch])
+            loss = loss + self.anchor * sum(((p - p0) ** 2).sum() for p, p0 in zip(head.parameters(), start))
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+        head.eval()
+        return head.to(settings.DEVICE), classes
+
+
+    def _publish(self, category: str, attribute: str, model_dir: str, head: AttributeHead, classes: dict, applied: int):
+        os.makedirs(model_dir, exist_ok=True)
+
+        # classes first: it's a superset, and readers size the head from model.pt
+        _write_atomic(os.path.join(model_dir, "classes.json"), lambda f: json.dump(classes, f, indent=2), "w")
+        _write_atomic(os.path.join(model_dir, "model.pt"), lambda f: torch.save(head.state_dict(), f), "wb")
+        # After model.pt, so the export is never older than it (see ProductAttributeService)
+        NumpyAttributeHead.from_module(head).save(os.path.join(model_dir, EXPORT_NAME))
+        _write_atomic(os.path.join(model_dir, "feedback.json"), lambda f: json.dump({"applied": applied}, f), "w")
+        ResultCacheService.models_changed(os.path.dirname(os.path.dirname(model_dir)))
+
+        self.cache.set(CacheKeys.attribute_model(category=category, attribute=attribute), (head, classes))
+
+
+    def _applied(self, model_dir: str) -> int:
+        try:
+            with open(os.path.join(model_dir, "feedback.json"), "r") as f:
+                return json.load(f)["applied"]
+        except FileNotFoundError:
+            return 0
+
+
+    def _reservoir(self, category: str, attribute: str, applied: int, dimension: int) -> "Reservoir":
+        key = (category, attribute)
+        reservoir = self._reservoirs.get(key)
+
+        # (Re)built from the store when first needed or after a full retrain reset `applied`
+        if reservoir is None or reservoir.seen != applied:
+            reservoir = Reservoir(self.replay_size, dimension)
+            for start in range(0, applied, 4096):
+                reservoir.add(*self.store.read(category, attribute, start, min(start + 4096, applied)))
+            self._reservoirs[key] = reservoir
+
+        return reservoir
+
+
+class Reservoir:
+    """Uniform sample of up to `capacity` of the records seen so far (Algorithm R)."""
+
+    def __init__(self, capacity: int, dimension: int, seed: int = 0):
+        self.capacity = capacity
+        self.labels: list[str] = []
+        self.seen = 0
+        self._vectors = np.zeros((capacity, dimension), dtype="float32")
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:len(self.labels)]
+
+    def add(self, vectors: np.ndarray, labels: list[str]):
+        for vector, label in zip(vectors, labels):
+            if len(self.labels) < self.capacity:
+                self._vectors[len(self.labels)] = vector
+                self.labels.append(label)
+            else:
+                slot = self._rng.integers(0, self.seen + 1)
+                if slot < self.capacity:
+                    self._vectors[slot] = vector
+                    self.labels[slot] = label
+            self.seen += 1
+
+
+def _write_atomic(path: str, write, mode: str):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, mode) as f:
+        write(f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,231 @@
+import os
+import time
+import threading
+
+from app.config import settings
+from app.interfaces.embedding import I_EmbeddingModel
+from app.infrastructure.ingest.directory_watcher import DirectoryWatcher
+from app.infrastructure.metrics.timing import span
+from app.services.serving_index import ServingIndex
+
+
+class IngestService:
+    """
+    Keeps the served index in step with a products directory between
+    rebuilds.
+
+    Each round, run by run() until stop():
+        1. scan `products_dir` (DirectoryWatcher) for images that are new
+           or changed and have settled for `debounce` seconds, and for
+           removed ones
+        2. embed the new and changed images in micro-batches of
+           `batch_size`; serving_index.ingest() serves each batch right
+           away, next to the snapshot, while queries keep running
+        3. fold the live products into a published snapshot every
+           `fold_seconds`, or once `fold_rows` are live (0 folds after
+           every round), so other processes and restarts see them
+        4. wait `poll_interval` seconds, or less on an inotify event
+           (`debounce` while files are settling)
+
+    On start, a product in the served catalog whose file is older than
+    the snapshot counts as indexed. Only images added, changed or removed
+    since the snapshot was published are ingested.
+
+    Live products skip near-duplicate collapsing; the next rebuild
+    collapses them. An image that fails to embed is listed in status() and
+    retried once its file changes again.
+
+    Args:
+        embedding:          Model the index was built with.
+        serving_index:      ServingIndex queries are answered from.
+        products_dir:       Directory of product images (not recursive).
+        preprocessed_store: Optional PreprocessedStore, as in rebuild.
+        inotify:            Wake on inotify events where available.
+    """
+
+    def __init__(
+        self,
+        embedding: I_EmbeddingModel,
+        serving_index: ServingIndex,
+        products_dir: str = "data/products",
+        batch_size: int = settings.WATCH_BATCH_SIZE,
+        poll_interval: float = settings.WATCH_POLL_SECONDS,
+        debounce: float = settings.WATCH_DEBOUNCE_SECONDS,
+        fold_seconds: float = settings.WATCH_FOLD_SECONDS,
+        fold_rows: int = settings.WATCH_FOLD_ROWS,
+        preprocessed_store=None,
+        inotify: bool = True,
+    ):
+        self.embedding = embedding
+        self.serving_index = serving_index
+        self.products_dir = products_dir
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.fold_seconds = fold_seconds
+        self.fold_rows = fold_rows
+        self.preprocessed_store = preprocessed_store
+        self.inotify = inotify
+
+        self.watcher: DirectoryWatcher | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_fold = time.monotonic()
+        self._status = {
+            "ingested": 0,
+            "removed": 0,
+            "failed": {},
+            "folded": None,
+            "error": None,
+        }
+
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def start(self) -> threading.Thread:
+        """Run on a daemon thread (idempotent)."""
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, daemon=True, name="ingest")
+            self._thread.start()
+        return self._thread
+
+
+    def stop(self, timeout: float | None = None) -> str | None:
+        """Stop the loop and fold whatever is still live. Returns the published version, if any."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        return self.fold()
+
+
+    def status(self) -> dict:
+        return {
+            **self._status,
+            "failed": dict(self._status["failed"]),
+            "running": self.running,
+            "inotify": self.watcher is not None and self.watcher.uses_inotify,
+            "pending": self.watcher.pending() if self.watcher else 0,
+            "live": self.serving_index.live_count(),
+        }
+
+
+    def run(self):
+        """Watch until stop(). Errors are kept in status() and the next round retries."""
+        self.open()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                    if self._fold_due():
+                        self.fold()
+                    self._status["error"] = None
+                except Exception as e:
+                    self._status["error"] = f"{type(e).__name__}: {e}"
+
+                self.watcher.wait(self.debounce if self.watcher.pending() else self.poll_interval)
+        finally:
+            self.watcher.close()
+
+
+    def open(self):
+        """Create the watcher, seeded with the products the served snapshot already holds."""
+        os.makedirs(self.products_dir, exist_ok=True)
+        self.watcher = DirectoryWatcher(self.products_dir, debounce=self.debounce, inotify=self.inotify)
+
+        self.serving_index.refresh()
+        loaded = self.serving_index.current()
+        if loaded is None:
+            return
+
+        published_ns = self._published_ns(loaded.version)
+        id_to_filename, duplicates = loaded.catalog
+        indexed = set(id_to_filename.values())
+        indexed.update(member for members in duplicates.values() for member in members)
+
+        stats = self.watcher.stat_all()
+        seeds = {}
+        for filename in indexed:
+            stat = stats.get(filename)
+            if stat is None:
+                # Gone since the snapshot: the first scan reports it removed
+                seeds[filename] = (-1, -1)
+            elif stat[0] <= published_ns:
+                seeds[filename] = stat
+        self.watcher.seed(seeds)
+
+
+    def run_once(self) -> dict:
+        """One scan: serve settled new/changed images and drop removed ones. Returns the counts."""
+        ready, removed = self.watcher.scan()
+
+        if removed:
+            self.serving_index.ingest({}, removed)
+            self.watcher.acknowledge(removed=removed)
+            self._status["removed"] += len(removed)
+
+        added = 0
+        for start in range(0, len(ready), self.batch_size):
+            batch = ready[start:start + self.batch_size]
+            vectors = self._embed(batch)
+            if vectors:
+                with span("ingest.serve"):
+                    self.serving_index.ingest(vectors)
+                added += len(vectors)
+            # Failed images too: they are retried when the file changes, not every round
+            self.watcher.acknowledge(batch)
+
+        self._status["ingested"] += added
+        return {"added": added, "removed": len(removed)}
+
+
+    def fold(self) -> str | None:
+        """Publish the live products as a snapshot now (see ServingIndex.fold)."""
+        self._last_fold = time.monotonic()
+        if not self.serving_index.live_count():
+            return None
+
+        if self.preprocessed_store is not None:
+            self.preprocessed_store.flush()
+        version = self.serving_index.fold()
+        self._status["folded"] = version
+        return version
+
+
+    def _fold_due(self) -> bool:
+        live = self.serving_index.live_count()
+        return bool(live) and (live >= self.fold_rows or time.monotonic() - self._last_fold >= self.fold_seconds)
+
+
+    def _embed(self, filenames: list[str]) -> dict:
+        """filename → embedding; images that fail are recorded and left out."""
+        paths = [os.path.join(self.products_dir, f) for f in filenames]
+        try:
+            with span("ingest.embed"):
+                vectors = self.embedding.encode_images(paths, preprocessed_store=self.preprocessed_store)
+        except Exception as e:
+            if len(filenames) == 1:
+                self._status["failed"][filenames[0]] = f"{type(e).__name__}: {e}"
+                return {}
+            # Isolate the images that broke the batch
+            embedded = {}
+            for filename in filenames:
+                embedded.update(self._embed([filename]))
+            return embedded
+
+        for filename in filenames:
+            self._status["failed"].pop(filename, None)
+        return dict(zip(filenames, vectors))
+
+
+    def _published_ns(self, version: str) -> float:
+        """When the served snapshot was published, in ns; files modified later are re-ingested."""
+        if version.startswith("legacy-"):
+            return int(version.split("-")[1])
+
+        created = self.serving_index.snapshots.created(version)
+        return created * 1e9 if created is not None else float("inf")
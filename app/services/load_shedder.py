@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+from app.config import settings
+from app.infrastructure.metrics.timing import timings
+
+
+# Each level keeps the degradations of the levels below it
+LEVELS = ("full", "no_bg_removal", "shallow_search", "no_zeroshot_attributes")
+
+# Stages a level stops running, on top of the levels below it
+SKIPPED_STAGES = {
+    1: ("preprocess.remove_bg", "preprocess.bg_rembg"),
+    2: ("faiss.rerank",),
+    3: ("service.zero_shot_attribute", "service.cascade_fallback"),
+}
+
+
+class LoadShedder:
+    """
+    Picks how much of the pipeline a request can afford within its
+    latency budget, so overload costs some quality instead of timeouts.
+
+    Levels (see LEVELS):
+        0 full                    everything
+        1 no_bg_removal           passthrough preprocessing instead of rembg
+        2 shallow_search          compressed indexes re-rank SHED_RERANK_K
+                                  candidates instead of FAISS_RERANK_K (exact
+                                  flat search has no depth to cut)
+        3 no_zeroshot_attributes  classify returns trained-head attributes only
+
+    plan() returns the lowest level whose predicted latency fits what is
+    left of the budget, counting the connections queued behind this
+    request: if each one ahead of the last is served at this level, the
+    last still finishes in time. When no level fits, the highest is used,
+    so latency rises by a bounded amount rather than without limit.
+
+    The prediction for a level is the p95 of its own requests over the last
+    `window` seconds. A level with no recent requests is estimated from the
+    level below it, minus the recent p50 of the stages it skips (from the
+    span timings). Old samples expire, so once pressure drops a stale p95
+    no longer keeps requests degraded.
+
+    Args:
+        queue_depth: Callable returning how many requests are waiting to be
+                     served (e.g. PreforkServer.backlog).
+        workers:     Processes draining that queue.
+        window:      Seconds of request latencies kept per command and level.
+    """
+
+    def __init__(self, queue_depth=None, workers: int = 1, window: float = settings.SHED_WINDOW_SECONDS):
+        self.queue_depth = queue_depth or (lambda: 0)
+        self.workers = max(1, workers)
+        self.window = window
+
+        self._latencies: dict[tuple[str, int], deque] = {}
+        self._served = [0] * len(LEVELS)
+        self._lock = threading.Lock()
+
+
+    def plan(self, command: str, budget_ms: float, waited_ms: float = 0.0) -> int:
+        """Degradation level for a `command` request with `budget_ms` (0 = no budget, never degraded)."""
+        if not budget_ms:
+            return 0
+
+        remaining = (budget_ms - waited_ms) / 1000
+        # This request plus its share of the queue, served one after another
+        backlog = 1 + self.queue_depth() / self.workers
+
+        stage_timings = None
+        estimate = 0.0
+        for level in range(len(LEVELS)):
+            observed = self._p95(command, level)
+            if observed is not None:
+                estimate = observed
+            elif level:
+                if stage_timings is None:
+                    stage_timings = timings.snapshot()
+                saved = sum(stage_timings.get(stage, {}).get("p50_ms", 0.0) for stage in SKIPPED_STAGES[level])
+                estimate = max(0.0, estimate - saved / 1000)
+
+            if estimate * backlog <= remaining:
+                return level
+
+        return len(LEVELS) - 1
+
+
+    def record(self, command: str, level: int, seconds: float):
+        now = time.monotonic()
+        with self._lock:
+            samples = self._latencies.setdefault((command, level), deque(maxlen=settings.TIMINGS_WINDOW))
+            samples.append((now, seconds))
+            self._served[level] += 1
+
+
+    def status(self) -> dict:
+        """Queue depth, requests served per level, and each command/level's recent p95."""
+        with self._lock:
+            keys = sorted(self._latencies)
+            served = dict(zip(LEVELS, self._served))
+
+        recent = {}
+        for command, level in keys:
+            p95 = self._p95(command, level)
+            if p95 is not None:
+                recent[f"{command}.{LEVELS[level]}"] = {"p95_ms": p95 * 1000}
+
+        return {"queue_depth": self.queue_depth(), "served": served, "recent": recent}
+
+
+    def _p95(self, command: str, level: int) -> float | None:
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            samples = self._latencies.get((command, level))
+            if not samples:
+                return None
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            if not samples:
+                return None
+            latencies = [seconds for _, seconds in samples]
+
+        return float(np.percentile(latencies, 95))
@@ -0,0 +1,81 @@
+import tracemalloc
+
+from app.infrastructure.metrics.memory import (
+    MemoryTracker,
+    estimate_bytes,
+    memory_tracker,
+    process_memory,
+)
+
+
+class MemoryReportService:
+    """
+    Reports where the process's memory goes, per component.
+
+    Args:
+        components: name → component. Components exposing memory_usage()
+                    are broken down into parts; others are estimated whole.
+        tracker:    MemoryTracker holding RSS/USS snapshots taken around
+                    each component's load.
+    """
+
+    def __init__(self, components: dict[str, object], tracker: MemoryTracker = memory_tracker):
+        self.components = components
+        self.tracker = tracker
+
+
+    def report(self, tracemalloc_top: int = 0) -> dict:
+        """
+        Returns:
+            process:    current {"rss", "uss"}
+            components: [{"component", "part", "bytes"}] resident estimates
+            accounted:  sum of component bytes
+            unaccounted: rss - accounted (interpreter, libraries, allocator slack)
+            loads:      {name: rss/uss before/after snapshot} per component load
+            python_allocations: tracemalloc top-N by line (empty if N == 0)
+        """
+        rows = []
+        for name, component in self.components.items():
+            if component is None:
+                continue
+
+            if hasattr(component, "memory_usage"):
+                usage = component.memory_usage()
+            else:
+                usage = {name: estimate_bytes(component)}
+
+            for part, nbytes in usage.items():
+                rows.append({"component": name, "part": part, "bytes": nbytes})
+
+        process = process_memory()
+        accounted = sum(row["bytes"] for row in rows)
+
+        return {
+            "process": process,
+            "components": rows,
+            "accounted": accounted,
+            "unaccounted": process["rss"] - accounted,
+            "loads": dict(self.tracker.loads),
+            "python_allocations": self._top_allocations(tracemalloc_top),
+        }
+
+
+    @staticmethod
+    def _top_allocations(top: int) -> list[dict]:
+        """
+        tracemalloc only sees allocations made after it starts, so the first
+        request starts tracing and returns nothing.
+        """
+        if top <= 0:
+            return []
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            return []
+
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:top]
+
+        return [
+            {"location": str(stat.traceback[0]), "bytes": stat.size, "count": stat.count}
+            for stat in stats
+        ]
@@ -1,36 +1,88 @@
 import os
 import json
-import torch
+
+import numpy as np
 
 from app.interfaces.cache import I_Cache
 from app.interfaces.embedding import I_EmbeddingModel
-from app.models.attribute_head import AttributeHead
+from app.models.numpy_attribute_head import EXPORT_NAME, NumpyAttributeHead
 from app.config import settings
 from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.metrics.timing import span
+
+# Optional: heads exported to model.npz are served without torch
+try:
+    import torch
+except ImportError:
+    torch = None
 
 
 class ProductAttributeService:
+    """
+    Trained attribute heads (models/<category>/<attribute>/).
+
+    A head whose model.npz export is at least as new as its model.pt is
+    served as a NumpyAttributeHead: a matmul and softmax in NumPy, with no
+    torch module or torch.load involved. Other heads load model.pt into
+    an AttributeHead. Without torch installed, only exported heads are
+    served, and embed()/embed_batch() return NumPy arrays instead of
+    tensors; either head accepts either.
+    """
+
     def __init__(self, embedding_model: I_EmbeddingModel, cache: I_Cache):
         self.embedding_model = embedding_model
         self.device = settings.DEVICE
         self.cache = cache
     
 
+    def head(self, category: str, attribute: str) -> tuple | None:
+        """(AttributeHead or NumpyAttributeHead, idx → class name) currently served, or None."""
+        return self._load_attribute_model(category, attribute)
+
+
+    def heads(self, category: str, attributes: list[str]) -> dict[str, tuple | None]:
+        """
+        head() for each of `attributes`, fetched from the cache in one
+        get_many(); only the misses are loaded. A head that fails to load
+        maps to None, with a warning.
+        """
+        keys = {a: CacheKeys.attribute_model(category=category, attribute=a) for a in attributes}
+        cached = self.cache.get_many(list(keys.values()))
+
+        heads = {}
+        for attribute, key in keys.items():
+            heads[attribute] = cached[key] if key in cached else self._try_load_attribute_model(category, attribute)
+
+        return heads
+
+
+    def _try_load_attribute_model(self, category: str, attribute: str):
+        """_load_attribute_model(), or None with a warning if the head fails to load."""
+        try:
+            return self._load_attribute_model(category, attribute)
+        except Exception as e:
+            print(f"Warning: Failed to load model for {category}/{attribute}: {e}")
+            return None
+
+
     def _load_attribute_model(self, category: str, attribute: str):
-        # See if it's cached or not
+        # Concurrent misses for the same head wait on a single load
         chache_key = CacheKeys.attribute_model(category=category, attribute=attribute)
 
-        cached = self.cache.get(chache_key)
-        if cached:
-            return cached
-        
-        # it's not chached
+        return self.cache.get_or_load(
+            chache_key, lambda: self._read_attribute_model(category, attribute)
+        )
+
+
+    def _read_attribute_model(self, category: str, attribute: str):
         base_path = f"models/{category}/{attribute}"
 
         model_path = os.path.join(base_path, "model.pt")
+        export_path = os.path.join(base_path, EXPORT_NAME)
         classes_path = os.path.join(base_path, "classes.json")
 
-        if not os.path.exists(model_path):
+        exported = _is_current_export(export_path, model_path)
+        if not exported and not os.path.exists(model_path):
             return None
 
         with open(classes_path, "r") as f:
@@ -39,55 +91,170 @@ class ProductAttributeService:
         # Convert string keys to integers (JSON doesn't support integer keys)
         classes = {int(k): v for k, v in classes.items()}
 
-        model = AttributeHead(
-            embedding_dim=512,
-            num_classes=len(classes)
-        )
+        if exported:
+            with span("service.attribute_model_load"):
+                return NumpyAttributeHead.load(export_path), classes
 
-        model.load_state_dict(
-            torch.load(model_path, map_location=self.device)
-        )
+        if torch is None:
+            raise ImportError(f"{model_path} needs torch; export it to {EXPORT_NAME} to serve it without")
+
+        from app.models.attribute_head import AttributeHead
+
+        with span("service.attribute_model_load"):
+            state_dict = torch.load(model_path, map_location=self.device)
+
+            # Sized from the weights, not classes.json: online updates publish
+            # classes (a superset) before the weights that use them
+            num_classes, embedding_dim = state_dict["classifier.weight"].shape
+            model = AttributeHead(embedding_dim=embedding_dim, num_classes=num_classes)
+            model.load_state_dict(state_dict)
 
         model.to(self.device)
         model.eval()
 
-        # now cache it
-        self.cache.set(chache_key, (model, classes))
-
         return model, classes
 
 
-    def classify(self, img_path: str, category: str):
-        embedding = self.embedding_model.encode_image(img_path)
-        embedding_tensor = torch.tensor(embedding).unsqueeze(0).to(self.device)
+    def confidence_threshold(self, category: str, attribute: str) -> float | None:
+        """
+        Minimum confidence at which the head's prediction is trusted, as
+        calibrated on its validation split at training time (see
+        app/training/calibration.py). None means the head never reached the
+        target accuracy; settings.CASCADE_DEFAULT_THRESHOLD is used for
+        heads trained without calibration.
+        """
+        key = CacheKeys.attribute_threshold(category=category, attribute=attribute)
+
+        # Boxed so a calibrated None can be cached
+        return self.cache.get_or_load(
+            key, lambda: (self._read_threshold(category, attribute),)
+        )[0]
+
+
+    def confidence_thresholds(self, category: str, attributes: list[str]) -> dict[str, float | None]:
+        """confidence_threshold() for each of `attributes`, with one get_many() for the cached ones."""
+        keys = {a: CacheKeys.attribute_threshold(category=category, attribute=a) for a in attributes}
+        cached = self.cache.get_many(list(keys.values()))
+
+        return {
+            attribute: cached[key][0] if key in cached else self.confidence_threshold(category, attribute)
+            for attribute, key in keys.items()
+        }
+
+
+    def _read_threshold(self, category: str, attribute: str) -> float | None:
+        calibration_path = os.path.join(f"models/{category}/{attribute}", "calibration.json")
+
+        if not os.path.exists(calibration_path):
+            return settings.CASCADE_DEFAULT_THRESHOLD
 
+        with open(calibration_path, "r") as f:
+            return json.load(f)["threshold"]
+
+
+    def trained_attributes(self, category: str) -> list[str]:
         category_dir = f"models/{category}"
 
         if not os.path.exists(category_dir):
-            raise Exception(f"No trained models found for category: {category}")
+            return []
+
+        return sorted(os.listdir(category_dir))
+
+
+    def embed(self, img_path: str):
+        """(1, dim) embedding of `img_path`: a tensor on the device, or a NumPy array without torch."""
+        embedding = self.embedding_model.encode_image(img_path)
+        if torch is None:
+            return np.asarray(embedding, dtype="float32")[None, :]
+        return torch.tensor(embedding).unsqueeze(0).to(self.device)
 
-        results = {}
 
-        for attribute in os.listdir(category_dir):
-            try:
-                loaded = self._load_attribute_model(category, attribute)
-            except Exception as e:
-                print(f"Warning: Failed to load model for {category}/{attribute}: {e}")
-                continue
+    def embed_batch(self, img_paths: list[str], preprocessed_store=None):
+        embeddings = self.embedding_model.encode_images(img_paths, preprocessed_store=preprocessed_store)
+        if torch is None:
+            return embeddings
+        return torch.from_numpy(embeddings).to(self.device)
 
-            if not loaded:
-                continue
 
-            model, classes = loaded
+    def predict(self, embedding_tensor, category: str, attribute: str) -> dict | None:
+        """
+        {"value", "confidence"} from the trained head, or None if there is
+        no usable head for `attribute`.
+        """
+        predictions = self.predict_batch(embedding_tensor, category, attribute)
+        return predictions[0] if predictions else None
 
-            with torch.no_grad():
+
+    def predict_batch(self, embedding_tensor, category: str, attribute: str) -> list[dict] | None:
+        """predict() for each row of an (n, dim) embedding tensor, in one head forward."""
+        return self.predict_with_head(self._try_load_attribute_model(category, attribute), embedding_tensor)
+
+
+    def predict_with_head(self, loaded: tuple | None, embedding_tensor) -> list[dict] | None:
+        """predict_batch() with a head already fetched by head() or heads()."""
+        if not loaded:
+            return None
+
+        model, classes = loaded
+
+        if isinstance(model, NumpyAttributeHead):
+            if not isinstance(embedding_tensor, np.ndarray):
+                embedding_tensor = embedding_tensor.detach().cpu().numpy()
+            with span("service.attribute_head"):
+                pred_idx, confidences = model.predict(embedding_tensor)
+        else:
+            if isinstance(embedding_tensor, np.ndarray):
+                embedding_tensor = torch.from_numpy(embedding_tensor).to(self.device)
+            with span("service.attribute_head"), torch.no_grad():
                 logits = model(embedding_tensor)
                 probs = torch.softmax(logits, dim=1)
-                pred_idx = torch.argmax(probs, dim=1).item()
+                confidences, pred_idx = probs.max(dim=1)
+
+        return [
+            {"value": classes[idx], "confidence": confidence}
+            for idx, confidence in zip(pred_idx.tolist(), confidences.tolist())
+        ]
 
-            results[attribute] = {
-                "value": classes[pred_idx],
-                "confidence": float(probs[0][pred_idx].item())
-            }
+
+    def classify(self, img_path: str, category: str):
+        if not os.path.exists(f"models/{category}"):
+            raise Exception(f"No trained models found for category: {category}")
+
+        attributes = self.trained_attributes(category)
+        embedding_tensor = self.embed(img_path)
+        results = {}
+
+        for attribute in attributes:
+            prediction = self.predict(embedding_tensor, category, attribute)
+            if prediction:
+                results[attribute] = prediction
 
         return results
+
+
+    def classify_batch(self, embedding_tensor, category: str) -> list[dict]:
+        """classify() for each row of embed_batch()'s (n, dim) tensor."""
+        if not os.path.exists(f"models/{category}"):
+            raise Exception(f"No trained models found for category: {category}")
+
+        results = [{} for _ in range(len(embedding_tensor))]
+        heads = self.heads(category, self.trained_attributes(category))
+
+        for attribute, loaded in heads.items():
+            predictions = self.predict_with_head(loaded, embedding_tensor)
+            for row, prediction in zip(results, predictions or []):
+                row[attribute] = prediction
+
+        return results
+
+
+def _is_current_export(export_path: str, model_path: str) -> bool:
+    """Whether model.npz exists and wasn't left behind by a newer model.pt."""
+    try:
+        exported = os.stat(export_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    try:
+        return exported >= os.stat(model_path).st_mtime_ns
+    except FileNotFoundError:
+        return True
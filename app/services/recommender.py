@@ -1,17 +1,33 @@
 from app.config import settings
 from app.interfaces.embedding import I_EmbeddingModel
-from app.interfaces.vectore_store import I_VectorStore
+from app.interfaces.vectore_store import I_SearchableStore
+from app.infrastructure.metrics.timing import span
 
 
 class RecommenderService:
-    def __init__(self, embedding_model: I_EmbeddingModel, vector_store: I_VectorStore):
+    def __init__(self, embedding_model: I_EmbeddingModel, vector_store: I_SearchableStore):
         self.embedding_model = embedding_model
         self.vector_store = vector_store
 
-    def recommend(self, image_path: str, save_preprocessed: bool = False, save_dir: str = "data/preprocessed"):
-        vector = self.embedding_model.encode_image(
-            image_path, save_preprocessed=save_preprocessed, save_dir=save_dir
-        )
-        ids, scores = self.vector_store.search(vector, settings.TOP_K)
+    def recommend(
+        self,
+        image_path: str,
+        save_preprocessed: bool = False,
+        save_dir: str = "data/preprocessed",
+        vector_store: I_SearchableStore | None = None,
+        rerank_k: int | None = None,
+    ):
+        """
+        Top-k similar product ids and distances for `image_path`, searched
+        in `vector_store` (e.g. a specific index snapshot) or the default one.
+        `rerank_k` overrides the store's re-rank depth.
+        """
+        vector_store = vector_store or self.vector_store
+
+        with span("service.recommend"):
+            vector = self.embedding_model.encode_image(
+                image_path, save_preprocessed=save_preprocessed, save_dir=save_dir
+            )
+            ids, scores = vector_store.search(vector, settings.TOP_K, rerank_k=rerank_k)
 
         return ids, scores
@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+
+from app.config import settings
+from app.interfaces.cache import I_Cache
+from app.infrastructure.vector_store.snapshots import resolve_index_path
+
+
+class ResultCacheService:
+    """
+    Memoises final query/classify results in the shared cache.
+
+    Keys (see CacheKeys.query_result / classify_result) embed the image
+    content hash, the model+preprocessor fingerprint and the index/models
+    version, so a rebuild or retrain makes old entries unreachable.
+    `track_version` additionally drops them eagerly so they don't pile up.
+
+    Safe to share between threads; concurrent misses on the same key run
+    `compute` once (see Cache.get_or_load).
+    """
+
+    QUERY_PREFIX = "query_result:"
+    CLASSIFY_PREFIX = "classify_result:"
+
+    # models_dir (absolute) → (monotonic time scanned, version)
+    _models_versions: dict[str, tuple[float, str]] = {}
+    _models_lock = threading.Lock()
+
+    def __init__(self, cache: I_Cache):
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+
+
+    def get_or_compute(self, key: str, compute):
+        """
+        Return (result, cached). `compute` is only called on a miss.
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached, True
+
+        computed = []
+
+        def load():
+            computed.append(True)
+            return compute()
+
+        result = self.cache.get_or_load(key, load)
+
+        # Callers that waited on another thread's compute count as hits
+        with self._lock:
+            if computed:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return result, not computed
+
+
+    def invalidate(self, *prefixes: str) -> int:
+        return sum(self.cache.delete_prefix(prefix) for prefix in prefixes)
+
+
+    def track_version(self, name: str, version: str, *prefixes: str):
+        """
+        Invalidate `prefixes` when the version of `name` (e.g. the index)
+        differs from the one seen last time.
+        """
+        with self._lock:
+            previous = self._versions.get(name)
+            self._versions[name] = version
+
+        if previous is not None and previous != version:
+            self.invalidate(*prefixes)
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+
+    @staticmethod
+    def index_version(index_path: str) -> str:
+        stat = os.stat(resolve_index_path(index_path))
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+    @classmethod
+    def models_version(cls, models_dir: str = "models", max_age: float = settings.MODELS_VERSION_CHECK_SECONDS) -> str:
+        """
+        Changes whenever any trained head under `models_dir` is added,
+        removed or rewritten.
+
+        Scanning stats every file under `models_dir`, so the result is
+        reused for `max_age` seconds, or until models_changed() reports a
+        publish from this process.
+        """
+        path = os.path.abspath(models_dir)
+        now = time.monotonic()
+        with cls._models_lock:
+            scanned = cls._models_versions.get(path)
+        if scanned is not None and now - scanned[0] < max_age:
+            return scanned[1]
+
+        latest, count = 0, 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+                count += 1
+
+        version = f"{latest}-{count}"
+        with cls._models_lock:
+            cls._models_versions[path] = (now, version)
+        return version
+
+
+    @classmethod
+    def models_changed(cls, models_dir: str = "models"):
+        """A head under `models_dir` was published: the next models_version() rescans."""
+        with cls._models_lock:
+            cls._models_versions.pop(os.path.abspath(models_dir), None)
@@ -0,0 +1,278 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from collections import ChainMap, namedtuple
+
+import numpy as np
+
+from app.config import settings
+from app.infrastructure.metrics.timing import span
+from app.infrastructure.vector_store.in_memory_store import NumpyVectorStore
+from app.infrastructure.vector_store.layered_store import LayeredVectorStore
+from app.infrastructure.vector_store.snapshots import IndexSnapshots, read_catalog
+
+
+logger = logging.getLogger(__name__)
+
+
+LoadedIndex = namedtuple("LoadedIndex", ["version", "store", "catalog"])
+
+
+class ServingIndex:
+    """
+    The index snapshot queries are answered from.
+
+    `current()` returns an immutable LoadedIndex (version, store, catalog)
+    loaded from one snapshot directory. `refresh()` loads a newer published
+    snapshot next to it and swaps the reference in one assignment, so
+    queries never pause for a rebuild and never mix an index with another
+    build's catalog. Queries already holding the old LoadedIndex finish on
+    it; it is freed once the last one drops it. Checksums are verified and
+    the snapshot loaded before the lock is taken for the swap; with
+    `wait=False` (the query paths) that happens on a background thread,
+    so no query waits for a publish. A snapshot failing verification is
+    logged once and never served.
+
+    Live products: `ingest()` serves new, changed or removed products on
+    top of the snapshot right away, without writing anything. They are
+    kept in a small exact store searched alongside the snapshot (see
+    LayeredVectorStore), and each ingest swaps in a new LoadedIndex the
+    same way refresh() does. `fold()` publishes snapshot + live products
+    as a new snapshot (for other processes and restarts) and serves it.
+    When refresh() picks up a snapshot published elsewhere, the live
+    products are laid over it again, matched by filename.
+
+    Args:
+        make_store: Callable returning an empty vector store to load into.
+        index_path: Logical index path (its directory holds the snapshots).
+        mmap:       Memory-map loaded snapshots (see FaissVectorStore.load).
+        verify:     Check a snapshot's checksums before serving it.
+    """
+
+    def __init__(
+        self,
+        make_store,
+        index_path: str = settings.FAISS_INDEX_PATH,
+        mmap: bool = False,
+        verify: bool = settings.INDEX_VERIFY_CHECKSUMS,
+    ):
+        self.make_store = make_store
+        self.index_path = index_path
+        self.mmap = mmap
+        self.verify = verify
+        self.snapshots = IndexSnapshots(os.path.dirname(index_path))
+
+        self._loaded: LoadedIndex | None = None
+        # The snapshot alone, and filename → product id in it
+        self._base: LoadedIndex | None = None
+        self._base_ids: dict[str, int] = {}
+        # Live products in arrival order: filename → vector, None once removed
+        self._live: dict[str, np.ndarray | None] = {}
+        self._live_version = 0
+        # Published version that failed verification; not hashed (or reported) again
+        self.rejected: str | None = None
+        # _lock guards what is served; _refresh_lock lets one refresh load at a time
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresher: threading.Thread | None = None
+
+
+    def current(self) -> LoadedIndex | None:
+        return self._loaded
+
+
+    def refresh(self, wait: bool = True) -> bool:
+        """
+        Load the published snapshot if it isn't the one being served. True
+        if swapped. With `wait=False` and a snapshot already served, the
+        load runs on a background thread and this returns False at once.
+        """
+        # Cheap unlocked check first: this runs before every query
+        version = self._published()[0]
+        base = self._base
+        if version is None or version == self.rejected or (base and base.version == version):
+            return False
+
+        if wait or base is None:
+            return self._refresh()
+
+        with self._lock:
+            if self._refresher is None or not self._refresher.is_alive():
+                self._refresher = threading.Thread(target=self._refresh, name="index-refresh", daemon=True)
+                self._refresher.start()
+        return False
+
+
+    def _refresh(self) -> bool:
+        with self._refresh_lock:
+            version, index_dir = self._published()
+            if version is None or version == self.rejected or (self._base and self._base.version == version):
+                return False
+
+            is_snapshot = not version.startswith("legacy-")
+            if self.verify and is_snapshot and not self.snapshots.verify(version):
+                self.rejected = version
+                logger.warning("Index snapshot %s failed checksum verification; not serving it", version)
+                return False
+
+            loaded = self._load(version, index_dir)
+            with self._lock:
+                # A fold may have published (and served) a newer snapshot meanwhile
+                if self._published()[0] != version:
+                    return False
+                self._serve(loaded)
+            return True
+
+
+    def ingest(self, added: dict[str, np.ndarray], removed=()) -> LoadedIndex:
+        """
+        Serve `added` (filename → embedding; a known filename gets its new
+        vector under its product id) and stop serving the `removed`
+        filenames, on top of the current snapshot. Returns the new view.
+        """
+        with self._lock:
+            for filename, vector in added.items():
+                self._live[filename] = np.asarray(vector, dtype="float32")
+            for filename in removed:
+                self._live[filename] = None
+
+            self._live_version += 1
+            self._loaded = self._layered()
+            return self._loaded
+
+
+    def live_count(self) -> int:
+        """Products ingested since the last fold (removals included)."""
+        return len(self._live)
+
+
+    def fold(self) -> str | None:
+        """
+        Publish the snapshot plus the live products as a new snapshot and
+        serve it. Returns the new version, or None if nothing was live.
+        """
+        with self._lock:
+            if not self._live:
+                return None
+
+            base = self._base
+            ids, vectors, hidden, live_names = self._live_rows()
+            removed = {filename for filename, vector in self._live.items() if vector is None}
+            id_to_filename, duplicates = base.catalog if base else ({}, {})
+
+            staging_dir = self.snapshots.staging()
+            try:
+                with span("index.fold"):
+                    store = self.make_store().clone_empty(
+                        os.path.join(staging_dir, os.path.basename(self.index_path))
+                    )
+                    if base is not None:
+                        store.load(path=self._index_file(base.version))
+                        store.remove(sorted(hidden))
+                    if ids:
+                        store.add(ids, np.stack(vectors))
+                    store.save()
+
+                id_to_filename = {
+                    pid: filename
+                    for pid, filename in id_to_filename.items()
+                    if int(pid) not in hidden
+                }
+                id_to_filename.update(live_names)
+                duplicates = {
+                    pid: [m for m in members if m not in removed]
+                    for pid, members in duplicates.items()
+                    if pid in id_to_filename
+                }
+                for name, content in (("id_to_filename.json", id_to_filename), ("duplicates.json", duplicates)):
+                    with open(os.path.join(staging_dir, name), "w") as f:
+                        json.dump(content, f, indent=2)
+            except BaseException:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+
+            version = self.snapshots.publish(staging_dir)
+            self._live.clear()
+            self._serve(self._load(version, self.snapshots.path(version)))
+            return version
+
+
+    def _load(self, version: str, index_dir: str) -> LoadedIndex:
+        with span("index.swap_load"):
+            store = self.make_store()
+            store.load(mmap=self.mmap, path=os.path.join(index_dir, os.path.basename(self.index_path)))
+            catalog = read_catalog(index_dir)
+
+        return LoadedIndex(version, store, catalog)
+
+
+    def _serve(self, base: LoadedIndex):
+        self._base = base
+        self._base_ids = {filename: int(pid) for pid, filename in base.catalog[0].items()}
+        self._loaded = self._layered()
+
+
+    def _layered(self) -> LoadedIndex | None:
+        """The snapshot with the live products laid over it."""
+        base = self._base
+        if not self._live:
+            return base
+
+        ids, vectors, hidden, live_names = self._live_rows()
+        delta = NumpyVectorStore(index_path=self.index_path)
+        if ids:
+            delta.add(ids, np.stack(vectors))
+
+        id_to_filename, duplicates = base.catalog if base else ({}, {})
+        return LoadedIndex(
+            f"{base.version if base else 'empty'}+live{self._live_version}",
+            LayeredVectorStore(base.store if base else None, delta, frozenset(hidden)),
+            (ChainMap(live_names, id_to_filename), duplicates),
+        )
+
+
+    def _live_rows(self) -> tuple[list, list, set, dict]:
+        """(ids, vectors, snapshot ids they hide, id → filename) of the live products."""
+        next_id = max(self._base_ids.values(), default=-1) + 1
+        ids, vectors, hidden, live_names = [], [], set(), {}
+
+        for filename, vector in self._live.items():
+            pid = self._base_ids.get(filename)
+            if pid is not None:
+                hidden.add(pid)
+            else:
+                # Ids follow arrival order, so they stay put as more products arrive
+                pid, next_id = next_id, next_id + 1
+
+            if vector is not None:
+                ids.append(pid)
+                vectors.append(vector)
+                live_names[str(pid)] = filename
+
+        return ids, vectors, hidden, live_names
+
+
+    def _index_file(self, version: str) -> str:
+        index_dir = self.snapshots.root if version.startswith("legacy-") else self.snapshots.path(version)
+        return os.path.join(index_dir, os.path.basename(self.index_path))
+
+
+    def memory_usage(self) -> dict[str, int]:
+        loaded = self._loaded
+        return loaded.store.memory_usage() if loaded else {}
+
+
+    def _published(self) -> tuple[str | None, str]:
+        version = self.snapshots.current()
+        if version:
+            return version, self.snapshots.path(version)
+
+        # Legacy flat layout: versioned by the index file itself
+        legacy_path = self.index_path
+        if not os.path.exists(legacy_path):
+            return None, self.snapshots.root
+
+        stat = os.stat(legacy_path)
+        return f"legacy-{stat.st_mtime_ns}-{stat.st_size}", self.snapshots.root
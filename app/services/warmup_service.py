@@ -0,0 +1,169 @@
+import time
+import threading
+
+from app.config import settings
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.cache.warmup_manifest import WarmupManifest
+from app.infrastructure.metrics.timing import span
+from app.interfaces.cache import I_Cache
+from app.interfaces.embedding import I_EmbeddingModel
+from app.services.category_classifier_service import CategoryClassifierService
+from app.services.product_attribute_service import ProductAttributeService
+from app.services.zero_shot_attribute_service import ZeroShotAttributeService
+
+
+class WarmupService:
+    """
+    Preloads what previous runs used most, so the first requests after a
+    deploy don't each pay for torch.load, index loading and first-forward
+    allocator warmup.
+
+    Steps, in order:
+        1. load the published index snapshot if none is served yet
+        2. preload the manifest's most accessed keys that fit in
+           `budget_bytes`, using the loader registered for the key prefix
+        3. run embedding.warmup(batch_sizes)
+
+    `start()` runs them on a daemon thread; `ready` turns True once they
+    finish (even if some keys failed to load — see status()).
+
+    Args:
+        manifest:   WarmupManifest recorded by the shared Cache.
+        loaders:    Key prefix (e.g. "attribute_model:") → callable(key)
+                    that loads the key into the cache. See default_loaders().
+        embedding:  Model to warm up; None skips step 3.
+        serving_index: ServingIndex to load; None skips step 1.
+    """
+
+    def __init__(
+        self,
+        manifest: WarmupManifest,
+        loaders: dict,
+        embedding: I_EmbeddingModel | None = None,
+        serving_index=None,
+        budget_bytes: int = settings.WARMUP_MEMORY_BUDGET_MB * 1024 * 1024,
+        batch_sizes: list[int] = settings.WARMUP_BATCH_SIZES,
+    ):
+        self.manifest = manifest
+        self.loaders = loaders
+        self.embedding = embedding
+        self.serving_index = serving_index
+        self.budget_bytes = budget_bytes
+        self.batch_sizes = batch_sizes
+
+        self._done = threading.Event()
+        self._status = {
+            "state": "pending",
+            "planned": 0,
+            "loaded": 0,
+            "skipped": 0,
+            "failed": [],
+            "seconds": None,
+            "error": None,
+        }
+
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, daemon=True, name="warmup")
+        thread.start()
+        return thread
+
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+
+    def status(self) -> dict:
+        return {**self._status, "failed": list(self._status["failed"])}
+
+
+    def run(self):
+        started = time.perf_counter()
+        self._status["state"] = "running"
+
+        try:
+            with span("warmup.index"):
+                self._load_index()
+
+            keys = self.manifest.plan(self.budget_bytes)
+            self._status["planned"] = len(keys)
+            with span("warmup.preload"):
+                for key in keys:
+                    self._preload(key)
+
+            if self.embedding is not None and self.batch_sizes:
+                with span("warmup.forward"):
+                    self.embedding.warmup(self.batch_sizes)
+
+            self._status["state"] = "ready"
+        except Exception as e:
+            # Serving works without warmup, just slower at first
+            self._status["state"] = "failed"
+            self._status["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            self._status["seconds"] = time.perf_counter() - started
+            self._done.set()
+
+
+    def _load_index(self):
+        if self.serving_index is None or self.serving_index.current() is not None:
+            return
+        self.serving_index.refresh()
+
+
+    def _preload(self, key: str):
+        prefix = key.split(":", 1)[0] + ":"
+        loader = self.loaders.get(prefix)
+        if loader is None:
+            self._status["skipped"] += 1
+            return
+
+        try:
+            loader(key)
+            self._status["loaded"] += 1
+        except Exception:
+            self._status["failed"].append(key)
+
+
+def default_loaders(embedding: I_EmbeddingModel, cache: I_Cache) -> dict:
+    """
+    Loaders for the keys the services load lazily through cache.get_or_load:
+    trained attribute heads, their cascade thresholds and zero-shot label
+    embedding banks.
+    """
+    attribute_service = ProductAttributeService(embedding_model=embedding, cache=cache)
+
+    def load_attribute_model(key: str):
+        _, category, attribute = key.split(":", 2)
+        attribute_service._load_attribute_model(category, attribute)
+
+    def load_attribute_threshold(key: str):
+        _, category, attribute = key.split(":", 2)
+        attribute_service.confidence_threshold(category, attribute)
+
+    loaders = {
+        "attribute_model:": load_attribute_model,
+        "attribute_threshold:": load_attribute_threshold,
+    }
+
+    if hasattr(embedding, "text_embeddings"):
+        # Label bank keys are hashed, so map them back from the known label lists
+        label_lists = [CategoryClassifierService(embedding_model=embedding).labels]
+        for attributes in ZeroShotAttributeService.ATTRIBUTE_LABELS.values():
+            label_lists.extend(attributes.values())
+
+        fingerprint = embedding.fingerprint()
+        by_key = {CacheKeys.label_embeddings(fingerprint, labels): labels for labels in label_lists}
+
+        def load_label_embeddings(key: str):
+            if key in by_key:
+                embedding.text_embeddings(by_key[key])
+
+        loaders["label_embeddings:"] = load_label_embeddings
+
+    return loaders
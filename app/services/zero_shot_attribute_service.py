@@ -1,4 +1,5 @@
 from app.interfaces.embedding import I_EmbeddingModel
+from app.infrastructure.metrics.timing import span
 
 
 class ZeroShotAttributeService:
@@ -46,16 +47,48 @@ class ZeroShotAttributeService:
         results = {}
 
         for attr_name, labels in attributes.items():
+            results[attr_name] = self.classify_attribute(img_path, labels)
+
+        return results
+
+    def classify_attribute(self, img_path: str, labels: list[str]) -> dict:
+        """Zero-shot prediction for a single attribute given its label prompts"""
+        with span("service.zero_shot_attribute"):
             attr_results = self.embedding_model.classify_img_zeroshot(
                 img_path=img_path, labels=labels
             )
 
-            # Get best match
-            best_label, confidence = attr_results[0]
+        # Get best match
+        best_label, confidence = attr_results[0]
 
-            # Clean up label text (remove "a photo of a", "a photo of an", etc.)
-            clean_label = best_label.replace("a photo of a ", "").replace("a photo of an ", "")
+        return {"value": self._clean_label(best_label), "confidence": confidence}
 
-            results[attr_name] = {"value": clean_label, "confidence": confidence}
+    def classify_batch(self, image_features, category: str) -> list[dict]:
+        """classify() for each row of embedding_model.zeroshot_image_features()."""
+        attributes = self.ATTRIBUTE_LABELS.get(category)
+
+        if not attributes:
+            raise Exception(f"No zero-shot labels defined for category: {category}")
+
+        results = [{} for _ in range(len(image_features))]
+
+        for attr_name, labels in attributes.items():
+            for row, prediction in zip(results, self.classify_attribute_batch(image_features, labels)):
+                row[attr_name] = prediction
 
         return results
+
+    def classify_attribute_batch(self, image_features, labels: list[str]) -> list[dict]:
+        with span("service.zero_shot_attribute"):
+            probs = self.embedding_model.zeroshot_probs(image_features, labels)
+        best = probs.argmax(axis=1)
+
+        return [
+            {"value": self._clean_label(labels[i]), "confidence": float(row[i])}
+            for i, row in zip(best, probs)
+        ]
+
+    @staticmethod
+    def _clean_label(label: str) -> str:
+        # Remove "a photo of a", "a photo of an", etc.
+        return label.replace("a photo of a ", "").replace("a photo of an ", "")
@@ -0,0 +1,44 @@
+# app/training/calibration.py
+import numpy as np
+
+
+def calibrate_threshold(confidences, correct, target_accuracy: float) -> dict:
+    """
+    Lowest confidence threshold at which a head's predictions are at least
+    `target_accuracy` accurate on a validation split.
+
+    Predictions are sorted by confidence; the threshold is the smallest
+    confidence whose "accept everything at or above it" set still meets the
+    target, which maximises how often the head is trusted. Returns:
+
+        {"threshold": float | None, "coverage": float, "accuracy": float,
+         "target_accuracy": float, "samples": int}
+
+    `threshold` is None when no non-empty set reaches the target — the head
+    should then never be trusted over zero-shot.
+    """
+    confidences = np.asarray(confidences, dtype=np.float64)
+    correct = np.asarray(correct, dtype=np.float64)
+    n = len(confidences)
+
+    result = {"threshold": None, "coverage": 0.0, "accuracy": 0.0, "target_accuracy": target_accuracy, "samples": n}
+    if n == 0:
+        return result
+
+    order = np.argsort(-confidences, kind="stable")
+    confidences, correct = confidences[order], correct[order]
+    accuracy = np.cumsum(correct) / np.arange(1, n + 1)
+
+    # Only cut between distinct confidences: a threshold accepts every tie
+    cut = np.append(confidences[1:] < confidences[:-1], True)
+    valid = np.where(cut & (accuracy >= target_accuracy))[0]
+    if len(valid) == 0:
+        return result
+
+    k = valid[-1]
+    result.update(
+        threshold=float(confidences[k]),
+        coverage=(k + 1) / n,
+        accuracy=float(accuracy[k]),
+    )
+    return result
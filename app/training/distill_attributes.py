@@ -0,0 +1,234 @@
+import os
+import json
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import TensorDataset
+
+from app.config import settings
+from app.interfaces.embedding import I_EmbeddingModel
+from app.infrastructure.metrics.timing import span
+from app.services.category_classifier_service import CategoryClassifierService
+from app.services.zero_shot_attribute_service import ZeroShotAttributeService
+from app.training.train_attribute import MIN_CALIBRATION_SAMPLES, calibrate_head, fit_head, save_head
+
+
+def distill_attributes(
+    embedding: I_EmbeddingModel,
+    image_paths: list[str],
+    categories: list[str] | None = None,
+    min_confidence: float = settings.DISTILL_MIN_CONFIDENCE,
+    min_class_samples: int = settings.DISTILL_MIN_CLASS_SAMPLES,
+    val_fraction: float = settings.CALIBRATION_VAL_FRACTION,
+    batch_size: int = settings.BULK_BATCH_SIZE,
+    preprocessed_store=None,
+    overwrite: bool = False,
+) -> dict:
+    """
+    Train an AttributeHead for every zero-shot attribute of `categories`
+    (default: all of ZeroShotAttributeService.ATTRIBUTE_LABELS) from
+    zero-shot pseudo-labels over the unlabelled `image_paths`.
+
+    Each image is embedded once (see collect_pseudo_labels); every head of
+    its category then trains on those embeddings. Per head, only
+    predictions at or above `min_confidence` are kept, classes with fewer
+    than `min_class_samples` of them are dropped, and a `val_fraction`
+    hold-out calibrates the cascade threshold, as in train_attribute —
+    "accuracy" there is agreement with zero-shot.
+
+    Heads are written to models/<category>/<attribute>/ as train writes
+    them, plus distill.json with the agreement metrics. Attributes whose
+    head was trained on labelled data (model.pt without distill.json) are
+    left alone unless `overwrite`.
+
+    Returns {"<category>/<attribute>": metrics}, or {"skipped": reason}
+    for heads that weren't written.
+    """
+    categories = categories or sorted(ZeroShotAttributeService.ATTRIBUTE_LABELS)
+    unknown = sorted(set(categories) - set(ZeroShotAttributeService.ATTRIBUTE_LABELS))
+    if unknown:
+        raise ValueError(f"No zero-shot labels for categories: {unknown}")
+    catalog = collect_pseudo_labels(embedding, image_paths, categories, min_confidence, batch_size, preprocessed_store)
+
+    if preprocessed_store is not None:
+        preprocessed_store.flush()
+
+    results = {}
+    for category in categories:
+        samples = catalog[category]
+
+        for attribute, labels in ZeroShotAttributeService.ATTRIBUTE_LABELS[category].items():
+            model_dir = f"models/{category}/{attribute}"
+
+            if not overwrite and _trained_on_labels(model_dir):
+                results[f"{category}/{attribute}"] = {"skipped": "trained on labelled data (--overwrite replaces it)"}
+            elif not samples["embeddings"]:
+                results[f"{category}/{attribute}"] = {"skipped": "no catalog images of this category"}
+            else:
+                with span("distill.head"):
+                    results[f"{category}/{attribute}"] = distill_head(
+                        model_dir,
+                        np.concatenate(samples["embeddings"]),
+                        samples["values"][attribute],
+                        np.array(samples["confidences"][attribute], dtype="float32"),
+                        [ZeroShotAttributeService._clean_label(label) for label in labels],
+                        min_confidence,
+                        min_class_samples,
+                        val_fraction,
+                    )
+
+    return results
+
+
+def collect_pseudo_labels(
+    embedding: I_EmbeddingModel,
+    image_paths: list[str],
+    categories: list[str],
+    min_confidence: float,
+    batch_size: int,
+    preprocessed_store=None,
+) -> dict:
+    """
+    Per category: the head-input embeddings of the images confidently
+    assigned to it, and every attribute's zero-shot value and confidence
+    for them, row-aligned:
+
+        {category: {"embeddings": [(n, dim) arrays], "values": {attribute: [str]},
+                    "confidences": {attribute: [float]}}}
+
+    Per batch: one zero-shot image forward scores the category and every
+    label set, and one preprocessed forward gives the embeddings the heads
+    consume (the zero-shot features are reused when the model has no
+    preprocessor). Images PIL can't open are skipped with a warning.
+    """
+    category_service = CategoryClassifierService(embedding_model=embedding)
+    zero_shot = ZeroShotAttributeService(embedding_model=embedding)
+    catalog = {
+        category: {
+            "embeddings": [],
+            "values": {a: [] for a in ZeroShotAttributeService.ATTRIBUTE_LABELS[category]},
+            "confidences": {a: [] for a in ZeroShotAttributeService.ATTRIBUTE_LABELS[category]},
+        }
+        for category in categories
+    }
+
+    for start in range(0, len(image_paths), batch_size):
+        paths = _readable(image_paths[start:start + batch_size])
+        if paths:
+            with span("distill.zeroshot_forward"):
+                features = embedding.zeroshot_image_features(paths)
+
+            if getattr(embedding, "preprocessor", None) is None:
+                embeddings = features
+            else:
+                with span("distill.embed_forward"):
+                    embeddings = embedding.encode_images(paths, preprocessed_store=preprocessed_store)
+
+            assigned = category_service.classify_batch(features)
+            for category, samples in catalog.items():
+                rows = [i for i, (c, confidence) in enumerate(assigned) if c == category and confidence >= min_confidence]
+                if not rows:
+                    continue
+
+                samples["embeddings"].append(np.asarray(embeddings[rows], dtype="float32"))
+                for attribute, labels in ZeroShotAttributeService.ATTRIBUTE_LABELS[category].items():
+                    for prediction in zero_shot.classify_attribute_batch(features[rows], labels):
+                        samples["values"][attribute].append(prediction["value"])
+                        samples["confidences"][attribute].append(prediction["confidence"])
+
+        print(f"Scored {min(start + batch_size, len(image_paths))}/{len(image_paths)} images")
+
+    return catalog
+
+
+def distill_head(
+    model_dir: str,
+    embeddings: np.ndarray,
+    values: list[str],
+    confidences: np.ndarray,
+    classes: list[str],
+    min_confidence: float,
+    min_class_samples: int,
+    val_fraction: float,
+) -> dict:
+    """Train and write one head from a category's pseudo-labels. Returns its metrics."""
+    values = np.array(values)
+    kept = confidences >= min_confidence
+    class_counts = {c: int(np.sum(kept & (values == c))) for c in classes}
+
+    retained = [c for c in classes if class_counts[c] >= min_class_samples]
+    if len(retained) < 2:
+        return {
+            "skipped": f"{len(retained)} class(es) with {min_class_samples}+ confident predictions",
+            "class_counts": class_counts,
+        }
+
+    rows = np.where(kept & np.isin(values, retained))[0]
+    class_to_idx = {c: i for i, c in enumerate(retained)}
+    x = torch.from_numpy(embeddings[rows])
+    y = torch.tensor([class_to_idx[v] for v in values[rows]], dtype=torch.long)
+
+    order = torch.randperm(len(rows), generator=torch.Generator().manual_seed(0))
+    val_size = int(len(rows) * val_fraction)
+    if val_size >= MIN_CALIBRATION_SAMPLES:
+        val, train = order[:val_size], order[val_size:]
+    else:
+        val, train = None, order
+
+    device = settings.DEVICE
+    model = fit_head(
+        TensorDataset(x[train], y[train]),
+        len(retained),
+        device,
+        epochs=settings.DISTILL_EPOCHS,
+        lr=settings.DISTILL_LR,
+        batch_size=64,
+    )
+    calibration = calibrate_head(model, TensorDataset(x[val], y[val]), device) if val is not None else None
+
+    with torch.no_grad():
+        predicted = model(torch.from_numpy(embeddings).to(device)).argmax(dim=1).cpu().numpy()
+    head_values = np.array(retained)[predicted]
+    # Images whose zero-shot value is one the head can output, confident or not
+    comparable = np.isin(values, retained)
+
+    metrics = {
+        "images": len(values),
+        "pseudo_labels": len(rows),
+        "min_confidence": min_confidence,
+        "class_counts": class_counts,
+        "classes": retained,
+        # Head vs zero-shot on pseudo-labels the head never trained on
+        "heldout_agreement": float((predicted[rows[val.numpy()]] == y[val].numpy()).mean()) if val is not None else None,
+        # Head vs zero-shot on every comparable image of the category
+        "agreement": float((head_values[comparable] == values[comparable]).mean()),
+        "calibration": calibration,
+    }
+
+    save_head(model_dir, model, dict(enumerate(retained)), calibration)
+    with open(os.path.join(model_dir, "distill.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+
+    return metrics
+
+
+def _trained_on_labels(model_dir: str) -> bool:
+    return os.path.exists(os.path.join(model_dir, "model.pt")) and not os.path.exists(
+        os.path.join(model_dir, "distill.json")
+    )
+
+
+def _readable(paths: list[str]) -> list[str]:
+    """`paths` minus the images PIL can't open, which are skipped with a warning."""
+    readable = []
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except Exception as e:
+            print(f"Warning: skipping {path}: {type(e).__name__}: {e}")
+            continue
+        readable.append(path)
+
+    return readable
@@ -1,12 +1,20 @@
 import os
+import json
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, random_split
 
 
+from app.config import settings
 from app.infrastructure.embedding.clip_model import ClipEmbeddingModel
 from app.models.attribute_head import AttributeHead
+from app.models.numpy_attribute_head import export_head
+from app.services.result_cache_service import ResultCacheService
+from app.training.calibration import calibrate_threshold
+
+# Below this many held-out samples a calibrated threshold is just noise
+MIN_CALIBRATION_SAMPLES = 10
 
 
 class DirAttributeDataset(Dataset):
@@ -14,10 +22,14 @@ class DirAttributeDataset(Dataset):
     Dataset that loads images from:
 
     data/training/<category>/<attribute>/<class_name>/*.jpg
+
+    `embedding` defaults to a bare ClipEmbeddingModel (no preprocessor).
+    With `preprocessed_store`, preprocessed images are read from / added to it.
     """
 
-    def __init__(self, base_path: str):
-        self.clip_model = ClipEmbeddingModel()
+    def __init__(self, base_path: str, embedding=None, preprocessed_store=None):
+        self.clip_model = embedding if embedding is not None else ClipEmbeddingModel()
+        self.preprocessed_store = preprocessed_store
         self.samples = []
         self.class_to_idx = {}
 
@@ -37,28 +49,80 @@ class DirAttributeDataset(Dataset):
 
     def __getitem__(self, idx):
         img_path, label = self.samples[idx]
-        embedding = self.clip_model.encode_image(img_path)
+        embedding = self.clip_model.encode_image(img_path, preprocessed_store=self.preprocessed_store)
         embedding = torch.tensor(embedding, dtype=torch.float32)
 
         return embedding, label
 
 
-def train_attribute(category: str, attribute: str):
+def train_attribute(
+    category: str,
+    attribute: str,
+    embedding=None,
+    preprocessed_store=None,
+    val_fraction: float = settings.CALIBRATION_VAL_FRACTION,
+):
+    """
+    Train the head on `1 - val_fraction` of the samples and calibrate its
+    cascade confidence threshold on the rest (skipped when the hold-out
+    would be smaller than MIN_CALIBRATION_SAMPLES; the head then trains on
+    everything and the cascade uses the default threshold).
+    """
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
     base_path = f"data/training/{category}/{attribute}"
 
-    dataset = DirAttributeDataset(base_path=base_path)
-    dataloader = DataLoader(dataset=dataset, batch_size=8, shuffle=True)
+    dataset = DirAttributeDataset(
+        base_path=base_path, embedding=embedding, preprocessed_store=preprocessed_store
+    )
+
+    val_size = int(len(dataset) * val_fraction)
+    if val_size >= MIN_CALIBRATION_SAMPLES:
+        train_set, val_set = random_split(
+            dataset, [len(dataset) - val_size, val_size], generator=torch.Generator().manual_seed(0)
+        )
+    else:
+        train_set, val_set = dataset, None
 
     num_classes = len(dataset.class_to_idx)
+    model = fit_head(train_set, num_classes, device)
 
-    model = AttributeHead(embedding_dim=512, num_classes=num_classes).to(device=device)
+    if preprocessed_store is not None:
+        preprocessed_store.flush()
 
-    criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=1e-4)
+    calibration = calibrate_head(model, val_set, device) if val_set is not None else None
+
+    # Save class mapping as idx->class_name for inference
+    idx_to_class = {i: cls for cls, i in dataset.class_to_idx.items()}
+    model_dir = save_head(f"models/{category}/{attribute}", model, idx_to_class, calibration)
+
+    if calibration is not None:
+        print(
+            f"Calibrated threshold: {calibration['threshold']} "
+            f"(accuracy {calibration['accuracy']:.2f} on {calibration['coverage']:.0%} "
+            f"of {calibration['samples']} validation samples)"
+        )
+
+    print(f"Saved model to {os.path.join(model_dir, 'model.pt')}")
+    print(f"Saved classes to {os.path.join(model_dir, 'classes.json')}")
+    print("Class mapping:", dataset.class_to_idx)
+
+
+def fit_head(
+    train_set: Dataset,
+    num_classes: int,
+    device,
+    epochs: int = 10,
+    lr: float = 1e-4,
+    batch_size: int = 8,
+) -> AttributeHead:
+    """Train an AttributeHead on (embedding, label index) samples."""
+    dataloader = DataLoader(dataset=train_set, batch_size=batch_size, shuffle=True)
 
-    epochs = 10
+    model = AttributeHead(embedding_dim=settings.EMBEDDING_DIM, num_classes=num_classes).to(device=device)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=lr)
 
     for epoch in range(epochs):
         total_loss = 0
@@ -77,25 +141,55 @@ def train_attribute(category: str, attribute: str):
 
         print(f"Epoch {epoch+1}/{epochs} | Loss: {total_loss:.4f}")
 
-    # save model
-    import json
+    model.eval()
+    return model
 
-    model_dir = f"models/{category}/{attribute}"
+
+def save_head(model_dir: str, model: AttributeHead, idx_to_class: dict, calibration: dict | None) -> str:
+    """
+    Write a head in the layout ProductAttributeService loads: model.pt,
+    its torch-free model.npz export, classes.json and, when calibrated,
+    calibration.json. Returns `model_dir`.
+    """
     os.makedirs(model_dir, exist_ok=True)
 
-    model_path = os.path.join(model_dir, "model.pt")
-    classes_path = os.path.join(model_dir, "classes.json")
+    torch.save(model.state_dict(), os.path.join(model_dir, "model.pt"))
+    export_head(model_dir, model)
 
-    torch.save(model.state_dict(), model_path)
+    calibration_path = os.path.join(model_dir, "calibration.json")
+    if calibration is not None:
+        with open(calibration_path, "w") as f:
+            json.dump(calibration, f, indent=2)
+    elif os.path.exists(calibration_path):
+        # A stale calibration belongs to the previous head
+        os.remove(calibration_path)
 
-    # Save class mapping as idx->class_name for inference
-    idx_to_class = {i: cls for cls, i in dataset.class_to_idx.items()}
-    with open(classes_path, "w") as f:
+    # Online feedback was applied to the previous head; replay it onto this one
+    feedback_path = os.path.join(model_dir, "feedback.json")
+    if os.path.exists(feedback_path):
+        os.remove(feedback_path)
+
+    with open(os.path.join(model_dir, "classes.json"), "w") as f:
         json.dump(idx_to_class, f, indent=2)
 
-    print(f"Saved model to {model_path}")
-    print(f"Saved classes to {classes_path}")
-    print("Class mapping:", dataset.class_to_idx)
+    # models/<category>/<attribute>: cached classify results of this process go stale now
+    ResultCacheService.models_changed(os.path.dirname(os.path.dirname(model_dir)))
+    return model_dir
+
+
+def calibrate_head(model, val_set, device) -> dict:
+    """calibrate_threshold() of the head's predictions on (embedding, label index) samples."""
+    model.eval()
+    confidences, correct = [], []
+
+    with torch.no_grad():
+        for embeddings, labels in DataLoader(dataset=val_set, batch_size=64):
+            probs = torch.softmax(model(embeddings.to(device)), dim=1)
+            confidence, predicted = probs.max(dim=1)
+            confidences.extend(confidence.cpu().tolist())
+            correct.extend((predicted.cpu() == labels).tolist())
+
+    return calibrate_threshold(confidences, correct, settings.CASCADE_TARGET_ACCURACY)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,59 @@
+import os
+import json
+import contextlib
+
+from benchmarks.harness import measure, skipped
+from benchmarks.synthetic import write_product_images
+
+
+ATTRIBUTES = {"color": 8, "gender": 3, "age_group": 2, "type": 4}
+
+
+@contextlib.contextmanager
+def _chdir(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _write_heads(models_dir: str, category: str):
+    """Random AttributeHeads in the models/<category>/<attribute>/ layout."""
+    import torch
+    from app.models.attribute_head import AttributeHead
+
+    torch.manual_seed(0)
+    for attribute, num_classes in ATTRIBUTES.items():
+        base = os.path.join(models_dir, category, attribute)
+        os.makedirs(base, exist_ok=True)
+        torch.save(AttributeHead(512, num_classes).state_dict(), os.path.join(base, "model.pt"))
+        with open(os.path.join(base, "classes.json"), "w") as f:
+            json.dump({i: f"{attribute}_{i}" for i in range(num_classes)}, f)
+
+
+def run(args) -> dict:
+    try:
+        from app.infrastructure.cache.chache import Cache
+        from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+        from app.services.product_attribute_service import ProductAttributeService
+    except ImportError as e:
+        return {"classify.trained": skipped(f"torch unavailable: {e}")}
+
+    workdir = os.path.abspath(f"{args.workdir}/classify")
+    paths = [os.path.abspath(p) for p in write_product_images(f"{workdir}/images", 16, seed=args.seed)]
+    _write_heads(os.path.join(workdir, "models"), "shoe")
+
+    service = ProductAttributeService(embedding_model=DummyEmbeddingModel(), cache=Cache())
+    iterations = 20 if args.quick else 200
+    counter = iter(range(10**9))
+
+    # The service resolves models/<category> relative to the working directory
+    with _chdir(workdir):
+        return {
+            f"classify.trained.{len(ATTRIBUTES)}heads": measure(
+                lambda: service.classify(paths[next(counter) % len(paths)], category="shoe"),
+                iterations,
+            )
+        }
@@ -0,0 +1,39 @@
+from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+from app.infrastructure.preprocessing.passthrough_preprocessor import PassthroughPreprocessor
+from benchmarks.harness import measure, skipped
+from benchmarks.synthetic import write_product_images
+
+
+BATCH_SIZE = 32
+
+
+def run(args) -> dict:
+    paths = write_product_images(f"{args.workdir}/embedding", BATCH_SIZE, seed=args.seed)
+    iterations = 5 if args.quick else 30
+    results = {}
+
+    models = {"dummy": DummyEmbeddingModel(preprocessor=PassthroughPreprocessor())}
+
+    if args.clip:
+        try:
+            from app.infrastructure.embedding.clip_model import ClipEmbeddingModel
+
+            models["clip"] = ClipEmbeddingModel(preprocessor=PassthroughPreprocessor())
+        except Exception as e:
+            results["embed.clip.single"] = skipped(f"CLIP unavailable: {e}")
+
+    for name, model in models.items():
+        results[f"embed.{name}.single"] = measure(
+            lambda: [model.encode_image(p) for p in paths],
+            iterations,
+            warmup=1,
+            items_per_call=len(paths),
+        )
+        results[f"embed.{name}.batch{BATCH_SIZE}"] = measure(
+            lambda: model.encode_images(paths),
+            iterations,
+            warmup=1,
+            items_per_call=len(paths),
+        )
+
+    return results
@@ -0,0 +1,44 @@
+from app.infrastructure.preprocessing.passthrough_preprocessor import PassthroughPreprocessor
+from benchmarks.harness import measure, skipped
+from benchmarks.synthetic import make_product_images
+
+
+def run(args) -> dict:
+    images = make_product_images(32, seed=args.seed)
+    iterations = 20 if args.quick else 200
+    results = {}
+
+    def cycle(preprocessor):
+        counter = iter(range(10**9))
+        return lambda: preprocessor.preprocess(images[next(counter) % len(images)])
+
+    results["preprocess.passthrough"] = measure(cycle(PassthroughPreprocessor()), iterations)
+
+    try:
+        from app.infrastructure.preprocessing.adaptive_preprocessor import AdaptivePreprocessor
+
+        adaptive = AdaptivePreprocessor()
+    except Exception as e:
+        results["preprocess.adaptive_clean"] = skipped(f"rembg unavailable ({type(e).__name__})")
+    else:
+        # Studio shots only: the threshold path, which never loads the segmentation model
+        clean = [img for img in images if adaptive.background_color(img) is not None]
+        counter = iter(range(10**9))
+        results["preprocess.adaptive_clean"] = measure(
+            lambda: adaptive.preprocess(clean[next(counter) % len(clean)]), iterations
+        )
+
+    try:
+        from app.infrastructure.preprocessing.rembg_preprocessor import RembgPreprocessor
+
+        rembg = RembgPreprocessor()
+        rembg.preprocess(images[0])  # downloads / loads the segmentation model
+    except Exception as e:
+        results["preprocess.rembg"] = skipped(f"rembg unavailable ({type(e).__name__})")
+        results["preprocess.adaptive"] = skipped(f"rembg unavailable ({type(e).__name__})")
+    else:
+        results["preprocess.rembg"] = measure(cycle(rembg), max(iterations // 10, 5), warmup=1)
+        # Mixed clean/cluttered catalog (see synthetic.make_product_images)
+        results["preprocess.adaptive"] = measure(cycle(AdaptivePreprocessor()), max(iterations // 10, 5), warmup=1)
+
+    return results
@@ -0,0 +1,38 @@
+from app.config import settings
+from benchmarks.harness import measure, skipped
+from benchmarks.synthetic import make_vectors
+
+
+def run(args) -> dict:
+    from app.infrastructure.vector_store.in_memory_store import NumpyVectorStore
+
+    backends = {
+        "numpy.float32": lambda: NumpyVectorStore(dtype="float32"),
+        "numpy.float16": lambda: NumpyVectorStore(dtype="float16"),
+    }
+    results = {}
+    try:
+        from app.infrastructure.vector_store.faiss_store import FaissVectorStore
+
+        backends["faiss"] = FaissVectorStore
+    except ImportError as e:
+        results["search.faiss"] = skipped(f"faiss unavailable: {e}")
+
+    iterations = 20 if args.quick else 200
+    queries = make_vectors(64, settings.EMBEDDING_DIM, seed=args.seed + 1)
+
+    for size in args.sizes:
+        vectors = make_vectors(size, settings.EMBEDDING_DIM, seed=args.seed)
+        for backend, make_store in backends.items():
+            store = make_store()
+            store.add(list(range(size)), vectors)
+
+            counter = iter(range(10**9))
+            name = f"search.faiss.{store.index_type}" if backend == "faiss" else f"search.{backend}"
+            results[f"{name}.{size}"] = measure(
+                lambda: store.search(queries[next(counter) % len(queries)], settings.TOP_K),
+                iterations,
+            )
+            del store
+
+    return results
@@ -0,0 +1,76 @@
+"""
+Thread topology under concurrent load: a CLIP-sized transformer forward
+plus a FAISS search per request, issued from several threads at once,
+with the libraries' default thread pools vs the latency and throughput
+plans of app/infrastructure/runtime/thread_topology.py.
+
+On a single core every topology is the same; the gap grows with the
+core count.
+"""
+
+from app.config import settings
+from benchmarks.harness import measure_concurrent, skipped
+from benchmarks.synthetic import make_vectors
+
+
+INDEX_SIZE = 100_000
+SEQUENCE_LENGTH = 50  # ViT-B/32: 7×7 patches + class token
+
+
+def run(args) -> dict:
+    try:
+        import torch
+        import faiss
+        from app.infrastructure.runtime.thread_topology import (
+            ThreadBudget,
+            available_cores,
+            plan_threads,
+            thread_topology,
+        )
+    except ImportError as e:
+        return {"threads": skipped(f"torch/faiss unavailable: {e}")}
+
+    cores = available_cores()
+    concurrency = max(2, cores // 2)
+    iterations = 20 if args.quick else 200
+
+    torch.manual_seed(args.seed)
+    layer = torch.nn.TransformerEncoderLayer(d_model=768, nhead=12, dim_feedforward=3072, batch_first=True)
+    encoder = torch.nn.TransformerEncoder(layer, num_layers=2, enable_nested_tensor=False).eval()
+    tokens = torch.randn(1, SEQUENCE_LENGTH, 768)
+
+    index = faiss.IndexFlatIP(settings.EMBEDDING_DIM)
+    index.add(make_vectors(2_000 if args.quick else INDEX_SIZE, settings.EMBEDDING_DIM, seed=args.seed))
+    query = make_vectors(1, settings.EMBEDDING_DIM, seed=args.seed + 1)
+
+    def request():
+        with torch.no_grad():
+            encoder(tokens)
+        index.search(query, settings.TOP_K)
+
+    defaults = ThreadBudget(
+        torch=torch.get_num_threads(),
+        torch_interop=torch.get_num_interop_threads(),
+        onnx=cores,
+        onnx_inter=cores,
+        faiss=faiss.omp_get_max_threads(),
+        spin=True,
+    )
+    topologies = {
+        "default": defaults,
+        "latency": plan_threads("latency", cores=cores),
+        "throughput": plan_threads("throughput", cores=cores, concurrency=concurrency),
+    }
+
+    results = {}
+    try:
+        for name, budget in topologies.items():
+            thread_topology.apply(budget)
+            for n in (1, concurrency):
+                results[f"threads.{name}.c{n}"] = measure_concurrent(request, iterations, n, warmup=2)
+    finally:
+        # Later suites run with the pools they would have had
+        thread_topology.apply(defaults)
+        thread_topology.budget = None
+
+    return results
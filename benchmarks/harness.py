@@ -0,0 +1,140 @@
+"""
+Timing and result bookkeeping shared by all benchmark suites.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def measure(fn, iterations: int, warmup: int = 3, items_per_call: int = 1) -> dict:
+    """
+    Call `fn` `warmup` times untimed, then `iterations` times timed.
+
+    Returns throughput (items/s, where each call handles `items_per_call`
+    items) and per-call latency percentiles in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "iterations": iterations,
+        "items_per_call": items_per_call,
+        "throughput": iterations * items_per_call / elapsed,
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def measure_concurrent(fn, iterations: int, concurrency: int, warmup: int = 3, items_per_call: int = 1) -> dict:
+    """
+    Like measure(), but `iterations` calls are issued from `concurrency`
+    threads at once, as concurrent requests would be. Latency is per call;
+    throughput is over the whole run.
+    """
+    def timed():
+        t0 = time.perf_counter()
+        fn()
+        return time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: fn(), range(warmup * concurrency)))
+
+        started = time.perf_counter()
+        latencies = list(pool.map(lambda _: timed(), range(iterations)))
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "iterations": iterations,
+        "items_per_call": items_per_call,
+        "concurrency": concurrency,
+        "throughput": iterations * items_per_call / elapsed,
+        "mean_ms": float(latencies_ms.mean()),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def skipped(reason: str) -> dict:
+    return {"skipped": reason}
+
+
+def environment() -> dict:
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    try:
+        import faiss
+
+        meta["faiss"] = faiss.__version__
+    except ImportError:
+        pass
+    return meta
+
+
+def save(results: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"meta": environment(), "results": results}, f, indent=2)
+
+
+def load(path: str) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)["results"]
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.1) -> list[str]:
+    """
+    Return a message per benchmark whose p50 latency rose, or whose
+    throughput fell, by more than `tolerance` (0.1 = 10%) vs `baseline`.
+    """
+    regressions = []
+
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before or "skipped" in result or "skipped" in before:
+            continue
+
+        if result["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p50 {before['p50_ms']:.3f} ms → {result['p50_ms']:.3f} ms"
+            )
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput']:.1f}/s → {result['throughput']:.1f}/s"
+            )
+
+    return regressions
+
+
+def format_table(results: dict) -> str:
+    lines = [f"{'benchmark':<48} {'throughput/s':>14} {'p50 ms':>10} {'p99 ms':>10}"]
+    for name, r in results.items():
+        if "skipped" in r:
+            lines.append(f"{name:<48} skipped: {r['skipped']}")
+        else:
+            lines.append(
+                f"{name:<48} {r['throughput']:>14.1f} {r['p50_ms']:>10.3f} {r['p99_ms']:>10.3f}"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,71 @@
+"""
+Offline benchmark suite for the preprocessing, embedding, search and
+classification hot paths, and the native thread topology.
+
+Usage:
+    python -m benchmarks.run                                   # full run
+    python -m benchmarks.run --quick --sizes 10000             # smoke run
+    python -m benchmarks.run --output bench/new.json --baseline bench/old.json
+
+Results are written as JSON. With --baseline, any benchmark whose p50
+latency rose (or throughput fell) by more than --tolerance is reported
+and the process exits with status 1.
+"""
+
+import sys
+import argparse
+import tempfile
+
+from benchmarks import bench_classify, bench_embedding, bench_preprocessing, bench_search, bench_threads
+from benchmarks.harness import compare, format_table, load, save
+
+
+SUITES = {
+    "preprocessing": bench_preprocessing,
+    "embedding": bench_embedding,
+    "search": bench_search,
+    "classify": bench_classify,
+    "threads": bench_threads,
+}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000],
+                        help="Index sizes for the search suite")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations (smoke test)")
+    parser.add_argument("--clip", action="store_true", help="Also benchmark the real CLIP model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed relative slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        for name in args.suites:
+            print(f"Running {name} benchmarks...")
+            results.update(SUITES[name].run(args))
+
+    print()
+    print(format_table(results))
+    save(results, args.output)
+    print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, load(args.baseline), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline}:")
+            for r in regressions:
+                print(f"  - {r}")
+            return 1
+        print(f"\nNo regressions vs {args.baseline}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
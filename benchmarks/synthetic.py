@@ -0,0 +1,64 @@
+"""
+Synthetic product photos for benchmarks.
+
+Images are generated from a seed, so every run measures exactly the same
+inputs: a coloured "product" (ellipse or rounded box) on either a clean
+studio background or a noisy, textured one.
+"""
+
+import os
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+SIZES = [(640, 480), (800, 800), (480, 720), (1024, 768)]
+
+
+def make_product_image(rng: np.random.Generator, clean: bool = True) -> Image.Image:
+    width, height = SIZES[rng.integers(len(SIZES))]
+
+    if clean:
+        img = Image.new("RGB", (width, height), (255, 255, 255))
+    else:
+        noise = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+        img = Image.fromarray(noise).resize((width, height), Image.BILINEAR)
+
+    draw = ImageDraw.Draw(img)
+    w = int(width * rng.uniform(0.3, 0.7))
+    h = int(height * rng.uniform(0.3, 0.7))
+    left = int(rng.integers(0, width - w))
+    top = int(rng.integers(0, height - h))
+    color = tuple(int(c) for c in rng.integers(0, 200, 3))
+
+    if rng.random() < 0.5:
+        draw.ellipse((left, top, left + w, top + h), fill=color)
+    else:
+        draw.rounded_rectangle((left, top, left + w, top + h), radius=min(w, h) // 5, fill=color)
+
+    return img
+
+
+def make_product_images(count: int, seed: int = 0, clean_fraction: float = 0.7) -> list[Image.Image]:
+    rng = np.random.default_rng(seed)
+    return [make_product_image(rng, clean=rng.random() < clean_fraction) for _ in range(count)]
+
+
+def write_product_images(directory: str, count: int, seed: int = 0) -> list[str]:
+    """Write `count` synthetic JPEGs to `directory` and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for i, img in enumerate(make_product_images(count, seed=seed)):
+        path = os.path.join(directory, f"product_{i:05d}.jpg")
+        img.save(path, quality=90)
+        paths.append(path)
+
+    return paths
+
+
+def make_vectors(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """L2-normalised float32 vectors, like CLIP embeddings."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimension), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
@@ -2,6 +2,7 @@ from typing import Literal
 
 from cli.message import Message
 from app.interfaces.cache import I_Cache
+from app.services.result_cache_service import ResultCacheService
 
 Msg = Message()
 
@@ -11,6 +12,7 @@ def run_cache(
     *,
     sub_command: Literal["list", "clear", "delete", "info"] | None = None,
     key: str | None = None,
+    result_cache: ResultCacheService | None = None,
 ) -> None:
     """
     Inspect or manage the in-memory cache.
@@ -18,11 +20,12 @@ def run_cache(
     Subcommands:
     - list: List all cache keys
     - clear: Clear all cache entries
-    - delete: Delete a specific cache key (requires --key)
-    - info (default): Show cache status
+    - delete: Delete a specific cache key (requires --key); a key ending
+              in "*" deletes every key with that prefix
+    - info (default): Show cache status (and query/classify result hit ratio)
     """
     if sub_command == "clear":
-        count = len(cache.keys())
+        count = cache.count()
         cache.clear()
         print(Msg.info(f"Cleared {count} cache entries."))
 
@@ -38,7 +41,10 @@ def run_cache(
             print(Msg.info("Usage: cache delete --key <cache_key>"))
             return
 
-        if key in cache.keys():
+        if key.endswith("*"):
+            count = cache.delete_prefix(key[:-1])
+            print(Msg.info(f"Deleted {count} cache keys matching: {key}"))
+        elif cache.contains(key):
             cache.delete(key)
             print(Msg.info(f"Deleted cache key: {key}"))
         else:
@@ -50,3 +56,10 @@ def run_cache(
         print (Msg.neutral(f'\tNumber of entries: {info["num_entries"]}'))
         print(Msg.neutral(f'\tSpace taken: {info["size"]} (it\'s not the most accurate, but this\'ll do)'))
 
+        if result_cache:
+            stats = result_cache.stats()
+            print(Msg.neutral(
+                f'\tResult cache: {stats["hits"]} hits / {stats["misses"]} misses '
+                f'(hit ratio {stats["hit_ratio"]:.1%})'
+            ))
+
@@ -1,41 +1,116 @@
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.services.cascade_attribute_service import CascadeAttributeService
 from app.services.category_classifier_service import CategoryClassifierService
 from app.services.product_attribute_service import ProductAttributeService
+from app.services.result_cache_service import ResultCacheService
 from app.services.zero_shot_attribute_service import ZeroShotAttributeService
 from cli.message import Message
 
 
 Msg = Message()
 
-def run_classify(embedding, cache, img_path: str, use_trained: bool = False) -> None:
+def run_classify(
+    embedding,
+    cache,
+    img_path: str,
+    use_trained: bool = False,
+    result_cache: ResultCacheService | None = None,
+    cascade: bool = False,
+) -> None:
     """
     Classify the category and attributes of the product image at `img_path`.
 
     When `use_trained` is True, attempts to use fine-tuned attribute models and
     falls back to zero-shot if they are unavailable.
+
+    With `cascade`, trained heads run first and zero-shot only covers the
+    attributes without a head or below the head's calibrated threshold.
+
+    With `result_cache`, results are memoised by image content, model
+    fingerprint, mode and the version of the trained heads on disk.
+    """
+    if cascade:
+        print(Msg.highlight("\nUsing trained → zero-shot cascade for attributes..."))
+    elif use_trained:
+        print(Msg.highlight("\nUsing trained models for attribute classification..."))
+    else:
+        print(Msg.highlight("\nUsing zero-shot classification for attributes..."))
+
+    if result_cache is None:
+        category, cat_conf, attributes = classify(embedding, cache, img_path, use_trained, cascade)
+    else:
+        models_version = result_cache.models_version()
+        result_cache.track_version(
+            "models",
+            models_version,
+            ResultCacheService.CLASSIFY_PREFIX,
+            "attribute_model:",
+            "attribute_threshold:",
+        )
+
+        key = CacheKeys.classify_result(
+            content_hash=CacheKeys.content_hash(img_path),
+            fingerprint=embedding.fingerprint(),
+            use_trained=use_trained,
+            models_version=models_version,
+            cascade=cascade,
+        )
+        (category, cat_conf, attributes), cached = result_cache.get_or_compute(
+            key, lambda: classify(embedding, cache, img_path, use_trained, cascade)
+        )
+        if cached:
+            print(Msg.neutral("(cached result)"))
+
+    print(f"Category: {category} (confidence {cat_conf:.2f})")
+
+    print(Msg.info("\nAttributes:"))
+    for attr_name, info in attributes.items():
+        source = f", {info['source']}" if "source" in info else ""
+        print(f" - {attr_name}: {info['value']} (confidence {info['confidence']:.2f}{source})")
+
+
+def classify(
+    embedding,
+    cache,
+    img_path: str,
+    use_trained: bool,
+    cascade: bool = False,
+    zero_shot: bool = True,
+) -> tuple:
+    """
+    Return (category, category confidence, attributes) for `img_path`.
+
+    Without `zero_shot` (load shedding), attributes come from trained heads
+    only, and are empty when the mode or category has none.
     """
     category_service = CategoryClassifierService(embedding_model=embedding)
     category, cat_conf = category_service.classify(img_path)
-    print(f"Category: {category} (confidence {cat_conf:.2f})")
+
+    if cascade:
+        attribute_service = CascadeAttributeService(embedding_model=embedding, cache=cache)
+        return category, cat_conf, attribute_service.classify(img_path, category=category, zero_shot=zero_shot)
+
+    if not zero_shot:
+        trained = ProductAttributeService(embedding_model=embedding, cache=cache)
+        if use_trained and trained.trained_attributes(category):
+            return category, cat_conf, trained.classify(img_path, category=category)
+        return category, cat_conf, {}
 
     attribute_service = _build_attribute_service(
         embedding, cache, category, use_trained
     )
     attributes = attribute_service.classify(img_path, category=category)
 
-    print(Msg.info("\nAttributes:"))
-    for attr_name, info in attributes.items():
-        print(f" - {attr_name}: {info['value']} (confidence {info['confidence']:.2f})")
+    return category, cat_conf, attributes
 
 
 def _build_attribute_service(embedding, cache, category: str, use_trained: bool):
     """Return the appropriate attribute service, with fallback logic."""
     if use_trained:
-        print(Msg.highlight("\nUsing trained models for attribute classification..."))
         try:
             return ProductAttributeService(embedding_model=embedding, cache=cache)
         except Exception as e:
             print(Msg.alert(f"Error loading trained models: {e}"))
             print(Msg.alert("Falling back to zero-shot classification..."))
 
-    print(Msg.highlight("\nUsing zero-shot classification for attributes..."))
     return ZeroShotAttributeService(embedding_model=embedding)
@@ -0,0 +1,61 @@
+import os
+
+from app.services.bulk_classify_service import BulkClassifyService
+from cli.message import Message
+
+
+Msg = Message()
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def run_classify_bulk(service: BulkClassifyService, image_dir: str | None = None, list_path: str | None = None) -> dict:
+    """
+    Classify every image in `image_dir` (recursively) or listed in
+    `list_path` (one path per line) into the service's repository.
+
+    Paths are streamed, never collected up front, and images already
+    classified with the same mode, model and heads are skipped, so an
+    interrupted run resumes where it stopped when started again.
+    """
+    if bool(image_dir) == bool(list_path):
+        print(Msg.alert("Provide exactly one of --dir or --list"))
+        return {}
+
+    paths = _walk(image_dir) if image_dir else _read_list(list_path)
+
+    def progress(stats):
+        rate = stats["classified"] / stats["seconds"] if stats["seconds"] else 0.0
+        print(Msg.neutral(
+            f"\rclassified {stats['classified']}, skipped {stats['skipped']}, "
+            f"failed {len(stats['failed'])} ({rate:.1f} img/s)"
+        ), end="", flush=True)
+
+    print(Msg.highlight(f"Classifying in {service.mode} mode, batches of {service.batch_size}"))
+    stats = service.run(paths, on_batch=progress)
+    print()
+
+    for path, error in stats["failed"]:
+        print(Msg.alert(f"Failed: {path}: {error}"))
+
+    print(Msg.highlight(
+        f"Done: {stats['classified']} classified, {stats['skipped']} already done, "
+        f"{len(stats['failed'])} failed in {stats['seconds']:.1f}s"
+    ))
+    return stats
+
+
+def _walk(image_dir: str):
+    for root, dirs, files in os.walk(image_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, filename)
+
+
+def _read_list(list_path: str):
+    with open(list_path, "r") as f:
+        for line in f:
+            path = line.strip()
+            if path and not path.startswith("#"):
+                yield path
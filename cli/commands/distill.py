@@ -0,0 +1,51 @@
+import os
+
+from app.training.distill_attributes import distill_attributes
+from cli.commands.classify_bulk import IMAGE_EXTENSIONS
+from cli.message import Message
+
+
+Msg = Message()
+
+
+def run_distill(
+    embedding,
+    products_dir: str = "data/products",
+    category: str | None = None,
+    overwrite: bool = False,
+    preprocessed_store=None,
+) -> dict:
+    """
+    Train attribute heads for every zero-shot attribute (of `category`,
+    or of every category) from confident zero-shot predictions over the
+    product catalog, and print each head's agreement with zero-shot.
+    """
+    image_paths = [
+        os.path.join(products_dir, filename)
+        for filename in sorted(os.listdir(products_dir))
+        if filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+    print(Msg.highlight(f"\nDistilling zero-shot attributes from {len(image_paths)} catalog images\n"))
+    results = distill_attributes(
+        embedding,
+        image_paths,
+        categories=[category] if category else None,
+        preprocessed_store=preprocessed_store,
+        overwrite=overwrite,
+    )
+
+    for head, metrics in results.items():
+        if "skipped" in metrics:
+            print(Msg.alert(f"{head}: skipped, {metrics['skipped']}"))
+            continue
+
+        heldout = metrics["heldout_agreement"]
+        threshold = (metrics["calibration"] or {}).get("threshold")
+        print(Msg.info(
+            f"{head}: {len(metrics['classes'])} classes from {metrics['pseudo_labels']}/{metrics['images']} "
+            f"pseudo-labels, agreement {metrics['agreement']:.1%}"
+            f"{'' if heldout is None else f' (held-out {heldout:.1%})'}, threshold {threshold}"
+        ))
+
+    return results
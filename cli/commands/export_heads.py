@@ -0,0 +1,42 @@
+import os
+
+import torch
+
+from app.models.attribute_head import AttributeHead
+from app.models.numpy_attribute_head import EXPORT_NAME, export_head
+from cli.message import Message
+
+
+Msg = Message()
+
+
+def run_export_heads(models_dir: str = "models") -> list[str]:
+    """
+    Export every trained head (<models_dir>/<category>/<attribute>/model.pt)
+    to model.npz, so it is served without torch. train, distill and
+    feedback updates export as they publish; this catches heads trained
+    before that. Heads whose export is already current are skipped.
+    Returns the "category/attribute" of each head exported.
+    """
+    exported = []
+    for root, _, files in sorted(os.walk(models_dir)):
+        if "model.pt" not in files:
+            continue
+
+        model_path = os.path.join(root, "model.pt")
+        export_path = os.path.join(root, EXPORT_NAME)
+        if EXPORT_NAME in files and os.stat(export_path).st_mtime_ns >= os.stat(model_path).st_mtime_ns:
+            continue
+
+        state_dict = torch.load(model_path, map_location="cpu")
+        num_classes, embedding_dim = state_dict["classifier.weight"].shape
+        head = AttributeHead(embedding_dim=embedding_dim, num_classes=num_classes)
+        head.load_state_dict(state_dict)
+        export_head(root, head)
+
+        name = os.path.relpath(root, models_dir).replace(os.sep, "/")
+        exported.append(name)
+        print(Msg.info(f"{name}: {num_classes} classes → {EXPORT_NAME}"))
+
+    print(Msg.highlight(f"Exported {len(exported)} attribute heads"))
+    return exported
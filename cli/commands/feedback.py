@@ -0,0 +1,47 @@
+import os
+import time
+
+from app.services.feedback_service import FeedbackService
+from cli.message import Message
+
+
+Msg = Message()
+
+def run_feedback(
+    feedback: FeedbackService,
+    img_path: str | None = None,
+    category: str | None = None,
+    attribute: str | None = None,
+    label: str | None = None,
+) -> None:
+    """
+    Record that the `attribute` of the image at `img_path` is `label`; the
+    head is updated in the background shortly after. Without arguments,
+    print pending and recent head updates.
+    """
+    if img_path is None:
+        status = feedback.status()
+        print(Msg.highlight("Pending updates: " + (", ".join(status["pending"]) or "none")))
+        for head, update in sorted(status["updates"].items()):
+            if "error" in update:
+                print(Msg.alert(f"\t{head}: failed: {update['error']}"))
+                continue
+            age = time.time() - update["at"]
+            print(Msg.neutral(
+                f"\t{head}: {update['applied']} corrections applied {age:.0f}s ago "
+                f"({update['replayed']} replayed, {update['classes']} classes, {update['seconds'] * 1000:.0f} ms)"
+            ))
+        return
+
+    if not os.path.exists(img_path):
+        print(Msg.alert(f"Image not found: {img_path}"))
+        return
+    if not category or not attribute or not label:
+        print(Msg.alert("Please provide --category, --attribute and --label"))
+        return
+
+    count = feedback.record(img_path, category, attribute, label)
+    print(Msg.info(
+        f"Recorded {category}/{attribute} = {label} ({count} corrections); "
+        f"the head updates within {feedback.update_interval:.0f}s"
+    ))
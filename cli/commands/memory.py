@@ -0,0 +1,43 @@
+from app.infrastructure.metrics.memory import format_bytes
+from app.services.memory_report_service import MemoryReportService
+from cli.message import Message
+
+
+Msg = Message()
+
+def run_memory(memory_report: MemoryReportService, top: int = 0) -> None:
+    """
+    Print the resident size of each container component, the RSS/USS
+    change observed while each one loaded and, with `top` > 0, the
+    tracemalloc top-N Python allocation sites.
+    """
+    report = memory_report.report(tracemalloc_top=top)
+    process = report["process"]
+
+    print(Msg.highlight("Process memory:"))
+    print(Msg.neutral(f"\tRSS: {format_bytes(process['rss'])}"))
+    print(Msg.neutral(f"\tUSS: {format_bytes(process['uss'])}"))
+
+    print(Msg.highlight("\nComponents (resident estimate):"))
+    for row in sorted(report["components"], key=lambda r: r["bytes"], reverse=True):
+        print(Msg.neutral(f"\t{row['component']:<14} {row['part']:<32} {format_bytes(row['bytes']):>12}"))
+    print(Msg.neutral(f"\t{'accounted':<47} {format_bytes(report['accounted']):>12}"))
+    print(Msg.neutral(f"\t{'unaccounted (python, libs, allocator)':<47} {format_bytes(report['unaccounted']):>12}"))
+
+    if report["loads"]:
+        print(Msg.highlight("\nLoad snapshots (RSS before → after):"))
+        for name, load in report["loads"].items():
+            print(Msg.neutral(
+                f"\t{name:<40} {format_bytes(load['rss_before']):>10} → {format_bytes(load['rss_after']):>10}"
+                f"  (RSS +{format_bytes(load['rss_delta'])}, USS +{format_bytes(load['uss_delta'])},"
+                f" {load['seconds']:.2f}s)"
+            ))
+
+    if top > 0:
+        allocations = report["python_allocations"]
+        if not allocations:
+            print(Msg.info("\ntracemalloc started; run 'memory --top N' again to see allocations."))
+        else:
+            print(Msg.highlight(f"\nTop {len(allocations)} Python allocation sites:"))
+            for a in allocations:
+                print(Msg.neutral(f"\t{format_bytes(a['bytes']):>10} in {a['count']:>7} blocks  {a['location']}"))
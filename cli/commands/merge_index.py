@@ -0,0 +1,73 @@
+import numpy as np
+
+from app.infrastructure.vector_store.duplicate_index import DuplicateIndex
+from app.services.result_cache_service import ResultCacheService
+from cli.commands.rebuild import fragments_of, publish_index
+from cli.message import Message
+
+
+Msg = Message()
+
+def run_merge_index(vector_store, result_cache: ResultCacheService | None = None, keep_fragments: bool = False) -> str:
+    """
+    Combine the fragments written by `rebuild --shards N --shard-id i` into
+    one index and publish it as a snapshot, exactly as a single-process
+    rebuild would.
+
+    Fragments hold full-precision vectors, so a compressed index (sq8/pq)
+    trains one quantizer over every shard's vectors rather than merging
+    per-shard codebooks that wouldn't agree. When the shards collapsed
+    duplicates, representatives are collapsed again across shards in id
+    order. Fragments are removed once the index is published unless
+    `keep_fragments`.
+    """
+    fragments = fragments_of(vector_store)
+    parts = fragments.read_all()
+    meta = parts[0]["meta"]
+    print(Msg.highlight(f"\nMerging {len(parts)} index fragments\n"))
+
+    ids = np.concatenate([part["ids"] for part in parts])
+    vectors = np.concatenate([part["vectors"] for part in parts]).reshape(len(ids), vector_store.dimension)
+    id_to_filename, duplicates = {}, {}
+    for part in parts:
+        id_to_filename.update(part["id_to_filename"])
+        duplicates.update(part["duplicates"])
+
+    # Same id order as a single-process rebuild
+    order = np.argsort(ids, kind="stable")
+    ids, vectors = ids[order], vectors[order]
+
+    if meta.get("dedup_threshold", 0) > 0:
+        ids, vectors = _collapse_across_shards(ids, vectors, id_to_filename, duplicates, meta["dedup_threshold"])
+
+    version = publish_index(vector_store, ids.tolist(), vectors, id_to_filename, duplicates)
+
+    if not keep_fragments:
+        fragments.clear()
+    if result_cache:
+        result_cache.invalidate(ResultCacheService.QUERY_PREFIX)
+
+    print(Msg.highlight(f"\nIndex merged successfully! (snapshot {version}, {len(ids)} vectors)"))
+    return version
+
+
+def _collapse_across_shards(ids, vectors, id_to_filename: dict, duplicates: dict, threshold: float):
+    """Fold representatives that are near-duplicates of an earlier one into its cluster."""
+    duplicate_index = DuplicateIndex(vectors.shape[1], threshold)
+    keep = np.ones(len(ids), dtype=bool)
+
+    for row, (pid, vector) in enumerate(zip(ids.tolist(), vectors)):
+        representative = duplicate_index.find(vector)
+        if representative is None:
+            duplicate_index.add(pid, vector)
+            continue
+
+        keep[row] = False
+        members = duplicates.setdefault(str(representative), [])
+        members.append(id_to_filename.pop(str(pid)))
+        members.extend(duplicates.pop(str(pid), []))
+
+    if not keep.all():
+        print(Msg.info(f"Collapsed {int((~keep).sum())} cross-shard near-duplicates"))
+
+    return ids[keep], vectors[keep]
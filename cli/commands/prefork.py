@@ -0,0 +1,187 @@
+import os
+import time
+
+from app.config import settings
+from app.infrastructure.serving.prefork import PreforkServer
+from app.services.load_shedder import LEVELS, LoadShedder
+from app.services.recommender import RecommenderService
+from app.infrastructure.vector_store.snapshots import index_exists
+from cli.commands import classify, query
+from cli.message import Message
+
+
+Msg = Message()
+
+def run_serve_prefork(
+    container,
+    host: str = settings.SERVE_HOST,
+    port: int = settings.SERVE_PORT,
+    workers: int = settings.SERVE_WORKERS,
+    threads_per_worker: int = settings.SERVE_THREADS_PER_WORKER,
+) -> None:
+    """
+    Serve query/classify over TCP (JSON lines) from `workers` forked processes.
+
+    The index is memory-mapped and the catalog loaded once in the master,
+    before forking, so every worker shares the same model and index pages.
+
+    Warmup (preloading hot heads/label banks and the first forward) runs in
+    each worker after the fork rather than in the master: torch's OpenMP
+    pool is not safe to use across fork(). Workers accept requests while
+    it runs; the "ready" request reports its progress.
+
+    A snapshot published by a `rebuild` (run from another process) starts
+    loading in the background on each worker's next request; until it is
+    swapped in, workers keep answering from the snapshot they have mapped.
+
+    Requests with a latency budget are degraded step by step when the
+    accept queue and recent latencies say the full pipeline won't fit
+    (see LoadShedder).
+
+    With SHARD_ADDRESSES set, workers embed queries and search the
+    `serve-shard` servers (see ScatterGather) instead of a local index.
+
+    Storefront catalogs (requests with "catalog") are loaded by each worker
+    on first use and evicted per worker (see CatalogIndexManager); they are
+    memory-mapped, so workers share their pages through the page cache.
+    """
+    container.catalogs.mmap = True
+    if container.shards is None:
+        if index_exists(settings.FAISS_INDEX_PATH):
+            container.serving_index.mmap = True
+            container.serving_index.refresh()
+        elif not container.catalogs.catalogs():
+            print(Msg.alert("FAISS index not found. Rebuild index first."))
+            return
+
+    shedder = LoadShedder(workers=workers)
+    server = PreforkServer(
+        make_request_handler(container, shedder),
+        host=host,
+        port=port,
+        workers=workers,
+        threads_per_worker=threads_per_worker,
+        on_worker_start=_start_warmup(container),
+    )
+    host, port = server.bind()
+    shedder.queue_depth = server.backlog
+    threads = server.thread_budget().torch
+
+    print(Msg.highlight(
+        f"Serving on {host}:{port} with {workers} workers × {threads} threads ({settings.THREAD_PROFILE} profile) "
+        f"(master pid {os.getpid()}). Ctrl-C to stop."
+    ))
+    server.serve_forever()
+    print(Msg.info("All workers stopped."))
+
+
+def _start_warmup(container):
+    def on_worker_start(slot: int):
+        if settings.WARMUP_ENABLED:
+            container.warmup.start()
+
+    return on_worker_start
+
+
+def make_request_handler(container, shedder: LoadShedder | None = None):
+    """
+    Requests:
+        {"command": "ping"}
+        {"command": "ready"}
+        {"command": "load"}
+        {"command": "query", "image": "<path>", "catalog": "<name>"}
+        {"command": "classify", "image": "<path>", "use_trained": false, "cascade": false}
+
+    "catalog" is optional: without it, the default index (or the shards)
+    answers. With shards, query responses carry "shards": {"answered", "missing"}.
+
+    query and classify may add "budget_ms" (latency budget; default
+    SHED_DEFAULT_BUDGET_MS) and "sent_at" (client's epoch seconds, so time
+    spent in transit and queued counts against the budget). Their
+    responses carry "degradation": {"level", "mode"}.
+    """
+    shedder = shedder or LoadShedder()
+
+    def handle(request: dict) -> dict:
+        command = request.get("command")
+
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid()}
+
+        if command == "ready":
+            return {"ready": container.warmup.ready, "pid": os.getpid(), **container.warmup.status()}
+
+        if command == "load":
+            return {"pid": os.getpid(), **shedder.status()}
+
+        if command not in ("query", "classify"):
+            raise ValueError(f"Unknown command: {command}")
+
+        img_path = request.get("image")
+        if not img_path or not os.path.exists(img_path):
+            raise ValueError(f"Image not found: {img_path}")
+
+        sent_at = request.get("sent_at")
+        level = shedder.plan(
+            command,
+            request.get("budget_ms", settings.SHED_DEFAULT_BUDGET_MS),
+            waited_ms=max(0.0, (time.time() - sent_at) * 1000) if sent_at else 0.0,
+        )
+
+        started = time.perf_counter()
+        if command == "query":
+            response = _query(container, img_path, level, request.get("catalog"))
+        else:
+            response = _classify(container, img_path, request, level)
+        shedder.record(command, level, time.perf_counter() - started)
+
+        response["degradation"] = {"level": level, "mode": LEVELS[level]}
+        return response
+
+    return handle
+
+
+def _query(container, img_path: str, level: int, catalog: str | None = None) -> dict:
+    rerank_k = settings.SHED_RERANK_K if level >= 2 else None
+    response = {}
+
+    if catalog is None and container.shards is not None:
+        recommender = container.recommender if level < 1 else RecommenderService(container.passthrough_embedding, None)
+        results, missing = query.search_shards(recommender, container.shards, img_path, rerank_k=rerank_k)
+        response["shards"] = {"answered": len(container.shards.addresses) - len(missing), "missing": missing}
+    else:
+        if catalog is not None:
+            loaded = container.catalogs.current(catalog)
+        else:
+            container.serving_index.refresh(wait=False)
+            loaded = container.serving_index.current()
+            if loaded is None:
+                raise ValueError("No default index; pass a \"catalog\"")
+
+        recommender = container.recommender if level < 1 else RecommenderService(container.passthrough_embedding, loaded.store)
+        results = query.search(recommender, loaded.store, img_path, catalog=loaded.catalog, rerank_k=rerank_k)
+
+    response["results"] = [
+        {"id": int(pid), "filename": filename, "distance": float(score), "duplicates": list(members)}
+        for pid, filename, score, members in results
+    ]
+    return response
+
+
+def _classify(container, img_path: str, request: dict, level: int) -> dict:
+    category, confidence, attributes = classify.classify(
+        container.embedding if level < 1 else container.passthrough_embedding,
+        container.cache,
+        img_path,
+        request.get("use_trained", False),
+        request.get("cascade", False),
+        zero_shot=level < 3,
+    )
+    return {
+        "category": category,
+        "confidence": float(confidence),
+        "attributes": {
+            name: {**info, "confidence": float(info["confidence"])}
+            for name, info in attributes.items()
+        },
+    }
@@ -1,32 +1,141 @@
 import os
-import json
 
 from app.config import settings
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.metrics.timing import span
+from app.infrastructure.vector_store.snapshots import IndexSnapshots, index_exists, read_catalog
+from app.services.result_cache_service import ResultCacheService
 from cli.message import Message
 
 
 Msg = Message()
 
-def run_query(recommender, vector_store, img_path: str) -> None:
+def run_query(
+    recommender,
+    vector_store,
+    img_path: str,
+    expand_duplicates: bool = False,
+    result_cache: ResultCacheService | None = None,
+    serving_index=None,
+    shards=None,
+    catalog: str | None = None,
+) -> None:
     """
     Load the FAISS index and print the top similar products for `img_path`.
+
+    Results are one per duplicate cluster. With `expand_duplicates` the
+    cluster members are listed under their representative; otherwise only
+    their count is shown.
+
+    With `result_cache`, results are memoised by image content, model
+    fingerprint, top-k and index version, and a hit skips the whole
+    preprocess → embed → search pipeline.
+
+    With `serving_index`, the search runs against its current snapshot
+    (picking up a newly published one first) instead of reloading
+    `vector_store` from disk.
+
+    `catalog` names the storefront catalog `serving_index` belongs to, so
+    its cached results are tracked apart from other catalogs'.
+
+    With `shards` (ScatterGather), the search runs on the shard servers
+    instead; results are not cached, as they may be partial.
     """
-    if not os.path.exists(settings.FAISS_INDEX_PATH):
+    if shards is not None:
+        results, missing = search_shards(recommender, shards, img_path)
+        for address, reason in sorted(missing.items()):
+            print(Msg.alert(f"Shard {address} left out: {reason}"))
+        _print_results(results, expand_duplicates)
+        return
+
+    loaded_catalog = None
+    if serving_index is not None:
+        serving_index.refresh(wait=False)
+        loaded = serving_index.current()
+        if loaded is None:
+            print(Msg.alert("FAISS index not found. Rebuild index first."))
+            return
+        vector_store, loaded_catalog = loaded.store, loaded.catalog
+    elif not index_exists(settings.FAISS_INDEX_PATH):
         print(Msg.alert("FAISS index not found. Rebuild index first."))
         return
 
-    vector_store.load()
-    ids, scores = recommender.recommend(img_path)
+    if result_cache is None:
+        results = search(recommender, vector_store, img_path, catalog=loaded_catalog)
+    else:
+        index_version = (
+            loaded.version if serving_index is not None
+            else result_cache.index_version(settings.FAISS_INDEX_PATH)
+        )
+        result_cache.track_version(f"index:{catalog}" if catalog else "index", index_version, ResultCacheService.QUERY_PREFIX)
+
+        key = CacheKeys.query_result(
+            content_hash=CacheKeys.content_hash(img_path),
+            fingerprint=recommender.embedding_model.fingerprint(),
+            top_k=settings.TOP_K,
+            index_version=index_version,
+        )
+        results, cached = result_cache.get_or_compute(
+            key, lambda: search(recommender, vector_store, img_path, catalog=loaded_catalog)
+        )
+        if cached:
+            print(Msg.neutral("(cached result)"))
 
-    mapping_path = os.path.join(
-        os.path.dirname(settings.FAISS_INDEX_PATH), "id_to_filename.json"
-    )
-    with open(mapping_path, "r") as f:
-        id_to_filename = json.load(f)
+    _print_results(results, expand_duplicates)
 
+
+def _print_results(results: list[tuple], expand_duplicates: bool):
     print(Msg.info("\nTop Results:"))
-    for i, (pid, score) in enumerate(zip(ids, scores)):
-        filename = id_to_filename.get(str(pid), "unknown")
-        print(
-            f"{i + 1}. Product ID: {pid} | Filename: {filename} | Distance: {score:.4f}"
-        )
+    for i, (pid, filename, score, members) in enumerate(results):
+        line = f"{i + 1}. Product ID: {pid} | Filename: {filename} | Distance: {score:.4f}"
+        if members and not expand_duplicates:
+            line += f" | +{len(members)} duplicates"
+        print(line)
+
+        if expand_duplicates:
+            for member in members:
+                print(Msg.neutral(f"     ↳ duplicate: {member}"))
+
+
+def load_catalog() -> tuple[dict, dict]:
+    """Return (id → filename, representative id → duplicate filenames)."""
+    with span("query.mapping_load"):
+        snapshots = IndexSnapshots(os.path.dirname(settings.FAISS_INDEX_PATH))
+        return read_catalog(snapshots.index_dir())
+
+
+def search_shards(recommender, shards, img_path: str, rerank_k: int | None = None) -> tuple[list[tuple], dict]:
+    """
+    Embed `img_path` here and search every shard server (see
+    ScatterGather). Returns ((id, filename, score, duplicate members)
+    results, shards left out → reason).
+    """
+    with span("service.recommend"):
+        vector = recommender.embedding_model.encode_image(img_path)
+        return shards.search(vector, settings.TOP_K, rerank_k=rerank_k)
+
+
+def search(
+    recommender,
+    vector_store,
+    img_path: str,
+    catalog: tuple[dict, dict] | None = None,
+    rerank_k: int | None = None,
+) -> list[tuple]:
+    """
+    Run the search and resolve ids to (id, filename, score, duplicate members).
+
+    Without a preloaded `catalog`, the index and catalog are reloaded from
+    disk first so the interactive shell always sees the latest rebuild.
+    """
+    if catalog is None:
+        vector_store.load()
+        catalog = load_catalog()
+
+    ids, scores = recommender.recommend(img_path, vector_store=vector_store, rerank_k=rerank_k)
+    id_to_filename, duplicates = catalog
+
+    return [
+        (pid, id_to_filename.get(str(pid), "unknown"), score, tuple(duplicates.get(str(pid), [])))
+        for pid, score in zip(ids, scores)
+    ]
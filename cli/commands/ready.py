@@ -0,0 +1,24 @@
+from app.services.warmup_service import WarmupService
+from cli.message import Message
+
+
+Msg = Message()
+
+def run_ready(warmup: WarmupService) -> None:
+    """Print whether startup warmup has finished and what it preloaded."""
+    status = warmup.status()
+
+    if not warmup.ready:
+        print(Msg.alert(f"Warming up ({status['state']}): {status['loaded']}/{status['planned']} entries preloaded"))
+        return
+
+    if status["state"] == "failed":
+        print(Msg.alert(f"Warmup failed after {status['seconds']:.2f}s: {status['error']}"))
+        return
+
+    print(Msg.highlight(f"Ready (warmup took {status['seconds']:.2f}s)"))
+    print(Msg.neutral(f"\tpreloaded: {status['loaded']}/{status['planned']}"))
+    if status["skipped"]:
+        print(Msg.neutral(f"\tskipped (no loader): {status['skipped']}"))
+    for key in status["failed"]:
+        print(Msg.alert(f"\tfailed: {key}"))
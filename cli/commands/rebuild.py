@@ -1,39 +1,235 @@
 import os
 import json
+import shutil
+import threading
 import numpy as np
 
+from app.config import settings
+from app.infrastructure.preprocessing.preprocessed_store import PreprocessedStore
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.vector_store.duplicate_index import DuplicateIndex
+from app.infrastructure.vector_store.fragments import IndexFragments, listing_hash, shard_index_path, shard_of
+from app.infrastructure.vector_store.snapshots import IndexSnapshots
+from app.services.result_cache_service import ResultCacheService
 from cli.message import Message
 
 
 Msg = Message()
 
-def run_rebuild(embedding, vector_store, products_dir: str = "data/products") -> None:
+def run_rebuild(
+    embedding,
+    vector_store,
+    products_dir: str = "data/products",
+    dedup_threshold: float = settings.DEDUP_THRESHOLD,
+    result_cache: ResultCacheService | None = None,
+    preprocessed_store: PreprocessedStore | None = None,
+) -> str:
     """
     Encode all product images in `products_dir`, populate the FAISS index,
     and persist both the index and the id→filename mapping to disk.
+
+    The index is built in a fresh snapshot directory configured like
+    `vector_store` and published atomically once complete (see
+    publish_index); anything serving from `vector_store` keeps working
+    until it loads the new snapshot. Returns the snapshot version.
+
+    When `dedup_threshold` > 0, products whose cosine similarity to an
+    already indexed product exceeds it are collapsed into that product's
+    duplicate cluster: only the representative vector is indexed and the
+    members are written to duplicates.json (representative id → filenames).
+
+    Cached query results are dropped from `result_cache` once the new
+    index is on disk.
+
+    With `preprocessed_store`, preprocessed images are read from it (and
+    new ones added), so only the embedding forward runs for known images.
     """
     print(Msg.highlight("\nStarted rebuilding process\n"))
     os.makedirs(products_dir, exist_ok=True)
 
+    products = list(enumerate(sorted(os.listdir(products_dir))))
+    ids, vectors, id_to_filename, duplicates = embed_products(
+        embedding, products_dir, products, dedup_threshold, preprocessed_store, vector_store.dimension
+    )
+    version = publish_index(vector_store, ids, vectors, id_to_filename, duplicates)
+
+    if result_cache:
+        result_cache.invalidate(ResultCacheService.QUERY_PREFIX)
+
+    print(Msg.highlight(f"\nIndex rebuilt successfully! (snapshot {version})"))
+    return version
+
+
+def run_rebuild_shard(
+    embedding,
+    vector_store,
+    shards: int,
+    shard_id: int,
+    products_dir: str = "data/products",
+    dedup_threshold: float = settings.DEDUP_THRESHOLD,
+    preprocessed_store: PreprocessedStore | None = None,
+    publish: bool = False,
+) -> str:
+    """
+    Encode the products of shard `shard_id` (of `shards`) and write them
+    as an index fragment next to the index; `merge-index` combines the
+    fragments of all shards into the published index.
+
+    With `publish`, the shard's products are also published as an index
+    of their own (see shard_index_path), for `serve-shard` to serve to a
+    scatter-gather coordinator. Duplicates are then only collapsed within
+    the shard.
+
+    Products are assigned to shards by content hash and keep their
+    position in the sorted directory listing as id, so shard processes
+    (on one machine or several sharing the products directory) need no
+    coordination. Duplicates are collapsed within the shard here and
+    across shards by the merge.
+
+    `preprocessed_store` allows one writer at a time, so give it to at
+    most one of the concurrently running shards.
+    """
+    if not 0 <= shard_id < shards:
+        raise ValueError(f"--shard-id must be in [0, {shards}), got {shard_id}")
+
+    print(Msg.highlight(f"\nStarted rebuilding shard {shard_id} of {shards}\n"))
+    os.makedirs(products_dir, exist_ok=True)
+
+    filenames = sorted(os.listdir(products_dir))
+    products = [
+        (idx, filename)
+        for idx, filename in enumerate(filenames)
+        if shard_of(CacheKeys.content_hash(os.path.join(products_dir, filename)), shards) == shard_id
+    ]
+    ids, vectors, id_to_filename, duplicates = embed_products(
+        embedding, products_dir, products, dedup_threshold, preprocessed_store, vector_store.dimension
+    )
+
+    fragment_path = fragments_of(vector_store).write(
+        shard_id,
+        shards,
+        ids,
+        vectors,
+        id_to_filename,
+        duplicates,
+        meta={
+            "listing": listing_hash(filenames),
+            "fingerprint": embedding.fingerprint(),
+            "dedup_threshold": dedup_threshold,
+        },
+    )
+
+    print(Msg.highlight(f"\nShard {shard_id} written to {fragment_path} ({len(ids)} vectors)"))
+
+    if publish:
+        shard_store = vector_store.clone_empty(shard_index_path(vector_store.index_path, shard_id, shards))
+        version = publish_index(shard_store, ids, vectors, id_to_filename, duplicates)
+        print(Msg.highlight(f"Shard {shard_id} published for serve-shard (snapshot {version})"))
+
+    return fragment_path
+
+
+def fragments_of(vector_store) -> IndexFragments:
+    return IndexFragments(os.path.join(os.path.dirname(vector_store.index_path), "fragments"))
+
+
+def embed_products(embedding, products_dir, products, dedup_threshold, preprocessed_store, dimension) -> tuple:
+    """
+    Encode `products` ((id, filename) pairs) and collapse near-duplicates.
+    Returns (ids, vectors, id → filename, representative id → duplicate filenames).
+    """
     ids, vectors, id_to_filename = [], [], {}
+    duplicates = {}
+    duplicate_index = (
+        DuplicateIndex(dimension, dedup_threshold) if dedup_threshold > 0 else None
+    )
 
-    for idx, filename in enumerate(os.listdir(products_dir)):
+    for idx, filename in products:
         path = os.path.join(products_dir, filename)
-        
+
         print(Msg.info(f"Processing {filename}..."))
-        
-        vector = embedding.encode_image(path)
+
+        vector = embedding.encode_image(path, preprocessed_store=preprocessed_store)
+
+        if duplicate_index:
+            representative = duplicate_index.find(vector)
+            if representative is not None:
+                duplicates.setdefault(representative, []).append(filename)
+                continue
+            duplicate_index.add(idx, vector)
+
         ids.append(idx)
         vectors.append(vector)
         id_to_filename[idx] = filename
 
-    vector_store.add(ids, np.array(vectors).astype("float32"))
-    vector_store.save()
+    if preprocessed_store is not None:
+        preprocessed_store.flush()
 
-    mapping_path = os.path.join(
-        os.path.dirname(vector_store.index_path), "id_to_filename.json"
-    )
-    with open(mapping_path, "w") as f:
-        json.dump(id_to_filename, f, indent=2)
+    if duplicate_index:
+        collapsed = sum(len(members) for members in duplicates.values())
+        print(Msg.info(
+            f"\nCollapsed {collapsed} near-duplicates into {len(duplicates)} clusters "
+            f"({len(ids)} vectors indexed)"
+        ))
+
+    vectors = np.array(vectors, dtype="float32").reshape(len(ids), dimension)
+    return ids, vectors, id_to_filename, duplicates
+
+
+def publish_index(vector_store, ids, vectors, id_to_filename: dict, duplicates: dict) -> str:
+    """
+    Build a store configured like `vector_store` from `vectors` in a fresh
+    snapshot directory and publish it atomically (see IndexSnapshots);
+    `vector_store` itself is left untouched. Returns the snapshot version.
+    """
+    snapshots = IndexSnapshots(os.path.dirname(vector_store.index_path))
+    staging_dir = snapshots.staging()
+
+    try:
+        store = vector_store.clone_empty(
+            os.path.join(staging_dir, os.path.basename(vector_store.index_path))
+        )
+        store.add(ids, vectors)
+        store.save()
+
+        mapping_path = os.path.join(staging_dir, "id_to_filename.json")
+        with open(mapping_path, "w") as f:
+            json.dump(id_to_filename, f, indent=2)
+
+        # Always written so a stale cluster list never outlives its index
+        duplicates_path = os.path.join(staging_dir, "duplicates.json")
+        with open(duplicates_path, "w") as f:
+            json.dump(duplicates, f, indent=2)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    return snapshots.publish(staging_dir)
+
+
+_background_lock = threading.Lock()
+
+
+def start_background_rebuild(embedding, vector_store, serving_index, products_dir: str = "data/products", **kwargs):
+    """
+    Run run_rebuild on a daemon thread and swap `serving_index` to the new
+    snapshot when it's published; queries keep using the current snapshot
+    meanwhile. Returns the thread, or None if a rebuild is already running.
+    """
+    if not _background_lock.acquire(blocking=False):
+        print(Msg.alert("A rebuild is already running."))
+        return None
+
+    def rebuild_and_swap():
+        try:
+            run_rebuild(embedding, vector_store, products_dir, **kwargs)
+            if serving_index.refresh():
+                print(Msg.highlight(f"Now serving snapshot {serving_index.current().version}"))
+        except Exception as e:
+            print(Msg.alert(f"Background rebuild failed: {type(e).__name__}: {e}"))
+        finally:
+            _background_lock.release()
 
-    print(Msg.highlight("\nIndex rebuilt successfully!"))
+    thread = threading.Thread(target=rebuild_and_swap, daemon=True, name="rebuild")
+    thread.start()
+    return thread
@@ -0,0 +1,110 @@
+import os
+
+from app.config import settings
+from app.infrastructure.serving.prefork import PreforkServer
+from app.infrastructure.serving.scatter_gather import decode_vector
+from app.infrastructure.vector_store.fragments import shard_index_path
+from app.infrastructure.vector_store.snapshots import index_exists
+from app.services.serving_index import ServingIndex
+from cli.message import Message
+
+
+Msg = Message()
+
+def run_serve_shard(
+    vector_store,
+    shards: int,
+    shard_id: int,
+    host: str = settings.SERVE_HOST,
+    port: int = settings.SERVE_PORT,
+    workers: int = settings.SERVE_WORKERS,
+    threads_per_worker: int = settings.SERVE_THREADS_PER_WORKER,
+) -> None:
+    """
+    Serve shard `shard_id` of `shards` (published by `rebuild --shards N
+    --shard-id i --publish-shard`) to a scatter-gather coordinator, from
+    `workers` forked processes.
+
+    A shard only searches: the coordinator embeds the query, so shard
+    processes load no model, just their memory-mapped partition. A
+    republished partition is loaded in the background from the next
+    request on, as in serve-prefork.
+    """
+    if not 0 <= shard_id < shards:
+        raise ValueError(f"--shard-id must be in [0, {shards}), got {shard_id}")
+
+    index_path = shard_index_path(vector_store.index_path, shard_id, shards)
+    if not index_exists(index_path):
+        print(Msg.alert(f"No index for shard {shard_id} of {shards} at {os.path.dirname(index_path)}."))
+        print(Msg.info("Build it with: rebuild --shards N --shard-id I --publish-shard"))
+        return
+
+    serving_index = ServingIndex(lambda: vector_store.clone_empty(index_path), index_path, mmap=True)
+    serving_index.refresh()
+
+    server = PreforkServer(
+        make_shard_handler(serving_index, shard_id, shards),
+        host=host,
+        port=port,
+        workers=workers,
+        threads_per_worker=threads_per_worker,
+    )
+    host, port = server.bind()
+
+    loaded = serving_index.current()
+    print(Msg.highlight(
+        f"Serving shard {shard_id} of {shards} ({len(loaded.catalog[0])} products, snapshot {loaded.version}) "
+        f"on {host}:{port} with {workers} workers (master pid {os.getpid()}). Ctrl-C to stop."
+    ))
+    server.serve_forever()
+    print(Msg.info("All workers stopped."))
+
+
+def make_shard_handler(serving_index: ServingIndex, shard_id: int, shards: int):
+    """
+    Requests:
+        {"command": "ping"}
+        {"command": "search", "vector": "<base64 float32>", "top_k": 10, "rerank_k": null}
+
+    search returns {"shard", "version", "hits": [{"id", "filename", "distance", "duplicates"}]}.
+    """
+    def handle(request: dict) -> dict:
+        command = request.get("command")
+
+        if command == "ping":
+            loaded = serving_index.current()
+            return {
+                "ok": True,
+                "pid": os.getpid(),
+                "shard": shard_id,
+                "shards": shards,
+                "version": loaded.version if loaded else None,
+            }
+
+        if command != "search":
+            raise ValueError(f"Unknown command: {command}")
+
+        serving_index.refresh(wait=False)
+        loaded = serving_index.current()
+        if loaded is None:
+            raise ValueError(f"Shard {shard_id} has no index")
+
+        ids, distances = loaded.store.search(
+            decode_vector(request["vector"]), int(request["top_k"]), rerank_k=request.get("rerank_k")
+        )
+        id_to_filename, duplicates = loaded.catalog
+        return {
+            "shard": shard_id,
+            "version": loaded.version,
+            "hits": [
+                {
+                    "id": int(pid),
+                    "filename": id_to_filename.get(str(pid), "unknown"),
+                    "distance": float(distance),
+                    "duplicates": list(duplicates.get(str(pid), [])),
+                }
+                for pid, distance in zip(ids, distances)
+            ],
+        }
+
+    return handle
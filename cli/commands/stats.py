@@ -0,0 +1,30 @@
+from app.infrastructure.metrics.timing import StageTimings
+from cli.message import Message
+
+
+Msg = Message()
+
+def run_stats(timings: StageTimings, reset: bool = False) -> None:
+    """
+    Print per-stage call counts and p50/p95/p99 latency.
+    With `reset`, clear all recorded samples afterwards.
+    """
+    if not timings.enabled:
+        print(Msg.alert("Stage timings are disabled (set TIMINGS_ENABLED=true)."))
+        return
+
+    stats = timings.snapshot()
+    if not stats:
+        print(Msg.info("No stages recorded yet."))
+        return
+
+    print(Msg.highlight(f"Stage latencies (last {timings.window} samples per stage):"))
+    print(Msg.neutral(f"  {'stage':<32} {'count':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"))
+    for name, s in stats.items():
+        print(Msg.neutral(
+            f"  {name:<32} {s['count']:>8} {s['p50_ms']:>10.2f} {s['p95_ms']:>10.2f} {s['p99_ms']:>10.2f}"
+        ))
+
+    if reset:
+        timings.reset()
+        print(Msg.info("Stage timings reset."))
@@ -1,8 +1,8 @@
 from app.training.train_attribute import train_attribute
 
 
-def run_train(category: str, attribute: str) -> None:
+def run_train(category: str, attribute: str, embedding=None, preprocessed_store=None) -> None:
     """
     Train an attribute classifier for the given category/attribute pair.
     """
-    train_attribute(category, attribute)
+    train_attribute(category, attribute, embedding=embedding, preprocessed_store=preprocessed_store)
@@ -0,0 +1,61 @@
+from app.services.ingest_service import IngestService
+from cli.message import Message
+
+
+Msg = Message()
+
+
+def run_watch(ingest: IngestService) -> None:
+    """
+    Watch the products directory in the foreground until Ctrl+C, serving
+    new and changed images as they settle. Whatever is still live is
+    published as a snapshot on the way out.
+    """
+    print(Msg.highlight(f"Watching {ingest.products_dir} for product images (Ctrl+C to stop)"))
+    try:
+        ingest.run()
+    except KeyboardInterrupt:
+        print(Msg.info("\nStopping watch..."))
+    finally:
+        version = ingest.stop()
+        status = ingest.status()
+        print(Msg.neutral(f"\tingested: {status['ingested']}, removed: {status['removed']}"))
+        if version:
+            print(Msg.highlight(f"Published snapshot {version}"))
+
+
+def run_watch_interactive(ingest: IngestService, action: str | None = None, products_dir: str | None = None) -> None:
+    """
+    `watch` starts watching in the background (or, when already running,
+    prints its progress); `watch status` prints the progress;
+    `watch stop` stops it and publishes the live products.
+    """
+    if action == "stop":
+        if not ingest.running:
+            print(Msg.info("Not watching"))
+            return
+        version = ingest.stop()
+        print(Msg.highlight("Stopped watching" + (f"; published snapshot {version}" if version else "")))
+        return
+
+    if action is None and not ingest.running:
+        if products_dir:
+            ingest.products_dir = products_dir
+        ingest.start()
+        print(Msg.highlight(f"Watching {ingest.products_dir} in the background; run 'watch stop' to stop."))
+        return
+
+    status = ingest.status()
+    state = "watching" if status["running"] else "stopped"
+    wake = "inotify" if status["inotify"] else "polling"
+    print(Msg.highlight(f"{state} {ingest.products_dir} ({wake})"))
+    print(Msg.neutral(
+        f"\tingested: {status['ingested']}, removed: {status['removed']}, "
+        f"live: {status['live']}, settling: {status['pending']}"
+    ))
+    if status["folded"]:
+        print(Msg.neutral(f"\tlast published: {status['folded']}"))
+    if status["error"]:
+        print(Msg.alert(f"\terror: {status['error']}"))
+    for filename, error in sorted(status["failed"].items()):
+        print(Msg.alert(f"\tfailed: {filename}: {error}"))
@@ -1,9 +1,23 @@
 from app.config import settings
 from app.services.recommender import RecommenderService
+from app.services.result_cache_service import ResultCacheService
+from app.services.memory_report_service import MemoryReportService
+from app.services.serving_index import ServingIndex
+from app.services.catalog_index_manager import CatalogIndexManager
+from app.services.warmup_service import WarmupService, default_loaders
+from app.services.feedback_service import FeedbackService
+from app.services.ingest_service import IngestService
+from app.infrastructure.feedback.feedback_log import FeedbackLog
+from app.infrastructure.serving.scatter_gather import ScatterGather, parse_addresses
 from app.infrastructure.embedding.clip_model import ClipEmbeddingModel
-from app.infrastructure.vector_store.faiss_store import FaissVectorStore
+from app.infrastructure.vector_store.factory import make_vector_store
 from app.infrastructure.preprocessing.factory import make_preprocessor
+from app.infrastructure.preprocessing.passthrough_preprocessor import PassthroughPreprocessor
+from app.infrastructure.preprocessing.preprocessed_store import PreprocessedStore
 from app.infrastructure.cache.chache import Cache
+from app.infrastructure.cache.warmup_manifest import WarmupManifest
+from app.infrastructure.metrics.memory import memory_tracker
+from app.infrastructure.runtime.thread_topology import plan_threads, thread_topology
 
 
 class Container:
@@ -13,8 +27,52 @@ class Container:
     """
 
     def __init__(self):
-        preprocessor = make_preprocessor(settings)
-        self.embedding = ClipEmbeddingModel(preprocessor=preprocessor)
-        self.vectore_store = FaissVectorStore()
+        # Before anything creates a thread pool; serve-prefork workers re-plan per worker
+        thread_topology.apply(plan_threads())
+
+        with memory_tracker.track("preprocessor"):
+            self.preprocessor = make_preprocessor(settings)
+        self.preprocessed_store = (
+            PreprocessedStore(
+                settings.PREPROCESSED_STORE_DIR,
+                self.preprocessor.fingerprint(),
+                shard_size=settings.PREPROCESSED_SHARD_SIZE,
+            )
+            if settings.PREPROCESSED_STORE_DIR
+            else None
+        )
+        self.cache = Cache(manifest=WarmupManifest(settings.WARMUP_MANIFEST_PATH))
+        with memory_tracker.track("embedding"):
+            self.embedding = ClipEmbeddingModel(preprocessor=self.preprocessor, cache=self.cache)
+        # Same weights without background removal, for requests shed under load
+        self.passthrough_embedding = (
+            self.embedding
+            if isinstance(self.preprocessor, PassthroughPreprocessor)
+            else self.embedding.with_preprocessor(
+                PassthroughPreprocessor(target_size=settings.PREPROCESS_SIZE, bg_color=settings.PREPROCESS_BG_COLOR)
+            )
+        )
+        with memory_tracker.track("vector_store"):
+            self.vectore_store = make_vector_store(settings)
+        self.serving_index = ServingIndex(lambda: self.vectore_store.clone_empty(self.vectore_store.index_path))
+        # Per-storefront indexes (--catalog), loaded on first use
+        self.catalogs = CatalogIndexManager(self.vectore_store.clone_empty)
         self.recommender = RecommenderService(self.embedding, self.vectore_store)
-        self.cache = Cache()
+        # Queries go to `serve-shard` servers instead of the local index when configured
+        self.shards = ScatterGather(parse_addresses(settings.SHARD_ADDRESSES)) if settings.SHARD_ADDRESSES else None
+        self.result_cache = ResultCacheService(self.cache)
+        self.warmup = WarmupService(
+            self.cache.manifest,
+            default_loaders(self.embedding, self.cache),
+            embedding=self.embedding,
+            serving_index=self.serving_index,
+        )
+        self.feedback = FeedbackService(self.embedding, self.cache, FeedbackLog())
+        self.ingest = IngestService(self.embedding, self.serving_index, preprocessed_store=self.preprocessed_store)
+        self.memory_report = MemoryReportService({
+            "preprocessor": self.preprocessor,
+            "embedding": self.embedding,
+            "vector_store": self.serving_index,
+            "catalogs": self.catalogs,
+            "cache": self.cache,
+        })
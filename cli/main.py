@@ -4,7 +4,14 @@ import shlex
 
 from app.config import settings
 from cli.container import Container
-from cli.commands import rebuild, train, query, classify, cache
+from cli.commands import rebuild, train, query, classify, cache, stats, memory, prefork, ready, merge_index, classify_bulk, feedback, distill, watch, shard, export_heads
+from app.services.bulk_classify_service import BulkClassifyService
+from app.services.ingest_service import IngestService
+from app.infrastructure.database.sqlite_repository import SqliteClassificationRepository
+from app.infrastructure.metrics.timing import timings
+from app.infrastructure.metrics.http_endpoint import start_metrics_server
+from app.infrastructure.vector_store.factory import make_vector_store
+from app.infrastructure.vector_store.snapshots import index_exists
 from cli.message import Message
 
 Msg = Message()
@@ -18,13 +25,20 @@ def parse_command(command_str):
         "command": None,
         "image": None,
         "products_dir": None,
+        "catalog": None,
         "save_preprocessed": False,
         "preprocessed_dir": None,
         "category": None,
         "attribute": None,
+        "label": None,
         "use_trained": False,
+        "cascade": False,
+        "expand_duplicates": False,
         "cache_action": None,  # list, clear, delete, info
         "cache_key": None,  # for delete command
+        "stats_reset": False,
+        "top": 0,  # tracemalloc top-N for memory command
+        "watch_action": None,  # stop, status
     }
 
     if not parts:
@@ -43,6 +57,9 @@ def parse_command(command_str):
         elif p == "--products_dir" and i + 1 < len(parts):
             cmd_args["products_dir"] = parts[i + 1]
             i += 2
+        elif p == "--catalog" and i + 1 < len(parts):
+            cmd_args["catalog"] = parts[i + 1]
+            i += 2
         elif p == "--preprocessed_dir" and i + 1 < len(parts):
             cmd_args["preprocessed_dir"] = parts[i + 1]
             i += 2
@@ -52,9 +69,15 @@ def parse_command(command_str):
         elif p == "--attribute" and i + 1 < len(parts):
             cmd_args["attribute"] = parts[i + 1]
             i += 2
+        elif p == "--label" and i + 1 < len(parts):
+            cmd_args["label"] = parts[i + 1]
+            i += 2
         elif p == "--key" and i + 1 < len(parts):
             cmd_args["cache_key"] = parts[i + 1]
             i += 2
+        elif p == "--top" and i + 1 < len(parts):
+            cmd_args["top"] = int(parts[i + 1])
+            i += 2
 
         # Flags without values
         elif p == "--save-preprocessed":
@@ -63,6 +86,12 @@ def parse_command(command_str):
         elif p == "--use-trained":
             cmd_args["use_trained"] = True
             i += 1
+        elif p == "--cascade":
+            cmd_args["cascade"] = True
+            i += 1
+        elif p == "--expand-duplicates":
+            cmd_args["expand_duplicates"] = True
+            i += 1
         else:
             # Check if it's a cache subcommand
             if cmd_args["command"] == "cache":
@@ -73,6 +102,12 @@ def parse_command(command_str):
                     print(Msg.alert(f"Unknown cache subcommand: {p}"))
                     print(Msg.info("Valid subcommands: list, clear, delete, info"))
                     i += 1
+            elif cmd_args["command"] == "stats" and p == "reset":
+                cmd_args["stats_reset"] = True
+                i += 1
+            elif cmd_args["command"] == "watch" and p in ("stop", "status"):
+                cmd_args["watch_action"] = p
+                i += 1
             else:
                 print(Msg.alert(f"Unknown argument: {p}"))
                 i += 1
@@ -82,41 +117,208 @@ def parse_command(command_str):
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("command", choices=["serve", "rebuild", "train"])
+    parser.add_argument("command", choices=["serve", "serve-prefork", "rebuild", "merge-index", "train", "distill", "classify-bulk", "watch", "serve-shard", "export-heads"])
     parser.add_argument(
         "--products_dir",
         default="data/products",
-        help="Directory of product images for rebuild",
+        help="Directory of product images for rebuild and watch",
     )
-    parser.add_argument("--category", help="Category for training")
+    parser.add_argument("--catalog", help="rebuild: build this storefront catalog's index (see CATALOGS_DIR)")
+    parser.add_argument("--shards", type=int, default=1, help="rebuild/serve-shard: split the catalog into this many shards")
+    parser.add_argument("--shard-id", type=int, default=0, help="rebuild/serve-shard: shard to build or serve (0-based)")
+    parser.add_argument(
+        "--publish-shard",
+        action="store_true",
+        help="rebuild: also publish the shard as an index of its own for serve-shard",
+    )
+    parser.add_argument(
+        "--keep-fragments",
+        action="store_true",
+        help="merge-index: keep the shard fragments after publishing",
+    )
+    parser.add_argument("--dir", help="classify-bulk: directory of images (searched recursively)")
+    parser.add_argument("--list", help="classify-bulk: file listing one image path per line")
+    parser.add_argument("--use-trained", action="store_true", help="classify-bulk: use trained attribute heads")
+    parser.add_argument("--cascade", action="store_true", help="classify-bulk: trained heads → zero-shot cascade")
+    parser.add_argument("--batch-size", type=int, default=settings.BULK_BATCH_SIZE, help="classify-bulk: images per batch")
+    parser.add_argument("--db", default=settings.CLASSIFY_DB_PATH, help="classify-bulk: SQLite results database")
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="distill: also replace heads trained on labelled data",
+    )
+    parser.add_argument("--category", help="Category for training (distill: only this category)")
     parser.add_argument("--attribute", help="Attribute for training")
+    parser.add_argument("--host", default=settings.SERVE_HOST, help="serve-prefork/serve-shard listen address")
+    parser.add_argument("--port", type=int, default=settings.SERVE_PORT, help="serve-prefork/serve-shard listen port")
+    parser.add_argument("--workers", type=int, default=settings.SERVE_WORKERS, help="serve-prefork/serve-shard worker processes")
+    parser.add_argument(
+        "--threads-per-worker",
+        type=int,
+        default=settings.SERVE_THREADS_PER_WORKER,
+        help="serve-prefork torch/ONNX/FAISS threads per worker (0 = split the cores per THREAD_PROFILE)",
+    )
     args = parser.parse_args()
 
+    # ---------- Index shard server ----------
+    if args.command == "serve-shard":
+        # Search only: no model to load, so no Container
+        shard.run_serve_shard(
+            make_vector_store(settings),
+            args.shards,
+            args.shard_id,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads_per_worker=args.threads_per_worker,
+        )
+        return
+
+    # ---------- Export heads for torch-free serving ----------
+    if args.command == "export-heads":
+        export_heads.run_export_heads()
+        return
+
     container = Container()
 
+    # ---------- Non-interactive sharded rebuild ----------
+    if args.command == "rebuild" and args.shards > 1:
+        # The preprocessed store allows a single writer, and shards run concurrently
+        rebuild.run_rebuild_shard(
+            container.embedding,
+            container.vectore_store,
+            args.shards,
+            args.shard_id,
+            args.products_dir,
+            publish=args.publish_shard,
+        )
+        return
+
+    # ---------- Non-interactive catalog rebuild ----------
+    if args.command == "rebuild" and args.catalog:
+        container.catalogs.rebuild(
+            args.catalog,
+            lambda store: rebuild.run_rebuild(
+                container.embedding,
+                store,
+                args.products_dir,
+                result_cache=container.result_cache,
+                preprocessed_store=container.preprocessed_store,
+            ),
+        )
+        return
+
     # ---------- Non-interactive rebuild ----------
     if args.command == "rebuild":
         rebuild.run_rebuild(
-            container.embedding, container.vectore_store, args.products_dir
+            container.embedding,
+            container.vectore_store,
+            args.products_dir,
+            result_cache=container.result_cache,
+            preprocessed_store=container.preprocessed_store,
         )
         return
 
+    # ---------- Merge sharded rebuild ----------
+    if args.command == "merge-index":
+        merge_index.run_merge_index(
+            container.vectore_store,
+            result_cache=container.result_cache,
+            keep_fragments=args.keep_fragments,
+        )
+        return
+
+    # ---------- Bulk classify into SQLite ----------
+    if args.command == "classify-bulk":
+        repository = SqliteClassificationRepository(args.db)
+        service = BulkClassifyService(
+            container.embedding,
+            container.cache,
+            repository,
+            mode="cascade" if args.cascade else "trained" if args.use_trained else "zeroshot",
+            batch_size=args.batch_size,
+            preprocessed_store=container.preprocessed_store,
+        )
+        try:
+            classify_bulk.run_classify_bulk(service, image_dir=args.dir, list_path=args.list)
+        finally:
+            repository.close()
+        return
+
     # ---------- Non-interactive train ----------
     if args.command == "train":
         if not args.category or not args.attribute:
             print(Msg.info("Please provide --category and --attribute for training"))
             return
-        train.run_train(args.category, args.attribute)
+        if container.preprocessed_store is not None:
+            # Train on the same preprocessed images rebuild/serve embed
+            train.run_train(
+                args.category,
+                args.attribute,
+                embedding=container.embedding,
+                preprocessed_store=container.preprocessed_store,
+            )
+        else:
+            train.run_train(args.category, args.attribute)
+        return
+
+    # ---------- Distill zero-shot into trained heads ----------
+    if args.command == "distill":
+        distill.run_distill(
+            container.embedding,
+            args.products_dir,
+            category=args.category,
+            overwrite=args.overwrite,
+            preprocessed_store=container.preprocessed_store,
+        )
+        return
+
+    # ---------- Continuous ingestion ----------
+    if args.command == "watch":
+        # serve-prefork workers and other processes only see published products, so publish
+        # more often than serve does; each publish rewrites the whole index, so not every round
+        ingest = IngestService(
+            container.embedding,
+            container.serving_index,
+            args.products_dir,
+            fold_seconds=settings.WATCH_PUBLISH_SECONDS,
+            preprocessed_store=container.preprocessed_store,
+        )
+        watch.run_watch(ingest)
+        return
+
+    # ---------- Pre-fork multi-process serve ----------
+    if args.command == "serve-prefork":
+        prefork.run_serve_prefork(
+            container,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads_per_worker=args.threads_per_worker,
+        )
         return
 
     # ---------- Interactive serve ----------
     if args.command == "serve":
+        if settings.WARMUP_ENABLED:
+            container.warmup.start()
+            print(Msg.info("Warming up in the background; run 'ready' to check progress."))
+
+        container.feedback.start()
+
+        if settings.METRICS_PORT:
+            start_metrics_server(settings.METRICS_PORT, settings.METRICS_HOST, warmup=container.warmup)
+            print(Msg.info(f"Serving metrics at http://{settings.METRICS_HOST}:{settings.METRICS_PORT}/metrics"))
+
         print(Msg.highlight("Entering interactive serve mode. Type 'exit' to quit."))
         while True:
             try:
                 command_str = input(Msg.highlight('\n>>> ')).strip()
                 if command_str.lower() in ["exit", "quit"]:
                     print(Msg.info("Exiting serve..."))
+                    if container.ingest.running:
+                        container.ingest.stop()
+                    container.cache.manifest.save()
                     break
 
                 cmd = parse_command(command_str)
@@ -125,9 +327,20 @@ def main():
 
                 # ---------- REBUILD ----------
                 if cmd["command"] == "rebuild":
+                    # Queries keep answering from the current snapshot meanwhile
                     products_dir = cmd["products_dir"] or "data/products"
-                    rebuild.run_rebuild(
-                        container.embedding, container.vectore_store, products_dir
+                    if cmd["catalog"]:
+                        vector_store = container.vectore_store.clone_empty(container.catalogs.index_path(cmd["catalog"]))
+                        serving_index = container.catalogs.index(cmd["catalog"], create=True)
+                    else:
+                        vector_store, serving_index = container.vectore_store, container.serving_index
+                    rebuild.start_background_rebuild(
+                        container.embedding,
+                        vector_store,
+                        serving_index,
+                        products_dir,
+                        result_cache=container.result_cache,
+                        preprocessed_store=container.preprocessed_store,
                     )
 
                 # ---------- QUERY ----------
@@ -137,12 +350,27 @@ def main():
                         print(Msg.alert("Please provide valid --image for query"))
                         continue
 
-                    if not os.path.exists(settings.FAISS_INDEX_PATH):
+                    if cmd["catalog"]:
+                        try:
+                            serving_index = container.catalogs.index(cmd["catalog"])
+                        except KeyError as e:
+                            print(Msg.alert(f"{e.args[0]}. Run 'rebuild --catalog {cmd['catalog']}' first."))
+                            continue
+                    elif container.shards is None and not index_exists(settings.FAISS_INDEX_PATH):
                         print(Msg.alert("FAISS index not found. Rebuild index first."))
                         continue
+                    else:
+                        serving_index = container.serving_index
 
                     query.run_query(
-                        container.recommender, container.vectore_store, img_path
+                        container.recommender,
+                        container.vectore_store,
+                        img_path,
+                        expand_duplicates=cmd["expand_duplicates"],
+                        result_cache=container.result_cache,
+                        serving_index=serving_index,
+                        shards=None if cmd["catalog"] else container.shards,
+                        catalog=cmd["catalog"],
                     )
 
                 # ---------- CLASSIFY ----------
@@ -155,7 +383,12 @@ def main():
                         continue
 
                     classify.run_classify(
-                        container.embedding, container.cache, img_path, use_trained
+                        container.embedding,
+                        container.cache,
+                        img_path,
+                        use_trained,
+                        result_cache=container.result_cache,
+                        cascade=cmd["cascade"],
                     )
 
                 # ---------- CACHE ----------
@@ -165,13 +398,47 @@ def main():
                         container.cache,
                         sub_command=cmd["cache_action"],
                         key=cmd["cache_key"],
+                        result_cache=container.result_cache,
                     )
 
+                # ---------- STATS ----------
+                elif cmd["command"] == "stats":
+                    stats.run_stats(timings, reset=cmd["stats_reset"])
+
+                # ---------- MEMORY ----------
+                elif cmd["command"] == "memory":
+                    memory.run_memory(container.memory_report, top=cmd["top"])
+
+                # ---------- FEEDBACK ----------
+                elif cmd["command"] == "feedback":
+                    feedback.run_feedback(
+                        container.feedback,
+                        img_path=cmd["image"],
+                        category=cmd["category"],
+                        attribute=cmd["attribute"],
+                        label=cmd["label"],
+                    )
+
+                # ---------- WATCH ----------
+                elif cmd["command"] == "watch":
+                    watch.run_watch_interactive(
+                        container.ingest,
+                        action=cmd["watch_action"],
+                        products_dir=cmd["products_dir"],
+                    )
+
+                # ---------- READY ----------
+                elif cmd["command"] == "ready":
+                    ready.run_ready(container.warmup)
+
                 else:
                     print(Msg.alert(f"Unknown command: {cmd['command']}"))
 
             except KeyboardInterrupt:
                 print(Msg.info("\nExiting serve..."))
+                if container.ingest.running:
+                    container.ingest.stop()
+                container.cache.manifest.save()
                 break
 
 
@@ -0,0 +1,246 @@
+import os
+import json
+
+import numpy as np
+import pytest
+import torch
+
+from app.infrastructure.cache.chache import Cache
+from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+from app.infrastructure.feedback.feedback_log import FeedbackLog
+from app.models.attribute_head import AttributeHead
+from app.models.numpy_attribute_head import NumpyAttributeHead
+from app.services.cascade_attribute_service import CascadeAttributeService
+from app.services.feedback_service import FeedbackService
+from app.services.product_attribute_service import ProductAttributeService
+from app.training.calibration import calibrate_threshold
+from app.training.distill_attributes import distill_attributes
+from app.training.train_attribute import save_head
+from benchmarks.synthetic import make_product_images, write_product_images
+
+
+# --------------------------------------------
+# Threshold calibration
+# --------------------------------------------
+
+
+class TestCalibrateThreshold:
+    def test_picks_lowest_threshold_meeting_target(self):
+        confidences = [0.95, 0.9, 0.8, 0.7, 0.6, 0.5]
+        correct = [1, 1, 1, 1, 0, 0]
+
+        result = calibrate_threshold(confidences, correct, target_accuracy=0.8)
+
+        assert result["threshold"] == 0.6
+        assert result["coverage"] == pytest.approx(5 / 6)
+        assert result["accuracy"] == pytest.approx(0.8)
+
+    def test_never_cuts_between_ties(self):
+        # Accepting 0.9 accepts both 0.9 samples, so accuracy there is 2/3
+        result = calibrate_threshold([0.99, 0.9, 0.9], [1, 1, 0], target_accuracy=0.9)
+        assert result["threshold"] == 0.99
+
+    def test_unreachable_target(self):
+        result = calibrate_threshold([0.9, 0.8], [0, 0], target_accuracy=0.5)
+        assert result["threshold"] is None and result["coverage"] == 0.0
+
+
+# --------------------------------------------
+# Cascade
+# --------------------------------------------
+
+
+def write_head(root, category, attribute, classes, scale, calibration=None):
+    """A head whose top logit is `scale` above the rest for every input."""
+    head = AttributeHead(embedding_dim=512, num_classes=len(classes))
+    with torch.no_grad():
+        head.classifier.weight.zero_()
+        head.classifier.bias.zero_()
+        head.classifier.bias[0] = scale
+
+    model_dir = root / "models" / category / attribute
+    model_dir.mkdir(parents=True)
+    torch.save(head.state_dict(), model_dir / "model.pt")
+    (model_dir / "classes.json").write_text(json.dumps(dict(enumerate(classes))))
+    if calibration is not None:
+        (model_dir / "calibration.json").write_text(json.dumps(calibration))
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "product.jpg"
+    make_product_images(1)[0].save(path)
+    return str(path)
+
+
+class TestCascadeAttributeService:
+    def test_confident_heads_skip_zero_shot(self, tmp_path, monkeypatch, image_path):
+        write_head(tmp_path, "shoe", "type", ["sneaker", "boot"], scale=10.0, calibration={"threshold": 0.8})
+        write_head(tmp_path, "shoe", "color", ["black", "white"], scale=0.1, calibration={"threshold": 0.8})
+        write_head(tmp_path, "shoe", "width", ["narrow", "wide"], scale=0.1, calibration={"threshold": None})
+        monkeypatch.chdir(tmp_path)
+
+        embedding = DummyEmbeddingModel(dimension=512)
+        zero_shot_calls = []
+        original = embedding.classify_img_zeroshot
+
+        def classify_img_zeroshot(img_path, labels):
+            zero_shot_calls.append(labels[0])
+            return original(img_path, labels)
+
+        monkeypatch.setattr(embedding, "classify_img_zeroshot", classify_img_zeroshot)
+
+        results = CascadeAttributeService(embedding, Cache()).classify(image_path, category="shoe")
+
+        assert results["type"] == {"value": "sneaker", "confidence": pytest.approx(1.0, abs=1e-3), "source": "trained"}
+        # Below threshold → zero-shot
+        assert results["color"]["source"] == "zero_shot"
+        # No zero-shot prompts to fall back to → low-confidence head is kept
+        assert results["width"]["source"] == "trained"
+        # Attributes without a head are covered by zero-shot
+        assert results["gender"]["source"] == "zero_shot"
+        assert results["age_group"]["source"] == "zero_shot"
+
+        assert len(zero_shot_calls) == 3
+
+    def test_uncalibrated_head_uses_default_threshold(self, tmp_path, monkeypatch, image_path):
+        write_head(tmp_path, "bag", "style", ["casual", "formal"], scale=10.0)
+        monkeypatch.chdir(tmp_path)
+
+        results = CascadeAttributeService(DummyEmbeddingModel(dimension=512), Cache()).classify(image_path, "bag")
+
+        assert results["style"]["source"] == "trained"
+        assert results["type"]["source"] == "zero_shot"
+
+
+# --------------------------------------------
+# Online feedback updates
+# --------------------------------------------
+
+
+def random_embeddings(n, seed):
+    vectors = np.random.default_rng(seed).standard_normal((n, 512)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestFeedback:
+    def test_log_round_trip_ignores_partial_record(self, tmp_path):
+        log = FeedbackLog(str(tmp_path))
+        vectors = random_embeddings(3, seed=0)
+
+        for vector, label in zip(vectors, ["red", "blue", "red"]):
+            log.append("shoe", "color", vector, label)
+        with open(tmp_path / "shoe" / "color" / "records.bin", "ab") as f:
+            f.write(b"\0" * 10)
+
+        embeddings, labels = log.read("shoe", "color", 1)
+        assert log.count("shoe", "color") == 3
+        assert labels == ["blue", "red"]
+        np.testing.assert_allclose(embeddings, vectors[1:], atol=1e-3)
+        assert log.attributes() == [("shoe", "color")]
+
+    def test_corrections_update_head_and_survive_later_updates(self, tmp_path, monkeypatch):
+        write_head(tmp_path, "shoe", "color", ["black", "white"], scale=2.0)
+        monkeypatch.chdir(tmp_path)
+
+        cache = Cache()
+        service = FeedbackService(DummyEmbeddingModel(dimension=512), cache, FeedbackLog("feedback"), steps=30)
+        served = ProductAttributeService(DummyEmbeddingModel(dimension=512), cache)
+
+        white, red = random_embeddings(4, seed=1), random_embeddings(4, seed=2)
+        embeddings = lambda vectors: torch.from_numpy(vectors)
+
+        assert [p["value"] for p in served.predict_batch(embeddings(white), "shoe", "color")] == ["black"] * 4
+        held = served.head("shoe", "color")
+
+        for vector in white:
+            service.record_embedding(vector, "shoe", "color", "white")
+        assert service.update("shoe", "color")["applied"] == 4
+        assert [p["value"] for p in served.predict_batch(embeddings(white), "shoe", "color")] == ["white"] * 4
+
+        # A new label adds a class; replayed corrections keep theirs
+        for vector in red:
+            service.record_embedding(vector, "shoe", "color", "red")
+        assert service.update("shoe", "color")["classes"] == 3
+        assert [p["value"] for p in served.predict_batch(embeddings(red), "shoe", "color")] == ["red"] * 4
+        assert [p["value"] for p in served.predict_batch(embeddings(white), "shoe", "color")] == ["white"] * 4
+        assert service.update("shoe", "color") is None
+
+        # The head held before publishing is untouched; a fresh process loads the published one
+        assert held[0].classifier.weight.shape[0] == 2
+        fresh = ProductAttributeService(DummyEmbeddingModel(dimension=512), Cache())
+        assert [p["value"] for p in fresh.predict_batch(embeddings(red), "shoe", "color")] == ["red"] * 4
+
+
+# --------------------------------------------
+# Distillation from zero-shot
+# --------------------------------------------
+
+
+class TestDistill:
+    def test_heads_follow_zero_shot_and_keep_labelled_heads(self, tmp_path, monkeypatch):
+        write_head(tmp_path, "shoe", "color", ["black", "white"], scale=10.0)
+        monkeypatch.chdir(tmp_path)
+        paths = write_product_images(str(tmp_path / "products"), 120)
+        embedding = DummyEmbeddingModel(dimension=512)
+
+        results = distill_attributes(embedding, paths, min_confidence=0.5, min_class_samples=3)
+
+        # A head trained on labelled data is never replaced by pseudo-labels
+        assert "skipped" in results["shoe/color"]
+        assert json.loads((tmp_path / "models/shoe/color/classes.json").read_text()) == {"0": "black", "1": "white"}
+
+        style = results["bag/style"]
+        assert style["pseudo_labels"] <= style["images"] and style["agreement"] > 0.8
+        assert json.loads((tmp_path / "models/bag/style/distill.json").read_text())["classes"] == style["classes"]
+
+        # Served like any trained head, with the values zero-shot would give
+        service = ProductAttributeService(embedding, Cache())
+        predictions = service.classify_batch(service.embed_batch(paths[:8]), "bag")
+        assert {p["style"]["value"] for p in predictions} <= set(style["classes"])
+
+
+# --------------------------------------------
+# NumPy head runtime
+# --------------------------------------------
+
+
+class TestNumpyHead:
+    def test_export_predicts_like_torch(self, tmp_path, monkeypatch):
+        torch.manual_seed(0)
+        head = AttributeHead(embedding_dim=512, num_classes=7)
+        with torch.no_grad():
+            head.classifier.weight.mul_(40.0)
+        head.eval()
+        save_head(str(tmp_path / "models/shoe/color"), head, {i: f"c{i}" for i in range(7)}, None)
+        monkeypatch.chdir(tmp_path)
+
+        x = random_embeddings(64, seed=1)
+        with torch.no_grad():
+            confidences, predicted = torch.softmax(head(torch.from_numpy(x)), dim=1).max(dim=1)
+
+        service = ProductAttributeService(DummyEmbeddingModel(dimension=512), Cache())
+        assert isinstance(service.head("shoe", "color")[0], NumpyAttributeHead)
+
+        # Same values and confidences from NumPy arrays and from tensors
+        for batch in (x, torch.from_numpy(x)):
+            predictions = service.predict_batch(batch, "shoe", "color")
+            assert [p["value"] for p in predictions] == [f"c{i}" for i in predicted.tolist()]
+            np.testing.assert_allclose([p["confidence"] for p in predictions], confidences.numpy(), rtol=1e-5)
+
+    def test_stale_export_falls_back_to_model_pt(self, tmp_path, monkeypatch):
+        write_head(tmp_path, "shoe", "color", ["black", "white"], scale=10.0)
+        model_dir = tmp_path / "models/shoe/color"
+        NumpyAttributeHead(np.zeros((2, 512)), np.array([0.0, 10.0])).save(str(model_dir / "model.npz"))
+        monkeypatch.chdir(tmp_path)
+        x = random_embeddings(2, seed=0)
+
+        served = ProductAttributeService(DummyEmbeddingModel(dimension=512), Cache())
+        assert [p["value"] for p in served.predict_batch(x, "shoe", "color")] == ["white"] * 2
+
+        # model.pt retrained after the export: the export no longer describes it
+        exported = (model_dir / "model.npz").stat().st_mtime_ns
+        os.utime(model_dir / "model.pt", ns=(exported + 10**9, exported + 10**9))
+        fresh = ProductAttributeService(DummyEmbeddingModel(dimension=512), Cache())
+        assert isinstance(fresh.head("shoe", "color")[0], AttributeHead)
+        assert [p["value"] for p in fresh.predict_batch(x, "shoe", "color")] == ["black"] * 2
@@ -0,0 +1,80 @@
+import shutil
+
+import pytest
+
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.cache.chache import Cache
+from app.infrastructure.database.sqlite_repository import SqliteClassificationRepository
+from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+from app.services.bulk_classify_service import BulkClassifyService
+from benchmarks.synthetic import make_product_images
+from cli.commands import classify
+from tests.test_attribute_services import write_head
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for i, image in enumerate(make_product_images(10)):
+        path = tmp_path / "feed" / f"img_{i:02d}.jpg"
+        path.parent.mkdir(exist_ok=True)
+        image.save(path)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = SqliteClassificationRepository(str(tmp_path / "results.db"))
+    yield repository
+    repository.close()
+
+
+@pytest.mark.parametrize("mode", ["zeroshot", "trained", "cascade"])
+def test_batched_results_match_single_image_classify(tmp_path, monkeypatch, images, repository, mode):
+    write_head(tmp_path, "shoe", "type", ["sneaker", "boot"], scale=10.0, calibration={"threshold": 0.8})
+    write_head(tmp_path, "shoe", "color", ["black", "white"], scale=0.1, calibration={"threshold": 0.8})
+    write_head(tmp_path, "bag", "style", ["casual", "formal"], scale=0.1)
+    monkeypatch.chdir(tmp_path)
+
+    embedding = DummyEmbeddingModel(dimension=512)
+    service = BulkClassifyService(embedding, Cache(), repository, mode=mode, batch_size=4)
+    stats = service.run(images)
+    assert stats["classified"] == len(images) and not stats["failed"]
+
+    for path in images:
+        category, confidence, attributes = classify.classify(
+            embedding, Cache(), path, use_trained=mode == "trained", cascade=mode == "cascade"
+        )
+        row = repository.get(CacheKeys.content_hash(path), mode)
+
+        assert row["category"] == category
+        assert row["category_confidence"] == pytest.approx(confidence, abs=1e-5)
+        assert row["attributes"].keys() == attributes.keys()
+        for name, info in attributes.items():
+            assert row["attributes"][name]["value"] == info["value"]
+            assert row["attributes"][name]["confidence"] == pytest.approx(info["confidence"], abs=1e-5)
+            assert row["attributes"][name].get("source") == info.get("source")
+
+
+def test_resumes_and_skips_known_content(tmp_path, images, repository):
+    embedding = DummyEmbeddingModel(dimension=512)
+    forwards = []
+    original = embedding.zeroshot_image_features
+    embedding.zeroshot_image_features = lambda paths: forwards.append(len(paths)) or original(paths)
+
+    BulkClassifyService(embedding, Cache(), repository, batch_size=4).run(images[:6])
+    assert forwards == [4, 2]
+
+    # A renamed copy, a missing file and a corrupt file alongside the rest
+    shutil.copy(images[0], tmp_path / "copy.jpg")
+    (tmp_path / "corrupt.jpg").write_bytes(b"not an image")
+    feed = images + [str(tmp_path / "copy.jpg"), str(tmp_path / "missing.jpg"), str(tmp_path / "corrupt.jpg")]
+
+    forwards.clear()
+    stats = BulkClassifyService(embedding, Cache(), repository, batch_size=4).run(feed)
+
+    assert stats["classified"] == 4
+    assert stats["skipped"] == 7
+    assert sorted(path for path, _ in stats["failed"]) == [str(tmp_path / "corrupt.jpg"), str(tmp_path / "missing.jpg")]
+    assert repository.count("zeroshot") == 10
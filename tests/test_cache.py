@@ -0,0 +1,329 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.infrastructure.cache.cache_keys import CacheKeys
+from app.infrastructure.cache.chache import Cache
+from app.infrastructure.cache.providers.memory_cache import MemoryCache
+from app.infrastructure.cache.single_flight import SingleFlight
+from app.infrastructure.cache.warmup_manifest import WarmupManifest
+from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+from app.interfaces.cache import I_Cache
+from app.services.result_cache_service import ResultCacheService
+from app.services.serving_index import LoadedIndex
+from app.services.warmup_service import WarmupService
+from cli.commands.query import run_query
+
+
+# --------------------------------------------
+# Result cache
+# --------------------------------------------
+
+
+class TestResultCacheService:
+    def test_computes_once_and_counts_hits(self):
+        rc = ResultCacheService(Cache())
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return ["result"]
+
+        assert rc.get_or_compute("query_result:a", compute) == (["result"], False)
+        assert rc.get_or_compute("query_result:a", compute) == (["result"], True)
+        assert len(calls) == 1
+        assert rc.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+    def test_version_change_invalidates(self):
+        cache = Cache()
+        rc = ResultCacheService(cache)
+        cache.set("query_result:a", 1)
+        cache.set("embedding:a", 2)
+
+        rc.track_version("index", "v1", ResultCacheService.QUERY_PREFIX)
+        assert cache.get("query_result:a") == 1
+
+        rc.track_version("index", "v2", ResultCacheService.QUERY_PREFIX)
+        assert cache.get("query_result:a") is None
+        assert cache.get("embedding:a") == 2
+
+    def test_query_tracks_index_version_per_catalog(self, tmp_path):
+        image = tmp_path / "q.jpg"
+        image.write_bytes(b"query")
+
+        class Recommender:
+            embedding_model = DummyEmbeddingModel(dimension=4)
+
+            def recommend(self, img_path, vector_store, rerank_k=None):
+                return [0], [0.0]
+
+        class Serving:
+            def refresh(self, wait=True):
+                return False
+
+            def current(self):
+                return LoadedIndex("v1", None, ({"0": "p0.jpg"}, {}))
+
+        tracked = []
+        rc = ResultCacheService(Cache())
+        rc.track_version = lambda name, version, *prefixes: tracked.append((name, version))
+
+        run_query(Recommender(), None, str(image), result_cache=rc, serving_index=Serving())
+        run_query(Recommender(), None, str(image), result_cache=rc, serving_index=Serving(), catalog="acme")
+
+        assert tracked == [("index", "v1"), ("index:acme", "v1")]
+
+    def test_models_version_is_rescanned_after_max_age_or_a_publish(self, tmp_path):
+        models = tmp_path / "models" / "shoe" / "color"
+        models.mkdir(parents=True)
+        (models / "model.npz").write_bytes(b"v1")
+
+        version = ResultCacheService.models_version(str(tmp_path / "models"), max_age=60)
+        (models / "classes.json").write_text("{}")
+        # Reused within max_age...
+        assert ResultCacheService.models_version(str(tmp_path / "models"), max_age=60) == version
+        assert ResultCacheService.models_version(str(tmp_path / "models"), max_age=0) != version
+
+        # ...unless this process published a head
+        (models / "calibration.json").write_text("{}")
+        ResultCacheService.models_changed(str(tmp_path / "models"))
+        assert ResultCacheService.models_version(str(tmp_path / "models"), max_age=60).endswith("-3")
+
+    def test_key_changes_with_content_and_version(self, tmp_path):
+        a, b = tmp_path / "a.jpg", tmp_path / "b.jpg"
+        a.write_bytes(b"same bytes")
+        b.write_bytes(b"same bytes")
+
+        hash_a, hash_b = CacheKeys.content_hash(str(a)), CacheKeys.content_hash(str(b))
+        assert hash_a == hash_b
+
+        key = CacheKeys.query_result(hash_a, "clip|pre", 5, "v1")
+        assert key != CacheKeys.query_result(hash_a, "clip|pre", 5, "v2")
+        assert key != CacheKeys.query_result(hash_a, "clip|other", 5, "v1")
+        assert key != CacheKeys.query_result(hash_a, "clip|pre", 10, "v1")
+
+
+# --------------------------------------------
+# Concurrency
+# --------------------------------------------
+
+
+def _run_concurrently(fn, n=8):
+    barrier = threading.Barrier(n)
+    results, errors = [None] * n, []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return results, errors
+
+
+class TestSingleFlight:
+    def test_concurrent_misses_load_once(self):
+        cache = Cache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return "model"
+
+        results, errors = _run_concurrently(lambda: cache.get_or_load("attribute_model:shoe:color", loader))
+
+        assert not errors
+        assert results == ["model"] * 8
+        assert len(calls) == 1
+        assert cache.get("attribute_model:shoe:color") == "model"
+
+    def test_error_reaches_every_waiter_and_is_not_cached(self):
+        flight = SingleFlight()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            raise RuntimeError("boom")
+
+        _, errors = _run_concurrently(lambda: flight.do("k", loader))
+
+        assert len(errors) == 8 and all(isinstance(e, RuntimeError) for e in errors)
+        assert len(calls) == 1
+
+        with pytest.raises(RuntimeError):
+            flight.do("k", loader)
+        assert len(calls) == 2
+
+    def test_none_is_not_cached(self):
+        cache = Cache()
+        assert cache.get_or_load("attribute_model:shoe:size", lambda: None) is None
+        assert "attribute_model:shoe:size" not in cache.keys()
+
+    def test_result_cache_counts_waiters_as_hits(self):
+        rc = ResultCacheService(Cache())
+
+        def compute():
+            time.sleep(0.05)
+            return ["result"]
+
+        results, errors = _run_concurrently(lambda: rc.get_or_compute("query_result:a", compute))
+
+        assert not errors
+        assert sum(not cached for _, cached in results) == 1
+        assert rc.stats()["misses"] == 1 and rc.stats()["hits"] == 7
+
+
+class TestBulkOperations:
+    @pytest.mark.parametrize("make_cache", [MemoryCache, Cache])
+    def test_many_prefix_and_count(self, make_cache):
+        cache = make_cache()
+        cache.set_many({
+            CacheKeys.attribute_model(category="shoe", attribute="color"): "color head",
+            CacheKeys.attribute_model(category="shoe", attribute="style"): "style head",
+            CacheKeys.attribute_model(category="bag", attribute="color"): "bag head",
+        })
+
+        keys = [CacheKeys.attribute_model(category="shoe", attribute=a) for a in ("color", "style", "size")]
+        assert cache.get_many(keys) == {keys[0]: "color head", keys[1]: "style head"}
+        assert cache.contains(keys[0]) and not cache.contains(keys[2])
+        assert cache.count("attribute_model:shoe:") == 2
+        assert cache.count() == 3
+
+        assert cache.delete_prefix("attribute_model:shoe:") == 2
+        assert cache.keys() == [CacheKeys.attribute_model(category="bag", attribute="color")]
+        assert cache.info()["num_entries"] == 1
+
+    def test_interface_defaults_match_native(self):
+        # A provider implementing only the abstract methods gets working bulk operations
+        class Minimal(I_Cache):
+            def __init__(self):
+                self.store = {}
+            def get(self, key):
+                return self.store.get(key)
+            def set(self, key, value):
+                self.store[key] = value
+            def delete(self, key):
+                self.store.pop(key, None)
+            def keys(self):
+                return list(self.store)
+            def clear(self):
+                self.store.clear()
+            def info(self):
+                return {}
+
+        cache = Minimal()
+        cache.set_many({"a:1": 1, "a:2": 2, "b:1": 3})
+        assert cache.get_many(["a:1", "b:2"]) == {"a:1": 1}
+        assert cache.count("a:") == 2 and cache.contains("b:1")
+        assert cache.delete_prefix("a:") == 2 and cache.keys() == ["b:1"]
+
+
+class TestMemoryCacheConcurrency:
+    def test_info_while_writing(self):
+        cache = MemoryCache()
+        stop = threading.Event()
+        errors = []
+
+        def writer():
+            i = 0
+            while not stop.is_set():
+                cache.set(f"embedding:{i}", [i] * 10)
+                cache.delete(f"embedding:{i - 50}")
+                i += 1
+
+        def reader():
+            try:
+                for _ in range(200):
+                    cache.info()
+            except Exception as e:
+                errors.append(e)
+
+        w = threading.Thread(target=writer)
+        w.start()
+        reader()
+        stop.set()
+        w.join()
+
+        assert not errors
+
+
+# --------------------------------------------
+# Warmup
+# --------------------------------------------
+
+
+class TestWarmupManifest:
+    def test_records_counts_and_sizes_through_cache(self, tmp_path):
+        manifest = WarmupManifest(str(tmp_path / "manifest.json"), flush_every=0)
+        cache = Cache(manifest=manifest)
+
+        for _ in range(3):
+            cache.get_or_load("attribute_model:shoe:color", lambda: np.zeros(256, dtype="float32"))
+        cache.get_or_load("attribute_model:bag:style", lambda: np.zeros(16, dtype="float32"))
+        # Bulk hits count too; misses don't
+        cache.get_many(["attribute_model:shoe:color", "attribute_model:hat:type"])
+
+        assert manifest.entries() == [
+            ("attribute_model:shoe:color", 4, 1024),
+            ("attribute_model:bag:style", 1, 64),
+        ]
+
+    def test_plan_respects_budget(self, tmp_path):
+        manifest = WarmupManifest(str(tmp_path / "manifest.json"), flush_every=0)
+        for key, count, nbytes in [("a:1", 5, 600), ("a:2", 4, 600), ("a:3", 3, 300)]:
+            for _ in range(count):
+                manifest.record(key, nbytes)
+
+        assert manifest.plan(budget_bytes=1000) == ["a:1", "a:3"]
+
+    def test_save_merges_counts_from_other_processes(self, tmp_path):
+        path = str(tmp_path / "manifest.json")
+        first, second = WarmupManifest(path, flush_every=0), WarmupManifest(path, flush_every=0)
+
+        first.record("a:1")
+        second.record("a:1")
+        second.record("a:2")
+        first.save()
+        second.save()
+
+        assert dict((k, c) for k, c, _ in WarmupManifest(path).entries()) == {"a:1": 2, "a:2": 1}
+
+
+class TestWarmupService:
+    def test_preloads_planned_keys_and_becomes_ready(self, tmp_path):
+        manifest = WarmupManifest(str(tmp_path / "manifest.json"), flush_every=0)
+        manifest.record("attribute_model:shoe:color", 10)
+        manifest.record("unknown:key", 10)
+        manifest.record("attribute_model:shoe:type", 10)
+        manifest.record("attribute_model:shoe:type")
+
+        loaded = []
+
+        def loader(key):
+            if key.endswith("type"):
+                raise OSError("missing")
+            loaded.append(key)
+
+        embedding = DummyEmbeddingModel(dimension=16)
+        warmup = WarmupService(manifest, {"attribute_model:": loader}, embedding=embedding, batch_sizes=[1, 4])
+
+        assert not warmup.ready
+        warmup.start()
+        assert warmup.wait(timeout=10)
+
+        status = warmup.status()
+        assert status["state"] == "ready"
+        assert loaded == ["attribute_model:shoe:color"]
+        assert (status["planned"], status["loaded"], status["skipped"]) == (3, 1, 1)
+        assert status["failed"] == ["attribute_model:shoe:type"]
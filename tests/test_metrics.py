@@ -0,0 +1,51 @@
+from app.infrastructure.metrics.timing import StageTimings
+
+
+class TestStageTimings:
+    def test_percentiles_over_rolling_window(self):
+        timings = StageTimings(window=100)
+        for ms in range(1, 201):
+            timings.record("clip.forward", ms / 1000)
+
+        stats = timings.snapshot()["clip.forward"]
+        assert stats["count"] == 200
+        # Only the last 100 samples (101..200 ms) are in the window
+        assert 149 <= stats["p50_ms"] <= 152
+        assert stats["p99_ms"] <= 200
+
+    def test_span_records_duration(self):
+        timings = StageTimings()
+        with timings.span("faiss.search"):
+            pass
+
+        assert timings.snapshot()["faiss.search"]["count"] == 1
+        assert 'stage_latency_seconds_count{stage="faiss.search"} 1' in timings.render_text()
+
+    def test_disabled_records_nothing(self):
+        timings = StageTimings(enabled=False)
+        with timings.span("faiss.search"):
+            pass
+
+        assert timings.snapshot() == {}
+
+
+class TestEstimateBytes:
+    def test_arrays_and_memmaps(self, tmp_path):
+        import numpy as np
+
+        from app.infrastructure.metrics.memory import estimate_bytes
+
+        array = np.zeros((100, 512), dtype="float32")
+        assert estimate_bytes(array) == 100 * 512 * 4
+
+        np.save(tmp_path / "v.npy", array)
+        assert estimate_bytes(np.load(tmp_path / "v.npy", mmap_mode="r")) == 0
+
+    def test_torch_module_parameters(self):
+        import pytest
+
+        torch = pytest.importorskip("torch")
+        from app.infrastructure.metrics.memory import estimate_bytes
+
+        head = torch.nn.Linear(512, 8)
+        assert estimate_bytes(head) == (512 * 8 + 8) * 4
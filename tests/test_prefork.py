@@ -0,0 +1,392 @@
+import os
+import sys
+import time
+import signal
+import socket
+import threading
+import multiprocessing
+from types import SimpleNamespace
+
+import pytest
+
+from app.infrastructure.cache.chache import Cache
+from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+from app.infrastructure.metrics.timing import timings
+from app.infrastructure.preprocessing.passthrough_preprocessor import PassthroughPreprocessor
+from app.infrastructure.runtime.thread_topology import ThreadTopology, plan_threads
+from app.infrastructure.serving.prefork import PreforkServer, send_request
+from app.services.load_shedder import LoadShedder
+from benchmarks.synthetic import make_product_images
+from cli.commands.prefork import make_request_handler
+
+
+fork_only = pytest.mark.skipif(not hasattr(os, "fork"), reason="pre-fork serving needs os.fork")
+
+
+def echo_handler(request: dict) -> dict:
+    if request.get("command") == "fail":
+        raise ValueError("boom")
+    return {"pid": os.getpid(), "echo": request}
+
+
+@pytest.fixture
+def server():
+    server = PreforkServer(echo_handler, host="127.0.0.1", port=0, workers=2)
+    host, port = server.bind()
+
+    master = multiprocessing.get_context("fork").Process(target=server.serve_forever)
+    master.start()
+    yield host, port, master
+
+    os.kill(master.pid, signal.SIGTERM)
+    master.join(timeout=10)
+    assert master.exitcode == 0
+
+
+def worker_pids(host, port, attempts=40) -> set[int]:
+    return {send_request(host, port, {"command": "ping"})["pid"] for _ in range(attempts)}
+
+
+@fork_only
+def test_requests_served_by_forked_workers(server):
+    host, port, master = server
+
+    response = send_request(host, port, {"command": "ping", "n": 1})
+    assert response["echo"] == {"command": "ping", "n": 1}
+    assert response["pid"] != master.pid
+
+
+@fork_only
+def test_handler_errors_are_returned(server):
+    host, port, _ = server
+    assert send_request(host, port, {"command": "fail"}) == {"error": "ValueError: boom"}
+
+
+@fork_only
+def test_master_restarts_dead_workers(server):
+    host, port, _ = server
+    pid = send_request(host, port, {"command": "ping"})["pid"]
+
+    os.kill(pid, signal.SIGKILL)
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            pids = worker_pids(host, port, attempts=10)
+        except ConnectionResetError:
+            # Accepted by the worker in the instant before SIGKILL landed
+            pids = {pid}
+        if pid not in pids:
+            break
+        time.sleep(0.2)
+
+    assert pid not in pids
+    assert send_request(host, port, {"command": "ping"})["pid"] != pid
+
+
+def test_thread_plans_split_cores_between_workers_and_requests():
+    latency = plan_threads("latency", cores=16, workers=4, concurrency=2)
+    assert (latency.torch, latency.onnx, latency.faiss) == (4, 4, 4)
+    assert (latency.torch_interop, latency.onnx_inter) == (1, 1)
+
+    throughput = plan_threads("throughput", cores=16, workers=4, concurrency=2)
+    assert (throughput.torch, throughput.onnx, throughput.faiss) == (2, 2, 2)
+    assert not throughput.spin
+
+    # Never below one thread, however many workers share the cores
+    assert plan_threads("throughput", cores=2, workers=8, concurrency=4).torch == 1
+
+    with pytest.raises(ValueError):
+        plan_threads("fastest", cores=4)
+
+
+def test_explicit_threads_per_worker_sets_the_worker_budget():
+    server = PreforkServer(echo_handler, workers=3, threads_per_worker=2)
+    assert server.thread_budget().torch == 2
+
+    # Otherwise the cores are split between the workers
+    assert PreforkServer(echo_handler, workers=64).thread_budget().torch >= 1
+
+
+def test_topology_pins_torch_faiss_and_onnx_sessions(monkeypatch):
+    torch = pytest.importorskip("torch")
+    faiss = pytest.importorskip("faiss")
+    ort = pytest.importorskip("onnxruntime")
+
+    previous = (torch.get_num_threads(), faiss.omp_get_max_threads())
+    # apply() writes these; registering them with monkeypatch restores (or removes) them afterwards
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        monkeypatch.setenv(var, os.environ.get(var, "1"))
+    topology = ThreadTopology()
+    assert topology.onnx_session_options() is None
+
+    try:
+        topology.apply(plan_threads("throughput", cores=4, workers=2, concurrency=1))
+        assert torch.get_num_threads() == 2
+        assert faiss.omp_get_max_threads() == 2
+        assert os.environ["OMP_NUM_THREADS"] == "2"
+
+        options = topology.onnx_session_options()
+        assert (options.intra_op_num_threads, options.inter_op_num_threads) == (2, 1)
+        assert options.execution_mode == ort.ExecutionMode.ORT_SEQUENTIAL
+        assert options.get_session_config_entry("session.intra_op.allow_spinning") == "0"
+    finally:
+        torch.set_num_threads(previous[0])
+        faiss.omp_set_num_threads(previous[1])
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="accept queue length comes from Linux TCP_INFO")
+def test_backlog_counts_connections_waiting_to_be_accepted():
+    server = PreforkServer(echo_handler, port=0, workers=1)
+    host, port = server.bind()
+    assert server.backlog() == 0
+
+    clients = [socket.create_connection((host, port)) for _ in range(3)]
+    try:
+        deadline = time.monotonic() + 5
+        while server.backlog() < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert server.backlog() == 3
+    finally:
+        for client in clients:
+            client.close()
+        server.sock.close()
+
+
+class TestLoadShedder:
+    @pytest.fixture(autouse=True)
+    def clean_timings(self):
+        timings.reset()
+        yield
+        timings.reset()
+
+    def test_degrades_step_by_step_as_pressure_rises(self):
+        depth = {"value": 0}
+        shedder = LoadShedder(queue_depth=lambda: depth["value"], workers=2)
+        for _ in range(20):
+            shedder.record("query", 0, 0.100)
+        # rembg is most of a full request; the re-rank barely matters
+        timings.record("preprocess.remove_bg", 0.060)
+        timings.record("faiss.rerank", 0.010)
+
+        assert shedder.plan("query", budget_ms=0) == 0
+        assert shedder.plan("query", budget_ms=150) == 0
+        assert shedder.plan("query", budget_ms=50) == 1
+
+        # Two queued connections per worker: three requests deep
+        depth["value"] = 4
+        assert shedder.plan("query", budget_ms=150) == 1
+        assert shedder.plan("query", budget_ms=100) == 2
+
+        # Nothing fits: the cheapest level, rather than an unbounded wait
+        assert shedder.plan("query", budget_ms=10) == 3
+        # Time already spent in transit counts against the budget
+        depth["value"] = 0
+        assert shedder.plan("query", budget_ms=150, waited_ms=120) == 3
+
+    def test_observed_latency_of_a_level_overrides_the_estimate(self):
+        shedder = LoadShedder()
+        for _ in range(20):
+            shedder.record("query", 0, 0.100)
+            shedder.record("query", 1, 0.080)
+        timings.record("preprocess.remove_bg", 0.060)
+
+        assert shedder.plan("query", budget_ms=50) == 3
+        assert shedder.status()["served"] == {
+            "full": 20, "no_bg_removal": 20, "shallow_search": 0, "no_zeroshot_attributes": 0
+        }
+
+    def test_old_samples_expire(self):
+        shedder = LoadShedder(window=0.05)
+        shedder.record("query", 0, 1.0)
+        assert shedder.plan("query", budget_ms=100) == 3
+
+        time.sleep(0.1)
+        assert shedder.plan("query", budget_ms=100) == 0
+        assert shedder.status()["recent"] == {}
+
+
+def test_responses_are_tagged_with_their_degradation_level(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    image_path = str(tmp_path / "shoe.jpg")
+    make_product_images(1)[0].save(image_path)
+
+    embedding = DummyEmbeddingModel(dimension=512)
+    container = SimpleNamespace(
+        embedding=embedding,
+        passthrough_embedding=embedding.with_preprocessor(PassthroughPreprocessor()),
+        cache=Cache(),
+    )
+    shedder = LoadShedder()
+    handle = make_request_handler(container, shedder)
+
+    full = handle({"command": "classify", "image": image_path, "budget_ms": 1000})
+    assert full["degradation"] == {"level": 0, "mode": "full"}
+    assert full["attributes"]
+
+    shedder.record("classify", 0, 10.0)
+    shed = handle({"command": "classify", "image": image_path, "budget_ms": 1000})
+    assert shed["degradation"] == {"level": 3, "mode": "no_zeroshot_attributes"}
+    # Same category; zero-shot attributes skipped
+    assert shed["category"] == full["category"]
+    assert shed["attributes"] == {}
+
+
+# --------------------------------------------
+# Scatter-gather over index shards
+# --------------------------------------------
+
+
+@pytest.fixture
+def sharded_index(tmp_path):
+    """24 products, indexed whole and as 3 published shards."""
+    faiss_store = pytest.importorskip("app.infrastructure.vector_store.faiss_store")
+    from benchmarks.synthetic import write_product_images
+    from cli.commands import rebuild
+
+    products = tmp_path / "products"
+    write_product_images(str(products), 24)
+    index_path = str(tmp_path / "index" / "index.bin")
+    embedding = DummyEmbeddingModel()
+
+    def store():
+        return faiss_store.FaissVectorStore(index_type="flat", index_path=index_path)
+
+    rebuild.run_rebuild(embedding, store(), str(products), dedup_threshold=0)
+    for shard_id in range(3):
+        rebuild.run_rebuild_shard(embedding, store(), 3, shard_id, str(products), dedup_threshold=0, publish=True)
+
+    return SimpleNamespace(products=products, index_path=index_path, store=store, embedding=embedding)
+
+
+@pytest.fixture
+def shard_servers(sharded_index):
+    """Start shard servers (optionally answering `delay` seconds late); returns their addresses."""
+    from app.infrastructure.vector_store.fragments import shard_index_path
+    from app.services.serving_index import ServingIndex
+    from cli.commands.shard import make_shard_handler
+
+    masters = []
+
+    def start(delays=(0.0, 0.0, 0.0), workers=1):
+        addresses = []
+        for shard_id, delay in enumerate(delays):
+            path = shard_index_path(sharded_index.index_path, shard_id, len(delays))
+            serving = ServingIndex(lambda: sharded_index.store().clone_empty(path), path, mmap=True)
+            handle = make_shard_handler(serving, shard_id, len(delays))
+
+            def delayed(request, handle=handle, delay=delay):
+                time.sleep(delay)
+                return handle(request)
+
+            server = PreforkServer(delayed, host="127.0.0.1", port=0, workers=workers)
+            addresses.append(server.bind())
+            master = multiprocessing.get_context("fork").Process(target=server.serve_forever)
+            master.start()
+            server.sock.close()
+            masters.append(master)
+        return addresses
+
+    yield start
+
+    for master in masters:
+        os.kill(master.pid, signal.SIGTERM)
+        master.join(timeout=10)
+
+
+@fork_only
+def test_scatter_gather_matches_the_unsharded_index(sharded_index, shard_servers):
+    from app.infrastructure.serving.scatter_gather import ScatterGather
+    from app.services.serving_index import ServingIndex
+
+    shards = ScatterGather(shard_servers(), timeout=10)
+    whole = ServingIndex(sharded_index.store, sharded_index.index_path)
+    assert whole.refresh()
+    id_to_filename = whole.current().catalog[0]
+
+    for name in ("product_00003.jpg", "product_00017.jpg"):
+        query = sharded_index.embedding.encode_image(str(sharded_index.products / name))
+        result = shards.search(query, 10)
+        ids, distances = whole.current().store.search(query, 10)
+
+        assert result.missing == {}
+        assert [hit[0] for hit in result.hits] == ids
+        assert [hit[1] for hit in result.hits] == [id_to_filename[str(pid)] for pid in ids]
+        assert [hit[2] for hit in result.hits] == pytest.approx(distances, rel=1e-5, abs=1e-5)
+    shards.close()
+
+
+@fork_only
+def test_scatter_gather_waits_for_the_slowest_shard_not_the_sum(sharded_index, shard_servers):
+    from app.infrastructure.serving.scatter_gather import ScatterGather
+
+    shards = ScatterGather(shard_servers(delays=(0.3, 0.3, 0.3)), timeout=5)
+    query = sharded_index.embedding.encode_image(str(sharded_index.products / "product_00005.jpg"))
+    # Each shard worker maps its snapshot on its first search
+    shards.search(query, 5)
+
+    started = time.perf_counter()
+    result = shards.search(query, 5)
+    elapsed = time.perf_counter() - started
+
+    assert result.missing == {} and len(result.hits) == 5
+    # One after another, the shards would take 0.9 s
+    assert 0.3 <= elapsed < 0.85
+    shards.close()
+
+
+@fork_only
+def test_scatter_gather_concurrent_queries_do_not_queue_behind_each_other(sharded_index, shard_servers):
+    from app.infrastructure.serving.scatter_gather import ScatterGather
+
+    # 6 queries × 3 shards × 0.25 s: queued on one 3-thread pool, the last would finish after 1.5 s
+    shards = ScatterGather(shard_servers(delays=(0.25, 0.25, 0.25), workers=6), timeout=1.2)
+    query = sharded_index.embedding.encode_image(str(sharded_index.products / "product_00005.jpg"))
+    barrier = threading.Barrier(6)
+    results = []
+
+    def search():
+        barrier.wait()
+        results.append(shards.search(query, 5))
+
+    # The first round lets every shard worker map its snapshot
+    for _ in range(2):
+        results.clear()
+        threads = [threading.Thread(target=search) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(results) == 6
+    assert all(result.missing == {} and len(result.hits) == 5 for result in results)
+    shards.close()
+
+
+@fork_only
+def test_scatter_gather_returns_partial_results_without_late_or_dead_shards(sharded_index, shard_servers):
+    from app.infrastructure.serving.scatter_gather import ScatterGather
+
+    addresses = shard_servers(delays=(0.0, 0.0, 2.0))
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        dead = closed.getsockname()
+    shards = ScatterGather(addresses + [dead], timeout=0.5)
+    query = sharded_index.embedding.encode_image(str(sharded_index.products / "product_00009.jpg"))
+    ScatterGather(addresses[:2], timeout=10).search(query, 1)
+
+    started = time.perf_counter()
+    result = shards.search(query, 24)
+    elapsed = time.perf_counter() - started
+
+    slow, dead = "%s:%d" % addresses[2], "%s:%d" % dead
+    assert sorted(result.missing) == sorted([slow, dead])
+    assert result.missing[slow] == "timed out"
+    assert result.missing[dead].startswith("ConnectionRefusedError")
+    assert elapsed < 1.0
+
+    # Exactly the products of the shards that answered, still best first
+    answered = ScatterGather(addresses[:2], timeout=10).search(query, 24)
+    assert result.hits == answered.hits
+    assert [hit[2] for hit in result.hits] == sorted(hit[2] for hit in result.hits)
+    shards.close()
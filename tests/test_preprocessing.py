@@ -1,13 +1,16 @@
+import numpy as np
 import pytest
 from PIL import Image
 
 from app.infrastructure.preprocessing.passthrough_preprocessor import (
     PassthroughPreprocessor,
 )
+from app.infrastructure.preprocessing.preprocessed_store import PreprocessedStore
 
 # Conditionally import rembg preprocessor
 try:
     from app.infrastructure.preprocessing.rembg_preprocessor import RembgPreprocessor
+    from app.infrastructure.preprocessing.adaptive_preprocessor import AdaptivePreprocessor
 
     REMBG_AVAILABLE = True
 except (ImportError, EnvironmentError, SystemExit, Exception):
@@ -172,6 +175,175 @@ class TestRembgPreprocessor:
         assert len(results) == 3
 
 
+# --------------------------------------------
+# AdaptivePreprocessor tests (skipped if rembg not installed)
+# --------------------------------------------
+
+
+def make_studio_image(bg=(245, 245, 245), product=(40, 60, 150)) -> Image.Image:
+    """Flat background with an off-centre product and a light logo inside it."""
+    img = Image.new("RGB", (400, 300), bg)
+    img.paste(product, (60, 50, 220, 250))
+    img.paste(bg, (120, 120, 160, 160))  # logo the colour of the background
+    return img
+
+
+def make_scene_image(seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 255, (30, 40, 3), dtype=np.uint8)
+    return Image.fromarray(noise).resize((400, 300), Image.BILINEAR)
+
+
+@pytest.mark.skipif(not REMBG_AVAILABLE, reason="rembg not installed")
+class TestAdaptivePreprocessor:
+    @pytest.fixture
+    def fake_rembg(self, monkeypatch):
+        calls = []
+
+        def remove_bg(self, img_rgba):
+            calls.append(img_rgba.size)
+            return img_rgba
+
+        monkeypatch.setattr(RembgPreprocessor, "_remove_bg", remove_bg)
+        return calls
+
+    def test_studio_shot_skips_rembg(self, fake_rembg):
+        pp = AdaptivePreprocessor()
+        result = pp.preprocess(make_studio_image())
+
+        assert result.size == (224, 224) and result.mode == "RGB"
+        assert fake_rembg == []
+        assert pp._session is None
+        assert pp.path_counts() == {"threshold": 1, "rembg": 0}
+
+    def test_threshold_mask_crops_and_keeps_inner_detail(self):
+        pp = AdaptivePreprocessor()
+        color = pp.background_color(make_studio_image())
+        assert color == (245, 245, 245)
+
+        rgba = pp._remove_bg(make_studio_image().convert("RGBA"))
+        alpha = np.array(rgba.getchannel("A"))
+        assert alpha[140, 140] == 255  # logo inside the product is kept
+        assert alpha[10, 10] == 0
+        assert pp._crop_to_foreground(rgba).size[0] < 400
+
+    def test_scene_uses_rembg(self, fake_rembg):
+        pp = AdaptivePreprocessor()
+        pp.preprocess(make_scene_image())
+
+        assert len(fake_rembg) == 1
+        assert pp.path_counts() == {"threshold": 0, "rembg": 1}
+
+    def test_product_touching_whole_frame_uses_rembg(self, fake_rembg):
+        pp = AdaptivePreprocessor()
+        img = Image.new("RGB", (300, 300), (250, 250, 250))
+        img.paste((20, 20, 20), (3, 3, 297, 297))
+
+        pp.preprocess(img)
+        assert pp.path_counts()["rembg"] == 1
+
+    def test_fingerprint_differs_from_rembg(self):
+        assert AdaptivePreprocessor().fingerprint() != RembgPreprocessor().fingerprint()
+
+
+# --------------------------------------------
+# PreprocessedStore tests
+# --------------------------------------------
+
+
+class CountingPreprocessor(PassthroughPreprocessor):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def preprocess(self, image):
+        self.calls += 1
+        return super().preprocess(image)
+
+    def fingerprint(self):
+        return f"Counting(size={self.target_size})"
+
+
+def write_images(tmp_path, count: int) -> list[str]:
+    paths = []
+    for i in range(count):
+        path = str(tmp_path / f"img_{i}.png")
+        make_image(120 + i, 80, color=(i * 20, 100, 50)).save(path)
+        paths.append(path)
+    return paths
+
+
+class TestPreprocessedStore:
+    def test_preprocesses_each_image_once(self, tmp_path):
+        pp = CountingPreprocessor()
+        store = PreprocessedStore(str(tmp_path / "store"), pp.fingerprint(), shard_size=2)
+        paths = write_images(tmp_path, 5)
+
+        first = [store.load(p, pp) for p in paths]
+        second = [store.load(p, pp) for p in paths]
+
+        assert pp.calls == 5
+        assert [img.tobytes() for img in first] == [img.tobytes() for img in second]
+
+    def test_persists_across_instances(self, tmp_path):
+        pp = CountingPreprocessor()
+        paths = write_images(tmp_path, 3)
+
+        store = PreprocessedStore(str(tmp_path / "store"), pp.fingerprint(), shard_size=2)
+        expected = [store.load(p, pp).tobytes() for p in paths]
+        store.flush()
+
+        reopened = PreprocessedStore(str(tmp_path / "store"), pp.fingerprint())
+        assert len(reopened) == 3
+        assert [reopened.load(p, pp).tobytes() for p in paths] == expected
+        assert pp.calls == 3
+
+    def test_concurrent_writers_keep_each_others_entries(self, tmp_path):
+        pp = CountingPreprocessor()
+        paths = write_images(tmp_path, 4)
+        # Two writers opened on the same store, as two processes would be
+        a = PreprocessedStore(str(tmp_path / "store"), pp.fingerprint())
+        b = PreprocessedStore(str(tmp_path / "store"), pp.fingerprint())
+
+        expected = [a.load(paths[0], pp).tobytes(), b.load(paths[1], pp).tobytes()]
+        a.flush()
+        b.flush()
+        expected += [a.load(paths[2], pp).tobytes(), b.load(paths[3], pp).tobytes()]
+        b.flush()
+        a.flush()
+
+        reopened = PreprocessedStore(str(tmp_path / "store"), pp.fingerprint())
+        assert len(reopened) == 4
+        assert [reopened.load(p, pp).tobytes() for p in paths] == expected
+        # A writer sees the other's flushed entries without reopening
+        assert a.load(paths[3], pp).tobytes() == expected[3]
+        assert pp.calls == 4
+
+    def test_keyed_by_content_not_path(self, tmp_path):
+        pp = CountingPreprocessor()
+        store = PreprocessedStore(str(tmp_path / "store"), pp.fingerprint())
+        path = write_images(tmp_path, 1)[0]
+        copy = str(tmp_path / "renamed.png")
+        with open(path, "rb") as src, open(copy, "wb") as dst:
+            dst.write(src.read())
+
+        store.load(path, pp)
+        store.load(copy, pp)
+        assert pp.calls == 1
+
+    def test_config_change_uses_separate_store(self, tmp_path):
+        small = CountingPreprocessor(target_size=(64, 64))
+        large = CountingPreprocessor(target_size=(96, 96))
+        path = write_images(tmp_path, 1)[0]
+
+        a = PreprocessedStore(str(tmp_path / "store"), small.fingerprint())
+        b = PreprocessedStore(str(tmp_path / "store"), large.fingerprint())
+
+        assert a.load(path, small).size == (64, 64)
+        assert b.load(path, large).size == (96, 96)
+        assert a.path != b.path
+
+
 # --------------------------------------------
 # Interface contract test (both must pass)
 # --------------------------------------------
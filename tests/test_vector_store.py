@@ -0,0 +1,737 @@
+import os
+import time
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from app.infrastructure.vector_store.faiss_store import FaissVectorStore
+
+
+DIM = 512
+
+
+def normalise(vectors: np.ndarray) -> np.ndarray:
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype("float32")
+
+
+def make_vectors(n: int, seed: int = 0, num_clusters: int = 50) -> np.ndarray:
+    """
+    L2-normalised float32 vectors grouped around a few centres,
+    like CLIP embeddings of a catalog with many similar products.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((num_clusters, DIM))
+    vectors = centres[rng.integers(0, num_clusters, n)] + 0.5 * rng.standard_normal((n, DIM))
+    return normalise(vectors)
+
+
+def make_store(tmp_path, **kwargs) -> FaissVectorStore:
+    store = FaissVectorStore(**kwargs)
+    store.index_path = str(tmp_path / "index.bin")
+    return store
+
+
+def recall_at_k(store, exact, queries, k=10) -> float:
+    hits = 0
+    for q in queries:
+        expected, _ = exact.search(q, k)
+        got, _ = store.search(q, k)
+        hits += len(set(expected) & set(got))
+    return hits / (k * len(queries))
+
+
+@pytest.fixture
+def data():
+    vectors = make_vectors(2000)
+    rng = np.random.default_rng(1)
+    queries = normalise(vectors[:20] + 0.1 * rng.standard_normal((20, DIM)))
+    return vectors, queries
+
+
+# --------------------------------------------
+# Compressed storage + exact re-ranking
+# --------------------------------------------
+
+
+class TestCompressedFaissVectorStore:
+    def test_unknown_index_type(self):
+        with pytest.raises(ValueError):
+            FaissVectorStore(index_type="hnsw")
+
+    @pytest.mark.parametrize("index_type,kwargs", [("sq8", {}), ("pq", {"pq_m": 32})])
+    def test_recall_close_to_exact(self, tmp_path, data, index_type, kwargs):
+        vectors, queries = data
+        ids = list(range(len(vectors)))
+
+        exact = make_store(tmp_path, index_type="flat")
+        exact.add(ids, vectors)
+
+        store = make_store(tmp_path, index_type=index_type, rerank_k=200, **kwargs)
+        store.add(ids, vectors)
+
+        assert recall_at_k(store, exact, queries) >= 0.9
+
+    def test_pq_below_training_minimum_builds_sq8(self, tmp_path, data):
+        vectors, queries = data
+        exact = make_store(tmp_path, index_type="flat")
+        exact.add(list(range(100)), vectors[:100])
+
+        store = make_store(tmp_path, index_type="pq", pq_m=32, rerank_k=100)
+        store.add(list(range(100)), vectors[:100])
+
+        assert store.index_type == "sq8"
+        assert store.search(queries[0], 5)[0] == exact.search(queries[0], 5)[0]
+
+    def test_reranked_scores_are_exact(self, tmp_path, data):
+        vectors, queries = data
+        ids = list(range(len(vectors)))
+
+        exact = make_store(tmp_path, index_type="flat")
+        exact.add(ids, vectors)
+        store = make_store(tmp_path, index_type="sq8", rerank_k=len(vectors))
+        store.add(ids, vectors)
+
+        expected_ids, expected_scores = exact.search(queries[0], 5)
+        got_ids, got_scores = store.search(queries[0], 5)
+
+        assert got_ids == expected_ids
+        np.testing.assert_allclose(got_scores, expected_scores, rtol=1e-4, atol=1e-5)
+
+    def test_save_load_memory_maps_vectors(self, tmp_path, data):
+        vectors, queries = data
+        store = make_store(tmp_path, index_type="sq8")
+        store.add(list(range(len(vectors))), vectors)
+        before = store.search(queries[0], 10)
+        store.save()
+
+        loaded = make_store(tmp_path, index_type="flat")
+        loaded.load()
+
+        assert loaded.index_type == "sq8"
+        assert isinstance(loaded.vectors, np.memmap)
+        assert loaded.search(queries[0], 10) == before
+
+        # Saving over the mapped file must not corrupt it
+        loaded.save()
+        reloaded = make_store(tmp_path)
+        reloaded.load()
+        assert reloaded.search(queries[0], 10) == before
+
+    def test_add_and_remove_after_load_keep_vectors_mapped(self, tmp_path, data):
+        vectors, queries = data
+        half = len(vectors) // 2
+        expected = make_store(tmp_path, index_type="sq8", rerank_k=len(vectors))
+        expected.add(list(range(len(vectors))), vectors)
+        expected.remove([0, half])
+
+        store = make_store(tmp_path, index_type="sq8", rerank_k=len(vectors))
+        store.add(list(range(half)), vectors[:half])
+        store.save()
+
+        loaded = make_store(tmp_path, index_type="sq8", rerank_k=len(vectors))
+        loaded.load()
+        loaded.add(list(range(half, len(vectors))), vectors[half:])
+        assert loaded.remove([0, half]) == 2
+
+        # Added rows sit in the tail, the mapped file is left alone
+        assert isinstance(loaded.vectors, np.memmap)
+        assert loaded.search(queries[0], 10) == expected.search(queries[0], 10)
+
+        loaded.save()
+        reloaded = make_store(tmp_path, rerank_k=len(vectors))
+        reloaded.load()
+        assert len(reloaded.vectors) == len(vectors) - 2
+        assert reloaded.search(queries[0], 10) == expected.search(queries[0], 10)
+
+    @pytest.mark.parametrize("index_type", ["flat", "sq8"])
+    def test_top_k_beyond_size_returns_each_product_once(self, tmp_path, data, index_type):
+        vectors, queries = data
+        store = make_store(tmp_path, index_type=index_type)
+        store.add([7, 8, 9], vectors[:3])
+
+        ids, scores = store.search(queries[0], 10)
+        assert sorted(ids) == [7, 8, 9]
+        assert all(score < 10 for score in scores)
+
+    @pytest.mark.parametrize("index_type", ["flat", "sq8"])
+    def test_remove_drops_products(self, tmp_path, data, index_type):
+        vectors, queries = data
+        store = make_store(tmp_path, index_type=index_type, rerank_k=len(vectors))
+        store.add(list(range(100, 100 + len(vectors))), vectors)
+
+        top = store.search(queries[0], 3)[0]
+        assert store.remove(top[:2] + [99]) == 2
+        assert store.index.ntotal == len(vectors) - 2
+
+        ids, scores = store.search(queries[0], 3)
+        assert ids[0] == top[2] and not set(top[:2]) & set(ids)
+        np.testing.assert_allclose(scores[0], np.sum((vectors[top[2] - 100] - queries[0]) ** 2), rtol=1e-4)
+
+
+# --------------------------------------------
+# NumPy brute-force store
+# --------------------------------------------
+
+
+class TestNumpyVectorStore:
+    def make(self, tmp_path, **kwargs):
+        from app.infrastructure.vector_store.in_memory_store import NumpyVectorStore
+
+        return NumpyVectorStore(index_path=str(tmp_path / "numpy" / "index.bin"), **kwargs)
+
+    def test_results_match_faiss_flat(self, tmp_path, data):
+        vectors, queries = data
+        exact = make_store(tmp_path, index_type="flat")
+        exact.add(list(range(len(vectors))), vectors)
+
+        store = self.make(tmp_path)
+        # One at a time and in batches: the buffers grow by doubling
+        for i in range(100):
+            store.add([i], vectors[i])
+        store.add(list(range(100, len(vectors))), vectors[100:])
+
+        for q in queries:
+            expected_ids, expected_scores = exact.search(q, 10)
+            got_ids, got_scores = store.search(q, 10)
+            assert got_ids == expected_ids
+            np.testing.assert_allclose(got_scores, expected_scores, rtol=1e-4, atol=1e-5)
+
+        # A query matrix is searched in one pass, with the same results per row
+        batch_ids, batch_scores = store.search(queries, 10)
+        for q, ids, scores in zip(queries, batch_ids, batch_scores):
+            assert (ids, scores) == store.search(q, 10)
+
+        # top_k beyond the store returns everything (deep in the list only float rounding breaks ties)
+        got_ids, got_scores = store.search(queries[0], 5000)
+        expected_ids, expected_scores = exact.search(queries[0], len(vectors))
+        assert sorted(got_ids) == sorted(expected_ids)
+        np.testing.assert_allclose(got_scores, expected_scores, rtol=1e-4, atol=1e-5)
+
+    def test_removed_rows_never_returned_and_compaction_keeps_results(self, tmp_path, data):
+        vectors, queries = data
+        store = self.make(tmp_path)
+        store.add(list(range(len(vectors))), vectors)
+
+        top = store.search(queries[0], 10)[0]
+        assert store.remove(top[:3] + [10**9]) == 3
+        assert len(store) == len(vectors) - 3
+
+        expected = store.search(queries[0], 10)
+        assert not set(top[:3]) & set(expected[0])
+        assert expected[0][:7] == top[3:]
+
+        store.compact()
+        assert store.size == len(vectors) - 3
+        assert store.search(queries[0], 10) == expected
+
+        # Mostly dead: compacted without being asked
+        store.remove(list(range(1500)))
+        assert store.removed == 0 and len(store) == store.size
+
+    def test_save_load_memory_maps(self, tmp_path, data):
+        vectors, queries = data
+        store = self.make(tmp_path)
+        store.add(list(range(len(vectors))), vectors)
+        store.remove([0, 1])
+        before = store.search(queries[0], 10)
+        store.save()
+
+        loaded = self.make(tmp_path)
+        loaded.load(mmap=True)
+        assert isinstance(loaded._vectors, np.memmap)
+        assert loaded.memory_usage()["numpy.vectors"] == 0
+        assert loaded.search(queries[0], 10) == before
+
+        # Adding to a mapped store copies it first; saving over the mapped files is safe
+        loaded.add([5000], vectors[0])
+        loaded.save()
+        reloaded = self.make(tmp_path)
+        reloaded.load()
+        assert reloaded.search(vectors[0], 1)[0] == [5000]
+
+    def test_float16_storage_keeps_ranking(self, tmp_path, data):
+        vectors, queries = data
+        exact = self.make(tmp_path)
+        exact.add(list(range(len(vectors))), vectors)
+        half = self.make(tmp_path, dtype="float16")
+        half.add(list(range(len(vectors))), vectors)
+
+        assert half.memory_usage()["numpy.vectors"] * 2 <= exact.memory_usage()["numpy.vectors"]
+        assert recall_at_k(half, exact, queries) >= 0.95
+
+    def test_factory_picks_backend(self):
+        from types import SimpleNamespace
+        from app.infrastructure.vector_store.factory import make_vector_store
+        from app.infrastructure.vector_store.in_memory_store import NumpyVectorStore
+
+        assert isinstance(make_vector_store(SimpleNamespace(VECTOR_STORE="faiss")), FaissVectorStore)
+        store = make_vector_store(SimpleNamespace(VECTOR_STORE="numpy", NUMPY_STORE_DTYPE="float16"))
+        assert isinstance(store, NumpyVectorStore) and store.dtype == "float16"
+        with pytest.raises(ValueError):
+            make_vector_store(SimpleNamespace(VECTOR_STORE="annoy"))
+
+    def test_cli_runs_without_faiss(self):
+        import subprocess
+        import sys
+
+        # faiss unimportable: the CLI, rebuild and merge-index must not need it with the numpy backend
+        code = (
+            "import sys; sys.modules['faiss'] = None\n"
+            "import cli.main, cli.commands.rebuild, cli.commands.merge_index\n"
+            "from app.infrastructure.vector_store.duplicate_index import DuplicateIndex\n"
+            "DuplicateIndex(4, 0.9)\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+# --------------------------------------------
+# Near-duplicate clustering
+# --------------------------------------------
+
+
+class TestDuplicateIndex:
+    def test_groups_near_duplicates(self):
+        from app.infrastructure.vector_store.duplicate_index import DuplicateIndex
+
+        rng = np.random.default_rng(2)
+        base = make_vectors(3, seed=3, num_clusters=3)
+        near_copy = normalise(base[:1] + 0.01 * rng.standard_normal((1, DIM)))[0]
+
+        index = DuplicateIndex(DIM, threshold=0.97)
+        assert index.find(base[0]) is None
+        index.add(10, base[0])
+
+        assert index.find(near_copy) == 10
+        assert index.find(base[1]) is None
+
+
+# --------------------------------------------
+# Atomic snapshots + hot swap
+# --------------------------------------------
+
+
+def publish_snapshot(snapshots, vectors, names) -> str:
+    import json
+
+    staging = snapshots.staging()
+    store = FaissVectorStore(index_type="flat", index_path=f"{staging}/index.bin")
+    store.add(list(range(len(vectors))), vectors)
+    store.save()
+    with open(f"{staging}/id_to_filename.json", "w") as f:
+        json.dump({str(i): name for i, name in enumerate(names)}, f)
+
+    return snapshots.publish(staging)
+
+
+class TestIndexSnapshots:
+    def test_publish_points_current_at_verified_snapshot(self, tmp_path):
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots, resolve_index_path
+
+        snapshots = IndexSnapshots(str(tmp_path))
+        version = publish_snapshot(snapshots, make_vectors(10), [f"p{i}.jpg" for i in range(10)])
+
+        assert snapshots.current() == version
+        assert snapshots.verify(version)
+        assert resolve_index_path(str(tmp_path / "index.bin")) == f"{snapshots.path(version)}/index.bin"
+        assert not [name for name in (tmp_path / "snapshots").iterdir() if name.name.startswith(".")]
+
+        # A flipped byte fails verification
+        with open(f"{snapshots.path(version)}/index.bin_ids.npy", "r+b") as f:
+            f.seek(-1, 2)
+            last = f.read(1)
+            f.seek(-1, 2)
+            f.write(bytes([last[0] ^ 0xFF]))
+        assert not snapshots.verify(version)
+
+    def test_gc_keeps_retained_and_current(self, tmp_path):
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots
+
+        snapshots = IndexSnapshots(str(tmp_path), retain=2)
+        versions = [publish_snapshot(snapshots, make_vectors(5, seed=i), ["a"] * 5) for i in range(4)]
+
+        assert snapshots.versions() == versions[-2:]
+        assert snapshots.current() == versions[-1]
+
+    def test_serving_index_swaps_without_disturbing_held_snapshot(self, tmp_path):
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots
+        from app.services.serving_index import ServingIndex
+
+        snapshots = IndexSnapshots(str(tmp_path))
+        old_vectors, new_vectors = make_vectors(20, seed=1), make_vectors(20, seed=2)
+        publish_snapshot(snapshots, old_vectors, ["old"] * 20)
+
+        serving = ServingIndex(lambda: FaissVectorStore(index_type="flat"), str(tmp_path / "index.bin"), verify=True)
+        assert serving.refresh()
+        assert not serving.refresh()
+        held = serving.current()
+
+        new_version = publish_snapshot(snapshots, new_vectors, ["new"] * 20)
+        assert serving.refresh()
+
+        # In-flight queries finish on the snapshot they hold; new ones see the new build
+        assert held.catalog[0]["0"] == "old"
+        assert held.store.search(old_vectors[3], 1)[0] == [3]
+        assert serving.current().version == new_version
+        assert serving.current().catalog[0]["0"] == "new"
+        assert serving.current().store.search(new_vectors[7], 1)[0] == [7]
+
+    def test_serving_index_loads_in_background_without_pausing_queries(self, tmp_path):
+        import threading
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots
+        from app.services.serving_index import ServingIndex
+
+        release = threading.Event()
+        release.set()
+
+        class GatedStore(FaissVectorStore):
+            def load(self, *args, **kwargs):
+                release.wait(10)
+                super().load(*args, **kwargs)
+
+        snapshots = IndexSnapshots(str(tmp_path))
+        old = publish_snapshot(snapshots, make_vectors(5, seed=1), ["old"] * 5)
+        serving = ServingIndex(lambda: GatedStore(index_type="flat"), str(tmp_path / "index.bin"))
+        assert serving.refresh(wait=False) and serving.current().version == old
+
+        release.clear()
+        new = publish_snapshot(snapshots, make_vectors(5, seed=2), ["new"] * 5)
+        # The load is stuck, yet queries return at once with the old snapshot
+        for _ in range(3):
+            assert not serving.refresh(wait=False)
+            assert serving.current().version == old
+
+        release.set()
+        deadline = time.monotonic() + 10
+        while serving.current().version != new and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert serving.current().catalog[0]["0"] == "new"
+
+    def test_serving_index_reports_a_corrupt_snapshot_once(self, tmp_path, caplog):
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots
+        from app.services.serving_index import ServingIndex
+
+        snapshots = IndexSnapshots(str(tmp_path))
+        good = publish_snapshot(snapshots, make_vectors(5, seed=1), ["good"] * 5)
+        serving = ServingIndex(lambda: FaissVectorStore(index_type="flat"), str(tmp_path / "index.bin"), verify=True)
+        assert serving.refresh()
+
+        bad = publish_snapshot(snapshots, make_vectors(5, seed=2), ["bad"] * 5)
+        with open(f"{snapshots.path(bad)}/index.bin_ids.npy", "ab") as f:
+            f.write(b"\0")
+
+        for _ in range(3):
+            assert not serving.refresh()
+        assert serving.current().version == good
+        assert serving.rejected == bad
+        assert sum(f"{bad} failed checksum verification" in r.getMessage() for r in caplog.records) == 1
+
+    def test_legacy_flat_layout_still_served(self, tmp_path, data):
+        import json
+        from app.services.serving_index import ServingIndex
+
+        vectors, queries = data
+        store = make_store(tmp_path, index_type="flat")
+        store.add(list(range(len(vectors))), vectors)
+        store.save()
+        (tmp_path / "id_to_filename.json").write_text(json.dumps({"0": "legacy.jpg"}))
+
+        serving = ServingIndex(lambda: FaissVectorStore(index_type="flat"), str(tmp_path / "index.bin"))
+        assert serving.refresh()
+        assert serving.current().version.startswith("legacy-")
+        assert serving.current().catalog[0] == {"0": "legacy.jpg"}
+        assert serving.current().store.search(queries[0], 10) == store.search(queries[0], 10)
+
+
+def test_rebuild_publishes_snapshot_and_leaves_serving_store_alone(tmp_path):
+    from PIL import Image
+
+    from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+    from app.infrastructure.vector_store.snapshots import IndexSnapshots
+    from cli.commands import rebuild
+
+    products = tmp_path / "products"
+    products.mkdir()
+    for i, colour in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+        Image.new("RGB", (32, 32), colour).save(products / f"p{i}.png")
+
+    serving_store = FaissVectorStore(index_type="flat", index_path=str(tmp_path / "index" / "index.bin"))
+    (tmp_path / "index").mkdir()
+
+    version = rebuild.run_rebuild(DummyEmbeddingModel(), serving_store, str(products), dedup_threshold=0)
+
+    snapshots = IndexSnapshots(str(tmp_path / "index"))
+    assert snapshots.current() == version
+    assert snapshots.verify(version)
+    assert serving_store.index.ntotal == 0
+
+
+# --------------------------------------------
+# Live ingestion + fold
+# --------------------------------------------
+
+
+class TestLiveIngest:
+    def test_ingest_serves_at_once_and_fold_publishes_the_same_results(self, tmp_path):
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots
+        from app.services.serving_index import ServingIndex
+
+        snapshots = IndexSnapshots(str(tmp_path))
+        vectors = make_vectors(20, seed=1)
+        publish_snapshot(snapshots, vectors, [f"p{i}.jpg" for i in range(20)])
+        serving = ServingIndex(lambda: FaissVectorStore(index_type="flat"), str(tmp_path / "index.bin"))
+        assert serving.refresh()
+
+        new, changed = make_vectors(2, seed=2)
+        loaded = serving.ingest({"new.jpg": new, "p3.jpg": changed}, removed=["p5.jpg"])
+
+        id_to_filename = loaded.catalog[0]
+        assert [id_to_filename[str(pid)] for pid in loaded.store.search(new, 1)[0]] == ["new.jpg"]
+        assert id_to_filename[str(loaded.store.search(changed, 1)[0][0])] == "p3.jpg"
+        # p3 is only found by its new vector, and the removed p5 not at all
+        ids, scores = loaded.store.search(vectors[3], 25)
+        assert ids.count(3) == 1
+        np.testing.assert_allclose(scores[ids.index(3)], np.sum((vectors[3] - changed) ** 2), rtol=1e-4)
+        assert 5 not in ids
+        assert len(loaded.store.search(vectors[0], 50)[0]) == 20
+        assert serving.live_count() == 3
+
+        version = serving.fold()
+        assert snapshots.current() == version and snapshots.verify(version)
+        assert serving.live_count() == 0
+        assert serving.current().version == version
+
+        fresh = ServingIndex(lambda: FaissVectorStore(index_type="flat"), str(tmp_path / "index.bin"))
+        assert fresh.refresh()
+        for query in (new, changed, vectors[0], vectors[5]):
+            assert fresh.current().store.search(query, 5) == loaded.store.search(query, 5)
+        # The live catalog still names p5 under its (unreachable) id; the fold drops it
+        assert fresh.current().catalog[0] == {pid: name for pid, name in id_to_filename.items() if name != "p5.jpg"}
+
+    def test_ingest_service_follows_products_directory(self, tmp_path):
+        from PIL import Image
+
+        from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+        from app.services.ingest_service import IngestService
+        from app.services.serving_index import ServingIndex
+        from cli.commands import rebuild
+
+        products = tmp_path / "products"
+        make_products(products, 4)
+        index_path = str(tmp_path / "index" / "index.bin")
+        embedding = DummyEmbeddingModel()
+        rebuild.run_rebuild(
+            embedding, FaissVectorStore(index_type="flat", index_path=index_path), str(products), dedup_threshold=0
+        )
+
+        serving = ServingIndex(lambda: FaissVectorStore(index_type="flat", index_path=index_path), index_path)
+        ingest = IngestService(embedding, serving, str(products), debounce=0, fold_rows=100, inotify=False)
+        ingest.open()
+        # Everything in the snapshot counts as indexed
+        assert ingest.run_once() == {"added": 0, "removed": 0}
+
+        Image.new("RGB", (32, 32), (255, 0, 0)).save(products / "red.png")
+        (products / "p001.png").unlink()
+        (products / "broken.png").write_bytes(b"not an image")
+
+        # New files settle for one scan before they are embedded
+        assert ingest.run_once() == {"added": 0, "removed": 1}
+        assert ingest.run_once() == {"added": 1, "removed": 0}
+        assert list(ingest.status()["failed"]) == ["broken.png"]
+
+        loaded = serving.current()
+        query = embedding.encode_image(str(products / "red.png"))
+        assert loaded.catalog[0][str(loaded.store.search(query, 1)[0][0])] == "red.png"
+        assert "p001.png" not in [loaded.catalog[0][str(pid)] for pid in loaded.store.search(query, 10)[0]]
+
+        version = ingest.stop()
+        assert version is not None and serving.live_count() == 0
+        assert sorted(serving.current().catalog[0].values()) == ["p000.png", "p002.png", "p003.png", "red.png"]
+
+
+# --------------------------------------------
+# Per-storefront catalogs
+# --------------------------------------------
+
+
+class TestCatalogIndexManager:
+    @pytest.fixture
+    def catalogs(self, tmp_path):
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots
+        from app.services.catalog_index_manager import CatalogIndexManager
+
+        vectors = {}
+        for seed, name in enumerate(["shoes", "bags", "hats"]):
+            vectors[name] = make_vectors(50, seed=seed)
+            publish_snapshot(IndexSnapshots(str(tmp_path / name)), vectors[name], [f"{name}{i}.jpg" for i in range(50)])
+
+        one_catalog = 50 * DIM * 4
+        manager = CatalogIndexManager(
+            lambda path: FaissVectorStore(index_type="flat", index_path=path),
+            root=str(tmp_path),
+            memory_budget=int(2.5 * one_catalog),
+        )
+        return manager, vectors
+
+    def test_loads_lazily_and_evicts_least_recently_used(self, catalogs):
+        manager, vectors = catalogs
+        assert manager.catalogs() == ["bags", "hats", "shoes"]
+        assert manager.resident() == {}
+
+        assert manager.search("shoes", vectors["shoes"][7], top_k=1)[0][:2] == (7, "shoes7.jpg")
+        assert manager.search("bags", vectors["bags"][3], top_k=1)[0][:2] == (3, "bags3.jpg")
+        assert list(manager.resident()) == ["shoes", "bags"]
+
+        # Over budget: the coldest catalog goes
+        manager.search("hats", vectors["hats"][0], top_k=1)
+        assert list(manager.resident()) == ["bags", "hats"]
+
+        manager.search("bags", vectors["bags"][0], top_k=1)
+        manager.search("shoes", vectors["shoes"][0], top_k=1)
+        assert list(manager.resident()) == ["bags", "shoes"]
+        assert manager.evictions == 2
+        assert sum(manager.resident().values()) <= manager.memory_budget
+
+        # Reloaded on demand, with the same results
+        assert manager.search("hats", vectors["hats"][9], top_k=3)[0][:2] == (9, "hats9.jpg")
+
+        with pytest.raises(KeyError):
+            manager.search("gloves", vectors["hats"][0])
+        with pytest.raises(ValueError):
+            manager.index("../shoes")
+
+    def test_budget_eviction_skips_catalogs_with_live_products(self, catalogs, tmp_path):
+        from app.infrastructure.vector_store.snapshots import IndexSnapshots
+
+        manager, vectors = catalogs
+        new = make_vectors(1, seed=9)[0]
+        manager.add("shoes", {"new.jpg": new})
+        published = IndexSnapshots(str(tmp_path / "shoes")).current()
+
+        # Over budget, but the only colder catalog has live products: kept, and not published by a query
+        manager.search("bags", vectors["bags"][0], top_k=1)
+        manager.search("hats", vectors["hats"][0], top_k=1)
+        assert list(manager.resident())[0] == "shoes"
+        assert IndexSnapshots(str(tmp_path / "shoes")).current() == published
+        assert manager.search("shoes", new, top_k=1)[0][1] == "new.jpg"
+
+        # Once published it is evictable like any other
+        manager.publish("shoes")
+        manager.search("bags", vectors["bags"][0], top_k=1)
+        manager.search("hats", vectors["hats"][0], top_k=1)
+        assert "shoes" not in manager.resident()
+        assert manager.search("shoes", new, top_k=1)[0][1] == "new.jpg"
+
+    def test_add_publish_and_rebuild_per_catalog(self, catalogs, tmp_path):
+        from cli.commands.rebuild import publish_index
+
+        manager, vectors = catalogs
+        manager.memory_budget = 2**30
+        new = make_vectors(1, seed=9)[0]
+
+        manager.add("shoes", {"new.jpg": new})
+        assert manager.search("shoes", new, top_k=1)[0][1] == "new.jpg"
+        # A catalog that doesn't exist yet is created by its first product
+        manager.add("gloves", {"glove.jpg": new})
+        assert manager.search("gloves", new, top_k=5) == [(0, "glove.jpg", pytest.approx(0, abs=1e-5), ())]
+
+        # Evicting publishes live products instead of losing them
+        assert manager.evict("shoes") and manager.evict("gloves")
+        assert "gloves" in manager.catalogs()
+        assert manager.search("shoes", new, top_k=1)[0][1] == "new.jpg"
+        assert manager.publish("shoes") is None
+
+        rebuilt = make_vectors(5, seed=10)
+        version = manager.rebuild(
+            "shoes",
+            lambda store: publish_index(store, list(range(5)), rebuilt, {i: f"r{i}.jpg" for i in range(5)}, {}),
+        )
+        assert manager.current("shoes").version == version
+        assert manager.search("shoes", rebuilt[4], top_k=1)[0][:2] == (4, "r4.jpg")
+
+
+# --------------------------------------------
+# Sharded rebuild + merge
+# --------------------------------------------
+
+
+def make_products(path, n: int, near_copies: int = 0):
+    from PIL import Image
+
+    path.mkdir()
+    rng = np.random.default_rng(4)
+    for i in range(n):
+        pixels = rng.integers(0, 256, (16, 16, 3), dtype=np.uint8)
+        Image.fromarray(pixels).resize((32, 32)).save(path / f"p{i:03d}.png")
+        if i < near_copies:
+            Image.fromarray(pixels).resize((32, 32)).rotate(0.5).save(path / f"p{i:03d}_copy.png")
+
+
+def build_shard(products_dir, index_path, shards, shard_id, dedup_threshold):
+    from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+    from cli.commands import rebuild
+
+    store = FaissVectorStore(index_type="flat", index_path=index_path)
+    rebuild.run_rebuild_shard(
+        DummyEmbeddingModel(), store, shards, shard_id, str(products_dir), dedup_threshold=dedup_threshold
+    )
+
+
+class TestShardedRebuild:
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="runs shards as forked processes")
+    @pytest.mark.parametrize("dedup_threshold", [0, 0.99])
+    def test_merge_of_parallel_shards_matches_single_rebuild(self, tmp_path, dedup_threshold):
+        import multiprocessing
+        from app.infrastructure.embedding.dummy_model import DummyEmbeddingModel
+        from app.services.serving_index import ServingIndex
+        from cli.commands import rebuild, merge_index
+
+        products = tmp_path / "products"
+        make_products(products, 24, near_copies=6)
+
+        single_path = str(tmp_path / "single" / "index.bin")
+        rebuild.run_rebuild(
+            DummyEmbeddingModel(), FaissVectorStore(index_type="flat", index_path=single_path),
+            str(products), dedup_threshold=dedup_threshold,
+        )
+
+        sharded_path = str(tmp_path / "sharded" / "index.bin")
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=build_shard, args=(products, sharded_path, 3, shard_id, dedup_threshold))
+            for shard_id in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+        merge_index.run_merge_index(FaissVectorStore(index_type="sq8", index_path=sharded_path))
+        assert not (tmp_path / "sharded" / "fragments").exists()
+
+        single = ServingIndex(lambda: FaissVectorStore(), single_path)
+        sharded = ServingIndex(lambda: FaissVectorStore(), sharded_path)
+        assert single.refresh() and sharded.refresh()
+
+        single_ids, single_dups = single.current().catalog
+        sharded_ids, sharded_dups = sharded.current().catalog
+        assert sharded_ids == single_ids
+        assert {k: sorted(v) for k, v in sharded_dups.items()} == {k: sorted(v) for k, v in single_dups.items()}
+        assert sharded.current().store.index_type == "sq8"
+
+        query = DummyEmbeddingModel().encode_image(str(products / "p005.png"))
+        assert sharded.current().store.search(query, 5)[0] == single.current().store.search(query, 5)[0]
+
+    def test_merge_refuses_incomplete_fragments(self, tmp_path):
+        from cli.commands import merge_index
+
+        products = tmp_path / "products"
+        make_products(products, 6)
+        index_path = str(tmp_path / "index" / "index.bin")
+        build_shard(products, index_path, 2, 0, 0)
+
+        with pytest.raises(ValueError, match="Missing fragments"):
+            merge_index.run_merge_index(FaissVectorStore(index_type="flat", index_path=index_path))